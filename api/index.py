@@ -1,6 +1,13 @@
 """
 Handler para Vercel Serverless Functions
 Expone la aplicación FastAPI como función serverless
+
+Cada arranque en frío empieza con el repositorio vacío; con TASKS_SNAPSHOT_PATH
+apuntando a un snapshot empaquetado (InMemoryTaskRepository.export_snapshot)
+se sirve desde él con mmap sin esperar a cargarlo
+
+Con TASKS_STARTUP_PROFILE=1 el arranque en frío escribe en stderr el desglose
+del tiempo de import (app/startup.py)
 """
 import sys
 from pathlib import Path
@@ -9,8 +16,16 @@ from pathlib import Path
 backend_path = Path(__file__).parent.parent / "backend"
 sys.path.insert(0, str(backend_path))
 
-from app.main import app
-from mangum import Mangum
+from app import startup
+
+if startup.enabled():
+    with startup.ImportProfiler() as profiler:
+        from app.main import app
+        from mangum import Mangum
+    print(profiler.report(), file=sys.stderr)
+else:
+    from app.main import app
+    from mangum import Mangum
 
 # Handler para Vercel
 handler = Mangum(app, lifespan="off")
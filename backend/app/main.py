@@ -3,13 +3,41 @@ API REST para Gestión de Tareas Empresariales
 Implementa principios SOLID y patrones de diseño
 Compatible con Python 3.13 y Vercel Deployment
 """
-from fastapi import FastAPI, HTTPException, status
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Optional
-from pydantic import BaseModel, Field, field_validator, validator
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from typing import Annotated, AsyncIterator, Iterator, List, Optional
+from pydantic import (BaseModel, Field, PrivateAttr, TypeAdapter, ValidationError,
+                      field_validator, model_validator, validator)
+from pydantic_settings import BaseSettings, SettingsConfigDict
 from datetime import datetime
 from enum import Enum
+from collections import Counter, OrderedDict, deque
+from dataclasses import dataclass, replace
+from bisect import bisect_left, bisect_right
+from array import array
+from itertools import accumulate, dropwhile, islice, takewhile
+from operator import itemgetter
+import asyncio
+import atexit
+import base64
+import csv
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import sqlite3
+import struct
+import threading
+import time
+import unicodedata
 import uuid
+import zlib
 
 # ============= MODELS (Single Responsibility) =============
 
@@ -43,17 +71,32 @@ class TaskCreate(TaskBase):
     pass
 
 class TaskUpdate(BaseModel):
+    """Cambios parciales: solo se validan (y aplican) los campos enviados"""
     title: Optional[str] = Field(None, min_length=3, max_length=100)
-    description: Optional[str] = None
+    description: Optional[str] = Field(None, max_length=500)
     priority: Optional[TaskPriority] = None
     status: Optional[TaskStatus] = None
     assigned_to: Optional[str] = None
     due_date: Optional[datetime] = None
 
+    @field_validator('title', 'priority', 'status')
+    @classmethod
+    def required_fields_not_null(cls, v, info):
+        if v is None:
+            raise ValueError(f'{info.field_name} cannot be null')
+        return v
+
+    @field_validator('title')
+    @classmethod
+    def title_must_not_be_empty(cls, v):
+        return TaskBase.title_must_not_be_empty(v)
+
 class Task(TaskBase):
     id: str
     created_at: datetime
     updated_at: datetime
+    # Versión del repositorio en la última escritura (base del ETag)
+    _version: int = PrivateAttr(0)
 
     class Config:
         json_schema_extra = {
@@ -70,10 +113,230 @@ class Task(TaskBase):
             }
         }
 
+class TaskBulkUpdate(BaseModel):
+    id: str
+    changes: TaskUpdate
+
+class BulkItemResult(BaseModel):
+    index: int
+    status_code: int
+    task: Optional[Task] = None
+    detail: Optional[str] = None
+
+class BulkResult(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[BulkItemResult]
+
+class TaskChanges(BaseModel):
+    # Versión a enviar como `since` en la siguiente consulta
+    version: int
+    # True si `since` ya no está en el registro: `upserts` trae todas las tareas
+    full_resync: bool
+    upserts: List[Task]
+    deletions: List[str]
+
+class TaskStatistics(BaseModel):
+    total: int
+    by_status: dict[TaskStatus, int]
+    by_priority: dict[TaskPriority, int]
+    # Con fecha límite vencida y sin completar ni cancelar
+    overdue: int
+
+class QueryPlan(BaseModel):
+    # Índice que dirige el recorrido ("all", "status", "due_date", "text"...)
+    driver: str
+    # "index_scan": en el orden pedido, corta en `limit`; "sort": filtra y ordena
+    strategy: str
+    # Filas estimadas por cada índice candidato
+    estimates: dict[str, int]
+    # Filtros comprobados sobre cada candidato del driver
+    residual: List[str]
+    order: str
+    # EXPLAIN QUERY PLAN (solo SQLite, que elige su propio plan)
+    detail: List[str] = []
+
+    class Config:
+        # Solo lo usa ?explain=true: el esquema se construye en la primera petición
+        defer_build = True
+
+class TaskListExplanation(BaseModel):
+    plan: QueryPlan
+    tasks: List[Task]
+
+    class Config:
+        defer_build = True
+
+class ImportLineError(BaseModel):
+    # Línea del cuerpo donde empieza el registro (en CSV la cabecera es la 1)
+    line: int
+    detail: str
+
+class ImportResult(BaseModel):
+    imported: int
+    failed: int
+    # Solo los primeros errores (import_max_errors); `failed` los cuenta todos
+    errors: List[ImportLineError]
+
+# Estados en los que una tarea ya no puede vencer
+CLOSED_STATUSES = (TaskStatus.COMPLETED, TaskStatus.CANCELLED)
+
+def as_local_naive(value: datetime) -> datetime:
+    """Fecha con zona a hora local sin zona, comparable con datetime.now()"""
+    return value.astimezone().replace(tzinfo=None) if value.tzinfo else value
+
 # ============= REPOSITORY PATTERN (Dependency Inversion) =============
 
+class VersionConflictError(Exception):
+    """La versión esperada (If-Match) no coincide con la actual"""
+    def __init__(self, task_id: str, current_version: int):
+        super().__init__(f"Task {task_id} is at version {current_version}")
+        self.task_id = task_id
+        self.current_version = current_version
+
+@dataclass(slots=True, frozen=True)
+class TaskChange:
+    """Un cambio aplicado al repositorio; `seq` es la versión que produjo"""
+    seq: int
+    op: str  # "created" | "updated" | "deleted"
+    task_id: str
+    task: Optional[Task] = None
+
+@dataclass(slots=True, frozen=True)
+class TaskQuery:
+    """Filtros combinables de un listado; una tarea debe cumplirlos todos"""
+    status: Optional[TaskStatus] = None
+    priority: Optional[TaskPriority] = None
+    assigned_to: Optional[str] = None
+    due_after: Optional[datetime] = None
+    due_before: Optional[datetime] = None
+    # Solo tareas con fecha límite, aunque no haya rango
+    dated: bool = False
+    # Sin completar ni cancelar
+    open_only: bool = False
+    # Palabras que deben aparecer (como prefijo) en título o descripción
+    text: Optional[str] = None
+    
+    @property
+    def by_due(self) -> bool:
+        """Con fecha límite se ordena por ella (ascendente); si no, por creación descendente"""
+        return self.dated or self.due_after is not None or self.due_before is not None
+    
+    @property
+    def order(self) -> str:
+        return "due_date asc" if self.by_due else "created_at desc"
+    
+    def active(self) -> List[str]:
+        """Nombres de los filtros presentes"""
+        present = [name for name in ("status", "priority", "assigned_to")
+                   if getattr(self, name) is not None]
+        if self.by_due:
+            present.append("due_date")
+        if self.open_only:
+            present.append("open")
+        if self.text is not None:
+            present.append("text")
+        return present
+    
+    def sort_key(self, task: "Task") -> tuple:
+        """Clave de orden de una tarea, para pasarla como `after` a find"""
+        if self.by_due:
+            return (task.due_date, task.created_at, task.id)
+        return (task.created_at, task.id)
+
+class ChangeLog:
+    """Registro acotado de los últimos cambios, en orden de `seq`.
+    
+    Los repositorios añaden cada cambio al confirmar la escritura (ya serializada
+    por su lock de escritura) y notifican a los listeners en ese mismo hilo.
+    """
+    def __init__(self, capacity: int, last_seq: int = 0):
+        self._entries: deque[TaskChange] = deque(maxlen=capacity)
+        self._last_seq = last_seq
+        self._lock = threading.Lock()
+        self._listeners: list = []
+    
+    @property
+    def last_seq(self) -> int:
+        return self._last_seq
+    
+    def add_listener(self, listener) -> None:
+        self._listeners.append(listener)
+    
+    def remove_listener(self, listener) -> None:
+        self._listeners.remove(listener)
+    
+    def append(self, changes: List[TaskChange]) -> None:
+        if not changes:
+            return
+        with self._lock:
+            self._entries.extend(changes)
+            self._last_seq = changes[-1].seq
+        for listener in self._listeners:
+            listener(changes)
+    
+    def since(self, seq: int, version: Optional[int] = None) -> Optional[List[TaskChange]]:
+        """Cambios con seq > `seq`; None si alguno ya salió del registro o no consta.
+        
+        Un seq mayor que el último también da None: viene de otra historia
+        (p. ej. un repositorio en memoria que se reinició). `version` es la del
+        almacén: si va por delante del registro, otro proceso escribió después.
+        """
+        with self._lock:
+            entries = list(self._entries)
+            last_seq = self._last_seq
+        if version is not None:
+            if seq == version:
+                return []
+            if version > last_seq:
+                return None
+        if seq > last_seq:
+            return None
+        if seq == last_seq:
+            return []
+        # Sin huecos: el registro debe cubrir desde el cambio siguiente a `seq`
+        floor = entries[0].seq - 1 if entries else last_seq
+        if seq < floor:
+            return None
+        keys = [change.seq for change in entries]
+        tail = entries[bisect_right(keys, seq):]
+        # Otro proceso pudo escribir en el mismo almacén (SQLite con varios workers):
+        # si falta algún seq intermedio no se sabe qué cambió
+        if tail and tail[-1].seq - seq != len(tail):
+            return None
+        return tail
+
 class TaskRepository:
     """Interface para repositorio de tareas (Abstracción)"""
+    # Si las operaciones bloquean en E/S, la capa asíncrona las delega al threadpool
+    blocking_io = True
+    # Últimos cambios aplicados (lo asigna cada implementación)
+    changes: ChangeLog
+    
+    @property
+    def version(self) -> int:
+        """Contador global que aumenta con cada escritura"""
+        raise NotImplementedError
+    
+    def get_version(self, task_id: str) -> Optional[int]:
+        """Versión de la última escritura de una tarea, sin construir el Task"""
+        raise NotImplementedError
+    
+    def count(self) -> int:
+        raise NotImplementedError
+    
+    def index_sizes(self) -> dict[str, dict[str, int]]:
+        """Entradas por valor en cada índice secundario (para métricas)"""
+        raise NotImplementedError
+    
+    def stats(self, now: datetime) -> TaskStatistics:
+        """Conteos mantenidos en cada escritura, sin recorrer las tareas"""
+        raise NotImplementedError
+    
+    def search(self, query: str, limit: int) -> List[Task]:
+        """Búsqueda de texto en título y descripción, por relevancia (BM25)"""
+        raise NotImplementedError
+    
     def create(self, task: TaskCreate) -> Task:
         raise NotImplementedError
     
@@ -83,53 +346,1993 @@ class TaskRepository:
     def get_by_id(self, task_id: str) -> Optional[Task]:
         raise NotImplementedError
     
-    def update(self, task_id: str, task_update: TaskUpdate) -> Optional[Task]:
+    def update(self, task_id: str, task_update: TaskUpdate,
+               expected_version: Optional[int] = None) -> Optional[Task]:
+        """Si `expected_version` no coincide lanza VersionConflictError"""
         raise NotImplementedError
     
     def delete(self, task_id: str) -> bool:
         raise NotImplementedError
+    
+    def find(self, filters: TaskQuery, limit: Optional[int] = None,
+             after: Optional[tuple] = None,
+             explain: bool = False) -> tuple[List[Task], Optional[QueryPlan]]:
+        """Tareas que cumplen `filters`, en el orden de `filters.order`.
+        
+        `after` es la clave de orden de la última tarea ya vista: (created_at, id)
+        o (due_date, created_at, id). Con `explain` devuelve también el plan usado.
+        """
+        raise NotImplementedError
+    
+    def query(self, status: Optional[TaskStatus] = None,
+              priority: Optional[TaskPriority] = None,
+              assigned_to: Optional[str] = None,
+              limit: Optional[int] = None,
+              after: Optional[tuple] = None) -> List[Task]:
+        """Tareas filtradas, de la más reciente a la más antigua.
+        
+        `after` es una clave (created_at, id): solo se devuelven tareas anteriores a ella.
+        """
+        filters = TaskQuery(status=status, priority=priority, assigned_to=assigned_to)
+        return self.find(filters, limit, after)[0]
+    
+    def query_due(self, due_after: Optional[datetime] = None,
+                  due_before: Optional[datetime] = None,
+                  open_only: bool = False,
+                  status: Optional[TaskStatus] = None,
+                  priority: Optional[TaskPriority] = None,
+                  assigned_to: Optional[str] = None,
+                  limit: Optional[int] = None,
+                  after: Optional[tuple] = None) -> List[Task]:
+        """Tareas con fecha límite en [due_after, due_before), de la más próxima a la lejana.
+        
+        `open_only` excluye completadas y canceladas. `after` es una clave
+        (due_date, created_at, id): solo se devuelven tareas posteriores a ella.
+        """
+        filters = TaskQuery(status=status, priority=priority, assigned_to=assigned_to,
+                            due_after=due_after, due_before=due_before, dated=True,
+                            open_only=open_only)
+        return self.find(filters, limit, after)[0]
+    
+    def scan(self, filters: TaskQuery, limit: int,
+             after: Optional[tuple] = None) -> List[Task]:
+        """Un lote de iter_tasks: como find, sin plan.
+        
+        Una implementación puede preferir aquí un plan peor para una página suelta
+        pero que no ordene todas las coincidencias en cada lote.
+        """
+        return self.find(filters, limit, after)[0]
+    
+    def iter_tasks(self, filters: TaskQuery, batch_size: int = 500) -> Iterator[Task]:
+        """Todas las tareas que cumplen `filters`, en su orden, una a una.
+        
+        Se leen por lotes de `batch_size` continuando desde la clave de la última
+        (como el cursor de paginación): la memoria no depende del total y las
+        escrituras concurrentes no bloquean ni invalidan el recorrido.
+        """
+        after = None
+        while True:
+            batch = self.scan(filters, batch_size, after)
+            yield from batch
+            if len(batch) < batch_size:
+                return
+            after = filters.sort_key(batch[-1])
+    
+    def create_many(self, tasks: List[TaskCreate]) -> List[Task]:
+        raise NotImplementedError
+    
+    def update_many(self, updates: List[tuple[str, TaskUpdate]]) -> List[Optional[Task]]:
+        raise NotImplementedError
+    
+    def delete_many(self, task_ids: List[str]) -> List[bool]:
+        raise NotImplementedError
 
-class InMemoryTaskRepository(TaskRepository):
-    """Implementación concreta del repositorio en memoria"""
+class _SortedKeyList:
+    """Lista ordenada por bloques: búsqueda O(log n), recorrido sin sort.
+    
+    Copy-on-write: cada escritura publica bloques nuevos en una sola asignación,
+    así los lectores recorren una instantánea inmutable sin tomar locks. El precio
+    lo pagan los escritores: add/discard copian la tupla de bloques y el bloque
+    afectado, O(n/_LOAD + _LOAD) por escritura en lugar de O(log n).
+    Las escrituras deben serializarse desde fuera (lock del repositorio).
+    """
+    _LOAD = 512
+    
+    def __init__(self):
+        # (bloques, máximo de cada bloque, longitud), siempre tuplas
+        self._state: tuple = ((), (), 0)
+    
+    def __len__(self) -> int:
+        return self._state[2]
+    
+    @classmethod
+    def from_sorted(cls, keys: list) -> "_SortedKeyList":
+        """Construir de una vez a partir de claves ya ordenadas, sin inserciones"""
+        result = cls()
+        lists = tuple(tuple(keys[i:i + cls._LOAD]) for i in range(0, len(keys), cls._LOAD))
+        result._state = (lists, tuple(sub[-1] for sub in lists), len(keys))
+        return result
+    
+    def add(self, key) -> None:
+        lists, maxes, length = self._state
+        if not maxes:
+            self._state = (((key,),), (key,), 1)
+            return
+        
+        pos = bisect_left(maxes, key)
+        if pos == len(maxes):
+            # Caso habitual: la clave nueva es la mayor (orden de creación)
+            pos -= 1
+            sub = lists[pos] + (key,)
+        else:
+            sub = lists[pos]
+            i = bisect_left(sub, key)
+            sub = sub[:i] + (key,) + sub[i:]
+        
+        if len(sub) > 2 * self._LOAD:
+            new_lists = (sub[:self._LOAD], sub[self._LOAD:])
+            new_maxes = (sub[self._LOAD - 1], sub[-1])
+        else:
+            new_lists, new_maxes = (sub,), (sub[-1],)
+        self._state = (lists[:pos] + new_lists + lists[pos + 1:],
+                       maxes[:pos] + new_maxes + maxes[pos + 1:],
+                       length + 1)
+    
+    def discard(self, key) -> bool:
+        lists, maxes, length = self._state
+        pos = bisect_left(maxes, key)
+        if pos == len(maxes):
+            return False
+        sub = lists[pos]
+        i = bisect_left(sub, key)
+        if i == len(sub) or sub[i] != key:
+            return False
+        
+        sub = sub[:i] + sub[i + 1:]
+        new_lists, new_maxes = ((sub,), (sub[-1],)) if sub else ((), ())
+        self._state = (lists[:pos] + new_lists + lists[pos + 1:],
+                       maxes[:pos] + new_maxes + maxes[pos + 1:],
+                       length - 1)
+        return True
+    
+    def count_before(self, key) -> int:
+        """Cuántas claves son < key, sin recorrerlas"""
+        lists, maxes, length = self._state
+        pos = bisect_left(maxes, key)
+        if pos == len(maxes):
+            return length
+        return sum(len(sub) for sub in lists[:pos]) + bisect_left(lists[pos], key)
+    
+    def iter_from(self, start):
+        """Recorrer las claves >= start de menor a mayor"""
+        lists, maxes, _ = self._state
+        pos = bisect_left(maxes, start)
+        if pos == len(maxes):
+            return
+        sub = lists[pos]
+        for i in range(bisect_left(sub, start), len(sub)):
+            yield sub[i]
+        for j in range(pos + 1, len(lists)):
+            yield from lists[j]
+    
+    def iter_desc(self, before=None):
+        """Recorrer las claves de mayor a menor, opcionalmente solo las < before"""
+        lists, maxes, _ = self._state
+        if not lists:
+            return
+        if before is None:
+            pos, stop = len(lists) - 1, len(lists[-1])
+        else:
+            pos = bisect_left(maxes, before)
+            if pos == len(maxes):
+                pos, stop = pos - 1, len(lists[-1])
+            else:
+                stop = bisect_left(lists[pos], before)
+        
+        sub = lists[pos]
+        for i in range(stop - 1, -1, -1):
+            yield sub[i]
+        for j in range(pos - 1, -1, -1):
+            yield from reversed(lists[j])
+
+_WORD = re.compile(r"\w+")
+
+def search_terms(text: Optional[str]) -> List[str]:
+    """Tokens en minúsculas y sin tildes ("Revisión" -> "revision")"""
+    if not text:
+        return []
+    if text.isascii():
+        return _WORD.findall(text.lower())
+    decomposed = unicodedata.normalize("NFKD", text)
+    folded = "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+    return _WORD.findall(folded)
+
+class _SearchIndex:
+    """Índice invertido sobre título y descripción con ranking BM25.
+    
+    Cada término de la consulta se busca como prefijo y todos deben aparecer;
+    el término más selectivo elige los candidatos y el resto solo se consulta.
+    """
+    K1 = 1.2
+    B = 0.75
+    TITLE_WEIGHT = 2
+    # Tope de términos por prefijo al puntuar, para que "a" no recorra todo el vocabulario
+    # (el filtro de find, en cambio, necesita el rango completo)
+    MAX_PREFIX_TERMS = 64
+    
     def __init__(self):
-        self._tasks: dict[str, Task] = {}
+        self._postings: dict[str, dict[str, int]] = {}
+        self._terms = _SortedKeyList()
+        self._lengths: dict[str, int] = {}
+        self._total_length = 0
+    
+    @classmethod
+    def _term_counts(cls, title: str, description: Optional[str]) -> Counter:
+        counts = Counter(search_terms(description))
+        for term in search_terms(title):
+            counts[term] += cls.TITLE_WEIGHT
+        return counts
+    
+    def add(self, doc_id: str, title: str, description: Optional[str]) -> None:
+        counts = self._term_counts(title, description)
+        for term, tf in counts.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                self._terms.add(term)
+            postings[doc_id] = tf
+        length = sum(counts.values())
+        self._lengths[doc_id] = length
+        self._total_length += length
+    
+    def add_many(self, docs) -> None:
+        """Alta masiva (arranque): el vocabulario ordenado se construye una sola vez"""
+        postings_of = self._postings
+        for doc_id, title, description in docs:
+            counts = self._term_counts(title, description)
+            for term, tf in counts.items():
+                postings = postings_of.get(term)
+                if postings is None:
+                    postings = postings_of[term] = {}
+                postings[doc_id] = tf
+            length = sum(counts.values())
+            self._lengths[doc_id] = length
+            self._total_length += length
+        self._terms = _SortedKeyList.from_sorted(sorted(postings_of))
+    
+    def remove(self, doc_id: str, title: str, description: Optional[str]) -> None:
+        for term in self._term_counts(title, description):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[term]
+                self._terms.discard(term)
+        self._total_length -= self._lengths.pop(doc_id, 0)
+    
+    def _expand(self, prefix: str, limit: Optional[int] = None) -> List[str]:
+        """Términos que empiezan por `prefix`, en orden (los `limit` primeros)"""
+        terms = takewhile(lambda term: term.startswith(prefix), self._terms.iter_from(prefix))
+        return list(islice(terms, limit))
+    
+    def _token_postings(self, query: str) -> List[List[dict[str, int]]]:
+        """Por token de la consulta: postings de todos los términos que empiezan por él"""
+        return [[self._postings[term] for term in self._expand(token) if term in self._postings]
+                for token in dict.fromkeys(search_terms(query))]
+    
+    def estimate(self, query: str) -> int:
+        """Cota de coincidencias: postings del token más selectivo"""
+        groups = self._token_postings(query)
+        return min((sum(map(len, group)) for group in groups), default=0)
+    
+    def matching(self, query: str) -> set[str]:
+        """IDs que contienen todos los tokens, sin puntuar"""
+        groups = sorted(self._token_postings(query), key=lambda group: sum(map(len, group)))
+        if not groups:
+            return set()
+        candidates = set()
+        for postings in groups[0]:
+            candidates.update(list(postings))
+        for group in groups[1:]:
+            candidates = {doc_id for doc_id in candidates
+                          if any(doc_id in postings for postings in group)}
+        return candidates
+    
+    def search(self, query: str, limit: int) -> List[tuple[float, str]]:
+        """Los `limit` mejores (puntuación, id)"""
+        docs = len(self._lengths)
+        tokens = list(dict.fromkeys(search_terms(query)))
+        if not docs or not tokens:
+            return []
+        
+        # Por token: [(idf, postings)] de cada término que empieza por él
+        groups = []
+        for token in tokens:
+            group = []
+            for term in self._expand(token, self.MAX_PREFIX_TERMS):
+                postings = self._postings.get(term)
+                if postings:
+                    idf = math.log(1 + (docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                    group.append((idf, postings))
+            if not group:
+                return []
+            groups.append(group)
+        groups.sort(key=lambda group: sum(len(postings) for _, postings in group))
+        avgdl = self._total_length / docs or 1
+        if len(groups) == 1:
+            return self._top_union(groups[0], limit, avgdl)
+        
+        candidates = set()
+        for _, postings in groups[0]:
+            candidates.update(list(postings))
+        
+        k1, b = self.K1, self.B
+        lengths = self._lengths
+        
+        def score(doc_id: str) -> Optional[float]:
+            length = lengths.get(doc_id)
+            if length is None:
+                return None
+            norm = k1 * (1 - b + b * length / avgdl)
+            total = 0.0
+            for group in groups:
+                partial = 0.0
+                for idf, postings in group:
+                    tf = postings.get(doc_id)
+                    if tf:
+                        partial += idf * tf * (k1 + 1) / (tf + norm)
+                if not partial:
+                    return None
+                total += partial
+            return total
+        
+        scored = ((value, doc_id) for doc_id in candidates
+                  if (value := score(doc_id)) is not None)
+        return heapq.nlargest(limit, scored)
+    
+    def _top_union(self, group: list, limit: int, avgdl: float) -> List[tuple[float, str]]:
+        """Top-k de un único token (unión de sus términos) con poda MaxScore.
+        
+        Los términos se recorren de más raro a más común; en cuanto la suma de
+        cotas de los que faltan no alcanza al k-ésimo mejor, una tarea nueva ya no
+        puede entrar y los términos comunes solo se consultan para las ya vistas.
+        """
+        k1, b = self.K1, self.B
+        lengths = self._lengths
+        group = sorted(group, key=lambda item: item[0], reverse=True)
+        # Cota de un término: su aporte con tf -> infinito
+        remaining = list(accumulate(idf * (k1 + 1) for idf, _ in reversed(group)))[::-1]
+        
+        scores: dict[str, float] = {}
+        for i, (idf, postings) in enumerate(group):
+            if len(scores) >= limit:
+                threshold = heapq.nlargest(limit, scores.values())[-1]
+                if threshold >= remaining[i]:
+                    scores = {doc_id: value for doc_id, value in scores.items()
+                              if value + remaining[i] >= threshold}
+                    for idf_rest, postings_rest in group[i:]:
+                        for doc_id in scores:
+                            tf = postings_rest.get(doc_id)
+                            if tf:
+                                norm = k1 * (1 - b + b * lengths.get(doc_id, 0) / avgdl)
+                                scores[doc_id] += idf_rest * tf * (k1 + 1) / (tf + norm)
+                    break
+            for doc_id, tf in list(postings.items()):
+                length = lengths.get(doc_id)
+                if length is None:
+                    continue
+                norm = k1 * (1 - b + b * length / avgdl)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+        return heapq.nlargest(limit, ((value, doc_id) for doc_id, value in scores.items()))
+
+@dataclass(slots=True)
+class _TaskRecord:
+    """Fila compacta del repositorio en memoria; se convierte a Task solo al salir"""
+    id: str
+    title: str
+    description: Optional[str]
+    priority: TaskPriority
+    status: TaskStatus
+    assigned_to: Optional[str]
+    due_date: Optional[datetime]
+    created_at: datetime
+    updated_at: datetime
+    version: int
+    
+    def to_task(self) -> Task:
+        # Los datos ya se validaron al entrar: construir sin volver a validar
+        task = Task.model_construct(
+            id=self.id,
+            title=self.title,
+            description=self.description,
+            priority=self.priority,
+            status=self.status,
+            assigned_to=self.assigned_to,
+            due_date=self.due_date,
+            created_at=self.created_at,
+            updated_at=self.updated_at
+        )
+        task._version = self.version
+        return task
+
+class TaskWriteAheadLog:
+    """Persistencia opcional de InMemoryTaskRepository: WAL binario + snapshots.
+    
+    Cada cambio se añade a `wal.log` como una trama [longitud, crc32, op, seq, campos]
+    desde el listener del ChangeLog, aún bajo el lock de escritura del repositorio.
+    `fsync` decide cuándo llega al disco: "always" (antes de responder, con
+    wait_durable ya fuera del lock del repositorio; un fsync cubre a todos los
+    escritores que esperaban), "interval" (un hilo cada `fsync_interval` s)
+    o "never" (lo decide el SO).
+    Tras `snapshot_every` cambios el repositorio escribe `snapshot.bin` y el log
+    anterior se descarta; al arrancar se carga el snapshot y se reaplica el log.
+    """
+    _FRAME = struct.Struct("<IIBQ")  # longitud, crc32, op, seq
+    _FIELD = struct.Struct("<i")  # longitud de un campo; -1 es None
+    _OPS = {"created": 1, "updated": 2, "deleted": 3}
+    _SNAPSHOT_MAGIC = b"TASKSNAP1"
+    
+    def __init__(self, directory: str, fsync: str = "interval",
+                 fsync_interval: float = 0.01, snapshot_every: int = 100_000):
+        if fsync not in ("always", "interval", "never"):
+            raise ValueError(f"Unknown fsync mode: {fsync}")
+        os.makedirs(directory, exist_ok=True)
+        self._dir = directory
+        self._fsync = fsync
+        self._fsync_interval = fsync_interval
+        self._snapshot_every = snapshot_every
+        self._lock = threading.Lock()
+        # Un fsync a la vez (group commit); nunca se toma dentro de `_lock`
+        self._sync_lock = threading.Lock()
+        self._file = None
+        # Log rotado que aún no se ha llevado a disco (ver finish_rotation)
+        self._rotated = None
+        self._dirty = False
+        self._pending = 0
+        # Último seq escrito en el fichero y último seq ya en disco
+        self._written_seq = 0
+        self._durable_seq = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def _path(self, name: str) -> str:
+        return os.path.join(self._dir, name)
+    
+    # --- codificación ---
+    
+    @classmethod
+    def _fields(cls, values) -> bytes:
+        parts = []
+        for value in values:
+            if value is None:
+                parts.append(cls._FIELD.pack(-1))
+            else:
+                data = value.encode()
+                parts.append(cls._FIELD.pack(len(data)))
+                parts.append(data)
+        return b"".join(parts)
+    
+    @classmethod
+    def _frame(cls, op: str, seq: int, payload: bytes) -> bytes:
+        code = cls._OPS[op]
+        crc = zlib.crc32(payload, zlib.crc32(struct.pack("<BQ", code, seq)))
+        return cls._FRAME.pack(len(payload), crc, code, seq) + payload
+    
+    @classmethod
+    def record_payload(cls, task) -> bytes:
+        """Campos de la fila completa (Task o _TaskRecord), sin cabecera"""
+        due = task.due_date.isoformat() if task.due_date is not None else None
+        return cls._fields((
+            task.id, task.title, task.description, task.priority.value, task.status.value,
+            task.assigned_to, due, task.created_at.isoformat(), task.updated_at.isoformat()
+        ))
+    
+    @classmethod
+    def decode_record(cls, seq: int, payload) -> _TaskRecord:
+        return cls._to_record(seq, cls._decode_fields(payload))
+    
+    @classmethod
+    def encode_record(cls, op: str, seq: int, task) -> bytes:
+        """Trama de alta/cambio con la fila completa"""
+        return cls._frame(op, seq, cls.record_payload(task))
+    
+    @classmethod
+    def encode_change(cls, change: TaskChange) -> bytes:
+        if change.op == "deleted":
+            return cls._frame(change.op, change.seq, cls._fields((change.task_id,)))
+        return cls.encode_record(change.op, change.seq, change.task)
+    
+    @classmethod
+    def _decode_fields(cls, payload: bytes) -> List[Optional[str]]:
+        values, offset = [], 0
+        while offset < len(payload):
+            (size,) = cls._FIELD.unpack_from(payload, offset)
+            offset += cls._FIELD.size
+            if size < 0:
+                values.append(None)
+            else:
+                values.append(str(payload[offset:offset + size], "utf-8"))
+                offset += size
+        return values
+    
+    @classmethod
+    def _read_frames(cls, data: bytes, offset: int = 0):
+        """(op, seq, campos, fin) de cada trama íntegra; para en la primera rota"""
+        header = cls._FRAME.size
+        while offset + header <= len(data):
+            size, crc, code, seq = cls._FRAME.unpack_from(data, offset)
+            end = offset + header + size
+            payload = data[offset + header:end]
+            if end > len(data) or zlib.crc32(
+                    payload, zlib.crc32(struct.pack("<BQ", code, seq))) != crc:
+                return
+            yield code, seq, cls._decode_fields(payload), end
+            offset = end
+    
+    @staticmethod
+    def _to_record(seq: int, fields: List[Optional[str]]) -> _TaskRecord:
+        task_id, title, description, priority, status_, assigned_to, due, created, updated = fields
+        return _TaskRecord(
+            id=task_id,
+            title=title,
+            description=description,
+            priority=TaskPriority(priority),
+            status=TaskStatus(status_),
+            assigned_to=assigned_to,
+            due_date=datetime.fromisoformat(due) if due is not None else None,
+            created_at=datetime.fromisoformat(created),
+            updated_at=datetime.fromisoformat(updated),
+            version=seq
+        )
+    
+    # --- arranque ---
+    
+    def recover(self) -> tuple[int, dict[str, _TaskRecord]]:
+        """Cargar el snapshot y reaplicar los logs; devuelve (versión, tareas por id)"""
+        version, tasks = 0, {}
+        try:
+            with open(self._path("snapshot.bin"), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            data = b""
+        if data:
+            magic = self._SNAPSHOT_MAGIC
+            if not data.startswith(magic):
+                raise ValueError("Invalid snapshot file")
+            (version,) = struct.unpack_from("<Q", data, len(magic))
+            for _, seq, fields, _ in self._read_frames(data, len(magic) + 8):
+                tasks[fields[0]] = self._to_record(seq, fields)
+        
+        deleted = self._OPS["deleted"]
+        for name in ("wal.log.old", "wal.log"):
+            try:
+                with open(self._path(name), "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                continue
+            valid = 0
+            for code, seq, fields, end in self._read_frames(data):
+                valid = end
+                if seq <= version:
+                    continue  # ya incluido en el snapshot
+                version = seq
+                if code == deleted:
+                    tasks.pop(fields[0], None)
+                else:
+                    tasks[fields[0]] = self._to_record(seq, fields)
+            if valid < len(data):
+                # Cola a medio escribir (caída durante un append): se descarta
+                with open(self._path(name), "r+b") as f:
+                    f.truncate(valid)
+        
+        if os.path.exists(self._path("wal.log.old")):
+            # Una compactación anterior no llegó a terminar: completarla con lo recuperado
+            self.write_snapshot(version, list(tasks.values()))
+        return version, tasks
+    
+    def start(self, changes: ChangeLog, snapshot) -> None:
+        """Empezar a registrar `changes`; `snapshot()` compacta el log cuando toca"""
+        self._file = open(self._path("wal.log"), "ab", buffering=0)
+        self._snapshot = snapshot
+        self._written_seq = self._durable_seq = changes.last_seq
+        changes.add_listener(self._on_changes)
+        self._thread = threading.Thread(target=self._run, name="task-wal", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+    
+    # --- escritura ---
+    
+    def _on_changes(self, changes: List[TaskChange]) -> None:
+        data = b"".join(self.encode_change(change) for change in changes)
+        with self._lock:
+            self._file.write(data)
+            self._pending += len(changes)
+            self._written_seq = changes[-1].seq
+            self._dirty = True
+    
+    def wait_durable(self, seq: int) -> None:
+        """Con fsync="always", volver cuando `seq` ya esté en disco (fuera del lock del repo)"""
+        if self._fsync != "always":
+            return
+        with self._sync_lock:
+            if self._durable_seq >= seq:
+                # El fsync de otro escritor ya lo cubrió
+                return
+            with self._lock:
+                files = [f for f in (self._rotated, self._file) if f is not None]
+                target = self._written_seq
+                self._dirty = False
+            for f in files:
+                os.fsync(f.fileno())
+            self._durable_seq = target
+    
+    def _sync(self) -> None:
+        with self._lock:
+            if self._dirty and self._file is not None:
+                os.fsync(self._file.fileno())
+                self._dirty = False
+    
+    def _run(self) -> None:
+        interval = self._fsync_interval if self._fsync == "interval" else 0.5
+        while not self._stop.wait(interval):
+            if self._fsync == "interval":
+                self._sync()
+            if self._pending >= self._snapshot_every:
+                self._snapshot()
+    
+    def rotate(self):
+        """Renombrar `wal.log` a `wal.log.old` y seguir en uno vacío.
+        
+        Se llama bajo el lock del repositorio, así que no sincroniza: devuelve el
+        fichero anterior para cerrarlo con finish_rotation ya fuera del lock.
+        """
+        with self._lock:
+            old = self._rotated = self._file
+            os.replace(self._path("wal.log"), self._path("wal.log.old"))
+            self._file = open(self._path("wal.log"), "ab", buffering=0)
+            self._dirty = False
+            self._pending = 0
+        return old
+    
+    def finish_rotation(self, old) -> None:
+        """Llevar a disco y cerrar el log anterior (antes de escribir el snapshot)"""
+        with self._sync_lock:
+            os.fsync(old.fileno())
+            with self._lock:
+                self._rotated = None
+            old.close()
+    
+    def write_snapshot(self, version: int, records: List[_TaskRecord]) -> None:
+        """Escribir el snapshot de forma atómica y descartar el log que cubre"""
+        tmp = self._path("snapshot.tmp")
+        with open(tmp, "wb") as f:
+            f.write(self._SNAPSHOT_MAGIC + struct.pack("<Q", version))
+            for start in range(0, len(records), 10_000):
+                f.write(b"".join(self.encode_record("created", record.version, record)
+                                 for record in records[start:start + 10_000]))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._path("snapshot.bin"))
+        self._fsync_dir()
+        try:
+            os.remove(self._path("wal.log.old"))
+        except FileNotFoundError:
+            pass
+    
+    def _fsync_dir(self) -> None:
+        # Que los renombrados sobrevivan a una caída (no existe en Windows)
+        if hasattr(os, "O_DIRECTORY"):
+            fd = os.open(self._dir, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+    
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        with self._sync_lock, self._lock:
+            if self._file is not None:
+                os.fsync(self._file.fileno())
+                self._file.close()
+                self._file = None
+        atexit.unregister(self.close)
+
+class MappedTaskSnapshot:
+    """Snapshot de disposición fija (tabla de tareas + índices) leído con mmap.
+    
+    Abrirlo solo valida la cabecera: cada fila se decodifica cuando una petición
+    la toca. Las filas van en orden (created_at, id), así que el número de fila
+    ya es el orden de creación y los índices son arrays de números de fila.
+    Secciones alineadas a 8 bytes, enteros y reales en el orden nativo.
+    """
+    MAGIC = b"TASKMAP1"
+    _HEADER = struct.Struct("<8sQII")  # magic, versión, tareas, secciones
+    _SECTION = struct.Struct("<QQ")  # desplazamiento, longitud
+    _SECTIONS = ("offsets", "records", "versions", "ids", "buckets", "bucket_dir",
+                 "assignees", "assignee_rows", "open_due")
+    _ID = struct.Struct("<36sI")  # id (UUID en texto) -> fila, ordenado por id
+    _ASSIGNEE = struct.Struct("<HII")  # longitud del nombre, inicio y número de filas
+    
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.version, self.count, sections = self._HEADER.unpack_from(self._map, 0)
+        if magic != self.MAGIC or sections != len(self._SECTIONS):
+            raise ValueError(f"Invalid task snapshot: {path}")
+        view = memoryview(self._map)
+        self._bounds = {}
+        for i, name in enumerate(self._SECTIONS):
+            offset, length = self._SECTION.unpack_from(
+                self._map, self._HEADER.size + i * self._SECTION.size)
+            self._bounds[name] = (offset, length)
+        section = {name: view[offset:offset + length]
+                   for name, (offset, length) in self._bounds.items()}
+        
+        self._offsets = section["offsets"].cast("Q")
+        self._records = section["records"]
+        self._versions = section["versions"].cast("Q")
+        rows, directory = section["buckets"].cast("I"), section["bucket_dir"].cast("I")
+        buckets = []
+        for i in range(len(TaskStatus) + len(TaskPriority)):
+            start, size = directory[2 * i], directory[2 * i + 1]
+            buckets.append(rows[start:start + size])
+        self._by_status = dict(zip(TaskStatus, buckets))
+        self._by_priority = dict(zip(TaskPriority, buckets[len(TaskStatus):]))
+        self._assignee_rows = section["assignee_rows"].cast("I")
+        self._by_assignee: Optional[dict] = None
+        self._open_due = section["open_due"].cast("d")
+    
+    # --- lectura ---
+    
+    def record(self, row: int) -> _TaskRecord:
+        payload = self._records[self._offsets[row]:self._offsets[row + 1]]
+        return TaskWriteAheadLog.decode_record(self._versions[row], payload)
+    
+    def row_of(self, task_id: str) -> Optional[int]:
+        """Búsqueda binaria en la tabla de ids, sin diccionario en memoria"""
+        key = task_id.encode()
+        if len(key) != 36:
+            return None
+        base, size = self._bounds["ids"][0], self._ID.size
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._map[base + mid * size:base + mid * size + 36] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count:
+            found, row = self._ID.unpack_from(self._map, base + lo * size)
+            if found == key:
+                return row
+        return None
+    
+    def get(self, task_id: str) -> Optional[_TaskRecord]:
+        row = self.row_of(task_id)
+        return self.record(row) if row is not None else None
+    
+    def get_version(self, task_id: str) -> Optional[int]:
+        row = self.row_of(task_id)
+        return self._versions[row] if row is not None else None
+    
+    def _assignees(self) -> dict:
+        # Pocos responsables distintos: el directorio se lee entero la primera vez
+        if self._by_assignee is None:
+            by_assignee, offset = {}, self._bounds["assignees"][0]
+            end = offset + self._bounds["assignees"][1]
+            while offset < end:
+                length, start, size = self._ASSIGNEE.unpack_from(self._map, offset)
+                offset += self._ASSIGNEE.size
+                name = self._map[offset:offset + length].decode()
+                offset += length
+                by_assignee[name] = self._assignee_rows[start:start + size]
+            self._by_assignee = by_assignee
+        return self._by_assignee
+    
+    def index_sizes(self) -> dict[str, dict[str, int]]:
+        return {
+            name: {getattr(value, "value", value): len(rows)
+                   for value, rows in index.items() if len(rows)}
+            for name, index in (("status", self._by_status),
+                                ("priority", self._by_priority),
+                                ("assigned_to", self._assignees()))
+        }
+    
+    def stats(self, now: datetime) -> TaskStatistics:
+        return TaskStatistics(
+            total=self.count,
+            by_status={s: len(rows) for s, rows in self._by_status.items()},
+            by_priority={p: len(rows) for p, rows in self._by_priority.items()},
+            overdue=bisect_left(self._open_due, as_local_naive(now).timestamp())
+        )
+    
+    def _key(self, row: int) -> tuple:
+        record = self.record(row)
+        return (record.created_at, record.id)
+    
+    def find(self, filters: TaskQuery, match, limit: Optional[int] = None,
+             after: Optional[tuple] = None,
+             explain: bool = False) -> tuple[List[Task], Optional[QueryPlan]]:
+        """Solo estado, prioridad y responsable, en orden de creación descendente"""
+        candidates = [("all", range(self.count))]
+        for name, index, value in (("status", self._by_status, filters.status),
+                                   ("priority", self._by_priority, filters.priority),
+                                   ("assigned_to", self._assignees(), filters.assigned_to)):
+            if value is not None:
+                candidates.append((name, index.get(value, range(0))))
+        driver, rows = min(candidates, key=lambda c: len(c[1]))
+        
+        stop = len(rows)
+        if after is not None:
+            # Primera fila >= after (O(log n) filas decodificadas) y su posición en el índice
+            lo, hi = 0, self.count
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self._key(mid) < after:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            stop = bisect_left(rows, lo)
+        records = (self.record(rows[i]) for i in range(stop - 1, -1, -1))
+        page = list(islice((r for r in records if match(r)), limit))
+        
+        plan = None
+        if explain:
+            plan = QueryPlan(
+                driver=driver,
+                strategy="index_scan",
+                estimates={name: len(rows) for name, rows in candidates},
+                residual=[name for name in filters.active() if name != driver],
+                order=filters.order,
+                detail=["mmap snapshot (hydrating)"]
+            )
+        return [record.to_task() for record in page], plan
+    
+    def close(self) -> None:
+        """Solo para el dueño exclusivo del snapshot: invalida las vistas de otros lectores"""
+        self._offsets = self._records = self._versions = self._assignee_rows = None
+        self._by_status = self._by_priority = self._by_assignee = self._open_due = None
+        try:
+            self._map.close()
+        except BufferError:
+            pass  # aún hay vistas vivas en algún lector; se cierra al recolectarlas
+    
+    # --- escritura ---
+    
+    @classmethod
+    def write(cls, path: str, version: int, records: List[_TaskRecord]) -> None:
+        """Escribir el snapshot de forma atómica (tmp + fsync + rename)"""
+        records = sorted(records, key=lambda r: (r.created_at, r.id))
+        payloads = [TaskWriteAheadLog.record_payload(record) for record in records]
+        offsets = array("Q", [0])
+        for payload in payloads:
+            offsets.append(offsets[-1] + len(payload))
+        
+        ids = []
+        for row, record in enumerate(records):
+            key = record.id.encode()
+            if len(key) != 36:
+                raise ValueError(f"Task id is not a UUID: {record.id}")
+            ids.append((key, row))
+        ids.sort()
+        
+        buckets, directory = array("I"), array("I")
+        for field, values in (("status", TaskStatus), ("priority", TaskPriority)):
+            for value in values:
+                rows = [row for row, r in enumerate(records) if getattr(r, field) == value]
+                directory.extend((len(buckets), len(rows)))
+                buckets.extend(rows)
+        
+        by_assignee: dict[str, list] = {}
+        for row, record in enumerate(records):
+            if record.assigned_to is not None:
+                by_assignee.setdefault(record.assigned_to, []).append(row)
+        assignees, assignee_rows = [], array("I")
+        for name, rows in by_assignee.items():
+            encoded = name.encode()
+            assignees.append(cls._ASSIGNEE.pack(len(encoded), len(assignee_rows), len(rows)))
+            assignees.append(encoded)
+            assignee_rows.extend(rows)
+        
+        open_due = array("d", sorted(
+            as_local_naive(r.due_date).timestamp() for r in records
+            if r.due_date is not None and r.status not in CLOSED_STATUSES))
+        
+        sections = [offsets.tobytes(), b"".join(payloads),
+                    array("Q", [r.version for r in records]).tobytes(),
+                    b"".join(cls._ID.pack(key, row) for key, row in ids),
+                    buckets.tobytes(), directory.tobytes(), b"".join(assignees),
+                    assignee_rows.tobytes(), open_due.tobytes()]
+        
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            position = cls._HEADER.size + len(sections) * cls._SECTION.size
+            f.write(cls._HEADER.pack(cls.MAGIC, version, len(records), len(sections)))
+            layout = []
+            for data in sections:
+                position += -position % 8
+                layout.append((position, len(data)))
+                position += len(data)
+            for offset, length in layout:
+                f.write(cls._SECTION.pack(offset, length))
+            for (offset, _), data in zip(layout, sections):
+                f.write(b"\0" * (offset - f.tell()))
+                f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+class InMemoryTaskRepository(TaskRepository):
+    """Implementación concreta del repositorio en memoria.
+    
+    Concurrencia estilo RCU: las escrituras se serializan con `_write_lock` y
+    publican registros e índices nuevos en vez de mutarlos; las lecturas no
+    toman locks y ven cada tarea entera, antes o después de una escritura.
+    
+    Con `snapshot_path` arranca sobre un MappedTaskSnapshot: las lecturas simples
+    se sirven del mmap mientras un hilo construye las estructuras en memoria, y
+    las escrituras (y búsquedas, rangos de fechas...) esperan a que termine.
+    """
+    def __init__(self, change_log_size: int = 10_000,
+                 wal: Optional[TaskWriteAheadLog] = None,
+                 snapshot_path: Optional[str] = None):
+        self._write_lock = threading.Lock()
+        self.changes = ChangeLog(change_log_size)
+        # Los _TaskRecord publicados aquí no se mutan nunca: se reemplazan
+        self._tasks: dict[str, _TaskRecord] = {}
+        # Orden de creación (created_at, id) para listar sin ordenar
+        self._order = _SortedKeyList()
+        # Índices secundarios: valor del campo -> claves ordenadas por creación
+        self._by_status: dict[TaskStatus, _SortedKeyList] = {}
+        self._by_priority: dict[TaskPriority, _SortedKeyList] = {}
+        self._by_assignee: dict[str, _SortedKeyList] = {}
+        # Tareas con fecha límite (todas y solo abiertas), por (due_date, created_at, id)
+        self._by_due = _SortedKeyList()
+        self._open_due = _SortedKeyList()
+        self._search = _SearchIndex()
+        self._version = 0
+        
+        self._wal = wal
+        self._mapped: Optional[MappedTaskSnapshot] = None
+        self._hydrated = threading.Event()
+        self._hydrated.set()
+        if wal is not None:
+            self._version, tasks = wal.recover()
+            self._load(list(tasks.values()))
+            self.changes = ChangeLog(change_log_size, last_seq=self._version)
+            wal.start(self.changes, self.snapshot)
+        elif snapshot_path is not None:
+            self._mapped = MappedTaskSnapshot(snapshot_path)
+            self._version = self._mapped.version
+            self.changes = ChangeLog(change_log_size, last_seq=self._version)
+            self._hydrated.clear()
+            # El lock se suelta al terminar de hidratar: ninguna escritura se adelanta
+            self._write_lock.acquire()
+            threading.Thread(target=self._hydrate, name="task-hydrate", daemon=True).start()
+    
+    @property
+    def blocking_io(self) -> bool:
+        # Con WAL cada escritura va a disco (fsync="always") y puede esperar al lock
+        # mientras se compacta; mientras se hidrata, también: mejor en el threadpool
+        return self._wal is not None or not self._hydrated.is_set()
+    
+    @property
+    def version(self) -> int:
+        return self._version
+    
+    def _load(self, records: List[_TaskRecord]) -> None:
+        """Construir registros e índices de una vez (arranque), sin inserciones ordenadas"""
+        records.sort(key=self._key)
+        self._tasks = {record.id: record for record in records}
+        self._order = _SortedKeyList.from_sorted([self._key(r) for r in records])
+        for index, field in ((self._by_status, "status"), (self._by_priority, "priority"),
+                             (self._by_assignee, "assigned_to")):
+            buckets: dict = {}
+            for record in records:
+                value = getattr(record, field)
+                if value is not None:
+                    buckets.setdefault(value, []).append(self._key(record))
+            index.update((value, _SortedKeyList.from_sorted(keys))
+                         for value, keys in buckets.items())
+        for key_of, attribute in ((self._due_key, "_by_due"), (self._open_due_key, "_open_due")):
+            keys = sorted(key for key in map(key_of, records) if key is not None)
+            setattr(self, attribute, _SortedKeyList.from_sorted(keys))
+        self._search.add_many((r.id, r.title, r.description) for r in records)
+    
+    def _hydrate(self) -> None:
+        """Hilo de arranque: pasar el snapshot mapeado a memoria (con `_write_lock` tomado)"""
+        mapped = self._mapped
+        try:
+            self._load([mapped.record(row) for row in range(mapped.count)])
+            self._mapped = None
+        finally:
+            self._hydrated.set()
+            self._write_lock.release()
+        # Sin close(): un lector del threadpool puede seguir a mitad de mapped.find/get;
+        # el mmap se libera al recolectar la última referencia
+    
+    def wait_until_loaded(self, timeout: Optional[float] = None) -> bool:
+        """Esperar a que termine la hidratación desde el snapshot mapeado"""
+        return self._hydrated.wait(timeout)
+    
+    def export_snapshot(self, path: str) -> None:
+        """Escribir un MappedTaskSnapshot con el estado actual (p. ej. para el despliegue)"""
+        self.wait_until_loaded()
+        with self._write_lock:
+            records = list(self._tasks.values())
+            version = self._version
+        MappedTaskSnapshot.write(path, version, records)
+    
+    def snapshot(self) -> None:
+        """Volcar todas las tareas a un snapshot y truncar el WAL (sin WAL no hace nada)"""
+        if self._wal is None:
+            return
+        with self._write_lock:
+            # Copia O(n) de referencias: los registros son inmutables
+            records = list(self._tasks.values())
+            version = self._version
+            old = self._wal.rotate()
+        # El fsync del log anterior no retiene a los escritores
+        self._wal.finish_rotation(old)
+        self._wal.write_snapshot(version, records)
+    
+    def close(self) -> None:
+        if self._wal is not None:
+            self._wal.close()
+    
+    def get_version(self, task_id: str) -> Optional[int]:
+        mapped = self._mapped
+        if mapped is not None:
+            return mapped.get_version(task_id)
+        record = self._tasks.get(task_id)
+        return record.version if record else None
+    
+    def count(self) -> int:
+        mapped = self._mapped
+        return mapped.count if mapped is not None else len(self._tasks)
+    
+    def index_sizes(self) -> dict[str, dict[str, int]]:
+        mapped = self._mapped
+        if mapped is not None:
+            return mapped.index_sizes()
+        return {
+            name: {getattr(value, "value", value): len(bucket)
+                   for value, bucket in list(index.items())}
+            for name, index in (("status", self._by_status),
+                                ("priority", self._by_priority),
+                                ("assigned_to", self._by_assignee))
+        }
+    
+    def stats(self, now: datetime) -> TaskStatistics:
+        mapped = self._mapped
+        if mapped is not None:
+            return mapped.stats(now)
+        # Los índices ya son los conteos: cada cubo sabe su tamaño
+        return TaskStatistics(
+            total=len(self._tasks),
+            by_status={s: len(self._by_status.get(s, ())) for s in TaskStatus},
+            by_priority={p: len(self._by_priority.get(p, ())) for p in TaskPriority},
+            overdue=self._open_due.count_before((now,))
+        )
+    
+    def search(self, query: str, limit: int) -> List[Task]:
+        self._hydrated.wait()
+        hits = self._search.search(query, limit)
+        records = (self._tasks.get(task_id) for _, task_id in hits)
+        return [record.to_task() for record in records if record is not None]
+    
+    @staticmethod
+    def _due_key(record: _TaskRecord) -> Optional[tuple]:
+        if record.due_date is None:
+            return None
+        return (as_local_naive(record.due_date), record.created_at, record.id)
+    
+    @classmethod
+    def _open_due_key(cls, record: _TaskRecord) -> Optional[tuple]:
+        return None if record.status in CLOSED_STATUSES else cls._due_key(record)
+    
+    @staticmethod
+    def _key(record: _TaskRecord) -> tuple:
+        return (record.created_at, record.id)
+    
+    def _index(self, record: _TaskRecord) -> None:
+        key = self._key(record)
+        self._by_status.setdefault(record.status, _SortedKeyList()).add(key)
+        self._by_priority.setdefault(record.priority, _SortedKeyList()).add(key)
+        if record.assigned_to is not None:
+            self._by_assignee.setdefault(record.assigned_to, _SortedKeyList()).add(key)
+        for index, due_key in ((self._by_due, self._due_key(record)),
+                               (self._open_due, self._open_due_key(record))):
+            if due_key is not None:
+                index.add(due_key)
+        self._search.add(record.id, record.title, record.description)
+    
+    def _unindex(self, record: _TaskRecord) -> None:
+        key = self._key(record)
+        for index, value in ((self._by_status, record.status),
+                             (self._by_priority, record.priority),
+                             (self._by_assignee, record.assigned_to)):
+            self._discard(index, value, key)
+        for index, due_key in ((self._by_due, self._due_key(record)),
+                               (self._open_due, self._open_due_key(record))):
+            if due_key is not None:
+                index.discard(due_key)
+        self._search.remove(record.id, record.title, record.description)
+    
+    @staticmethod
+    def _discard(index: dict, value, key: tuple) -> None:
+        bucket = index.get(value)
+        if bucket is None:
+            return
+        bucket.discard(key)
+        if not bucket:
+            del index[value]
+    
+    def _reindex(self, old: _TaskRecord, new: _TaskRecord) -> None:
+        """Mover la clave solo en los índices cuyo valor cambió"""
+        key = self._key(new)
+        for index, before, after in ((self._by_status, old.status, new.status),
+                                     (self._by_priority, old.priority, new.priority),
+                                     (self._by_assignee, old.assigned_to, new.assigned_to)):
+            if before == after:
+                continue
+            # Primero el índice nuevo: un lector nunca deja de encontrar la tarea
+            if after is not None:
+                index.setdefault(after, _SortedKeyList()).add(key)
+            self._discard(index, before, key)
+        
+        for index, key_of in ((self._by_due, self._due_key),
+                              (self._open_due, self._open_due_key)):
+            old_due, new_due = key_of(old), key_of(new)
+            if old_due == new_due:
+                continue
+            if new_due is not None:
+                index.add(new_due)
+            if old_due is not None:
+                index.discard(old_due)
+        
+        if (old.title, old.description) != (new.title, new.description):
+            self._search.remove(old.id, old.title, old.description)
+            self._search.add(new.id, new.title, new.description)
+    
+    def _wait_durable(self, seq: int) -> None:
+        """Con WAL, esperar al fsync del cambio `seq` ya fuera de `_write_lock`"""
+        if self._wal is not None:
+            self._wal.wait_durable(seq)
     
     def create(self, task: TaskCreate) -> Task:
+        with self._write_lock:
+            created = self._create(task).to_task()
+            self.changes.append([TaskChange(created._version, "created", created.id, created)])
+        self._wait_durable(created._version)
+        return created
+    
+    def _create(self, task: TaskCreate) -> _TaskRecord:
         task_id = str(uuid.uuid4())
         now = datetime.now()
-        new_task = Task(
+        record = _TaskRecord(
             id=task_id,
+            title=task.title,
+            description=task.description,
+            priority=task.priority,
+            status=task.status,
+            assigned_to=task.assigned_to,
+            due_date=task.due_date,
+            created_at=now,
+            updated_at=now,
+            version=self._version + 1
+        )
+        self._version += 1
+        self._tasks[task_id] = record
+        self._order.add(self._key(record))
+        self._index(record)
+        return record
+    
+    def get_all(self) -> List[Task]:
+        self._hydrated.wait()
+        # list() copia los valores de una vez: iterar el dict vivo fallaría con escrituras
+        return [record.to_task() for record in list(self._tasks.values())]
+    
+    def get_by_id(self, task_id: str) -> Optional[Task]:
+        mapped = self._mapped
+        record = mapped.get(task_id) if mapped is not None else self._tasks.get(task_id)
+        return record.to_task() if record else None
+    
+    def update(self, task_id: str, task_update: TaskUpdate,
+               expected_version: Optional[int] = None) -> Optional[Task]:
+        with self._write_lock:
+            record = self._update(task_id, task_update, expected_version)
+            if record is None:
+                return None
+            updated = record.to_task()
+            self.changes.append([TaskChange(updated._version, "updated", task_id, updated)])
+        self._wait_durable(updated._version)
+        return updated
+    
+    def _update(self, task_id: str, task_update: TaskUpdate,
+                expected_version: Optional[int] = None) -> Optional[_TaskRecord]:
+        record = self._tasks.get(task_id)
+        if not record:
+            return None
+        if expected_version is not None and record.version != expected_version:
+            raise VersionConflictError(task_id, record.version)
+        
+        self._version += 1
+        changes = {name: getattr(task_update, name) for name in task_update.model_fields_set}
+        updated = replace(record, **changes, updated_at=datetime.now(), version=self._version)
+        self._tasks[task_id] = updated
+        self._reindex(record, updated)
+        return updated
+    
+    def delete(self, task_id: str) -> bool:
+        with self._write_lock:
+            deleted = self._delete(task_id)
+            if deleted:
+                self.changes.append([TaskChange(self._version, "deleted", task_id)])
+            seq = self._version
+        self._wait_durable(seq)
+        return deleted
+    
+    def _delete(self, task_id: str) -> bool:
+        record = self._tasks.pop(task_id, None)
+        if record is None:
+            return False
+        self._version += 1
+        self._order.discard(self._key(record))
+        self._unindex(record)
+        return True
+    
+    def find(self, filters: TaskQuery, limit: Optional[int] = None,
+             after: Optional[tuple] = None,
+             explain: bool = False) -> tuple[List[Task], Optional[QueryPlan]]:
+        """Planificador: el índice con menos filas dirige; el resto se comprueba por tarea.
+        
+        Si el driver ya está en el orden pedido se recorre y se corta en `limit`;
+        si no (texto, o un cubo cuando se ordena por fecha) se filtra y se ordena.
+        """
+        return self._find(filters, limit, after, explain)
+    
+    def scan(self, filters: TaskQuery, limit: int,
+             after: Optional[tuple] = None) -> List[Task]:
+        """Lote de iter_tasks dirigido solo por índices ya en orden (creación o fecha).
+        
+        Ordenar el texto o un cubo costaría O(coincidencias) en cada lote; así cada
+        lote continúa el recorrido del anterior y la exportación entera es lineal.
+        """
+        return self._find(filters, limit, after, ordered_only=True)[0]
+    
+    def _find(self, filters: TaskQuery, limit: Optional[int], after: Optional[tuple],
+              explain: bool = False,
+              ordered_only: bool = False) -> tuple[List[Task], Optional[QueryPlan]]:
+        mapped = self._mapped
+        if mapped is not None:
+            if not (filters.by_due or filters.open_only or filters.text is not None):
+                return mapped.find(filters, self._matcher(filters), limit, after, explain)
+            self._hydrated.wait()
+        
+        by_due = filters.by_due
+        if after is not None and by_due:
+            after = (as_local_naive(after[0]),) + tuple(after[1:])
+        candidates = self._candidates(filters, after)
+        # "all" o la fecha límite siempre están en orden
+        usable = [c for c in candidates if c[2]] if ordered_only else candidates
+        driver, rows, ordered, ids = min(usable, key=lambda c: (c[1], not c[2]))
+        
+        match = self._matcher(filters)
+        # Una clave del índice puede sobrevivir un instante a su tarea borrada
+        records = (self._tasks.get(task_id) for task_id in ids())
+        records = (r for r in records if r is not None and match(r))
+        if ordered:
+            page = list(islice(records, limit))
+        else:
+            sort_key = self._due_key if by_due else self._key
+            keyed = [(sort_key(r), r) for r in records]
+            if after is not None:
+                keyed = [(k, r) for k, r in keyed if (k > after if by_due else k < after)]
+            keyed.sort(key=itemgetter(0), reverse=not by_due)
+            page = [r for _, r in keyed[:limit]]
+        
+        plan = None
+        if explain:
+            plan = QueryPlan(
+                driver=driver,
+                strategy="index_scan" if ordered else "sort",
+                estimates={name: count for name, count, _, _ in candidates},
+                residual=[name for name in filters.active() if name != driver],
+                order=filters.order
+            )
+        return [record.to_task() for record in page], plan
+    
+    def _candidates(self, filters: TaskQuery, after: Optional[tuple]) -> list:
+        """Índices que pueden dirigir la consulta: (nombre, filas, ¿en orden?, ids)"""
+        by_due = filters.by_due
+        candidates = []
+        if by_due:
+            due_index = self._open_due if filters.open_only else self._by_due
+            start = (as_local_naive(filters.due_after),) if filters.due_after is not None else ()
+            end = as_local_naive(filters.due_before) if filters.due_before is not None else None
+            rows = (due_index.count_before((end,)) if end is not None else len(due_index)) \
+                - due_index.count_before(start)
+            
+            def due_range():
+                keys = due_index.iter_from(max(start, after) if after is not None else start)
+                if after is not None:
+                    keys = dropwhile(lambda key: key <= after, keys)
+                if end is not None:
+                    keys = takewhile(lambda key: key[0] < end, keys)
+                return (key[2] for key in keys)
+            candidates.append(("due_date", max(rows, 0), True, due_range))
+        else:
+            order = self._order
+            candidates.append(("all", len(order), True,
+                               lambda: (key[1] for key in order.iter_desc(before=after))))
+        
+        for name, index, value in (("status", self._by_status, filters.status),
+                                   ("priority", self._by_priority, filters.priority),
+                                   ("assigned_to", self._by_assignee, filters.assigned_to)):
+            if value is None:
+                continue
+            bucket = index.get(value) or _SortedKeyList()
+            # Los cubos están en orden de creación: sirven tal cual si no se ordena por fecha
+            before = None if by_due else after
+            candidates.append((name, len(bucket), not by_due,
+                               lambda bucket=bucket, before=before:
+                               (key[1] for key in bucket.iter_desc(before=before))))
+        
+        if filters.text is not None:
+            text = filters.text
+            candidates.append(("text", self._search.estimate(text), False,
+                               lambda: self._search.matching(text)))
+        return candidates
+    
+    @staticmethod
+    def _matcher(filters: TaskQuery):
+        """Predicado con todos los filtros (también los del índice que dirige)"""
+        checks = []
+        for name in ("status", "priority", "assigned_to"):
+            value = getattr(filters, name)
+            if value is not None:
+                checks.append(lambda r, name=name, value=value: getattr(r, name) == value)
+        if filters.open_only:
+            checks.append(lambda r: r.status not in CLOSED_STATUSES)
+        if filters.by_due:
+            low = as_local_naive(filters.due_after) if filters.due_after is not None else None
+            high = as_local_naive(filters.due_before) if filters.due_before is not None else None
+            
+            def due_in_range(r) -> bool:
+                if r.due_date is None:
+                    return False
+                due = as_local_naive(r.due_date)
+                return (low is None or due >= low) and (high is None or due < high)
+            checks.append(due_in_range)
+        if filters.text is not None:
+            tokens = list(dict.fromkeys(search_terms(filters.text)))
+            
+            def has_text(r) -> bool:
+                terms = search_terms(r.title) + search_terms(r.description)
+                return bool(tokens) and all(any(term.startswith(token) for term in terms)
+                                            for token in tokens)
+            checks.append(has_text)
+        return lambda r: all(check(r) for check in checks)
+    
+    def create_many(self, tasks: List[TaskCreate]) -> List[Task]:
+        with self._write_lock:
+            created = [self._create(task).to_task() for task in tasks]
+            self.changes.append([TaskChange(task._version, "created", task.id, task)
+                                 for task in created])
+            seq = self._version
+        self._wait_durable(seq)
+        return created
+    
+    def update_many(self, updates: List[tuple[str, TaskUpdate]]) -> List[Optional[Task]]:
+        with self._write_lock:
+            records = [self._update(task_id, task_update) for task_id, task_update in updates]
+            updated = [record.to_task() if record else None for record in records]
+            self.changes.append([TaskChange(task._version, "updated", task.id, task)
+                                 for task in updated if task])
+            seq = self._version
+        self._wait_durable(seq)
+        return updated
+    
+    def delete_many(self, task_ids: List[str]) -> List[bool]:
+        with self._write_lock:
+            changes, results = [], []
+            for task_id in task_ids:
+                deleted = self._delete(task_id)
+                if deleted:
+                    changes.append(TaskChange(self._version, "deleted", task_id))
+                results.append(deleted)
+            self.changes.append(changes)
+            seq = self._version
+        self._wait_durable(seq)
+        return results
+
+class SqliteTaskRepository(TaskRepository):
+    """Implementación persistente sobre SQLite (WAL, una conexión por hilo)"""
+    _SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS tasks (
+            id TEXT PRIMARY KEY,
+            title TEXT NOT NULL,
+            description TEXT,
+            priority TEXT NOT NULL,
+            status TEXT NOT NULL,
+            assigned_to TEXT,
+            due_date TEXT,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            version INTEGER NOT NULL DEFAULT 0,
+            due_local TEXT
+        )""",
+        """CREATE TABLE IF NOT EXISTS repository_meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )""",
+        "INSERT OR IGNORE INTO repository_meta (key, value) VALUES ('version', 0)",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_created ON tasks (created_at, id)",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status, created_at, id)",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_priority ON tasks (priority, created_at, id)",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_assignee ON tasks (assigned_to, created_at, id)",
+        # due_local: due_date en hora local sin zona, comparable como cadena ISO
+        # (due_date conserva el offset que envió el cliente)
+        # Solo tareas abiertas: contar vencidas es un rango sobre este índice
+        """CREATE INDEX IF NOT EXISTS idx_tasks_open_due_local ON tasks (due_local)
+            WHERE due_local IS NOT NULL AND status NOT IN ('completed', 'cancelled')""",
+        # Rangos de fecha límite ya en el orden de la respuesta
+        """CREATE INDEX IF NOT EXISTS idx_tasks_due_local ON tasks (due_local, created_at, id)
+            WHERE due_local IS NOT NULL""",
+        # Conteos por estado y prioridad mantenidos por triggers en cada escritura
+        """CREATE TABLE IF NOT EXISTS task_counts (
+            dimension TEXT NOT NULL,
+            value TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (dimension, value)
+        )""",
+        """CREATE TRIGGER IF NOT EXISTS task_counts_insert AFTER INSERT ON tasks BEGIN
+            INSERT INTO task_counts VALUES ('status', NEW.status, 1)
+                ON CONFLICT (dimension, value) DO UPDATE SET count = count + 1;
+            INSERT INTO task_counts VALUES ('priority', NEW.priority, 1)
+                ON CONFLICT (dimension, value) DO UPDATE SET count = count + 1;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS task_counts_update
+            AFTER UPDATE OF status, priority ON tasks BEGIN
+            UPDATE task_counts SET count = count - 1
+                WHERE dimension = 'status' AND value = OLD.status;
+            INSERT INTO task_counts VALUES ('status', NEW.status, 1)
+                ON CONFLICT (dimension, value) DO UPDATE SET count = count + 1;
+            UPDATE task_counts SET count = count - 1
+                WHERE dimension = 'priority' AND value = OLD.priority;
+            INSERT INTO task_counts VALUES ('priority', NEW.priority, 1)
+                ON CONFLICT (dimension, value) DO UPDATE SET count = count + 1;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS task_counts_delete AFTER DELETE ON tasks BEGIN
+            UPDATE task_counts SET count = count - 1
+                WHERE dimension = 'status' AND value = OLD.status;
+            UPDATE task_counts SET count = count - 1
+                WHERE dimension = 'priority' AND value = OLD.priority;
+        END""",
+        # Índice invertido FTS5 (sin tildes) sobre tasks, sincronizado por triggers
+        """CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+            title, description, content='tasks', content_rowid='rowid',
+            tokenize='unicode61 remove_diacritics 2'
+        )""",
+        """CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+            INSERT INTO tasks_fts (rowid, title, description)
+                VALUES (NEW.rowid, NEW.title, NEW.description);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS tasks_fts_update
+            AFTER UPDATE OF title, description ON tasks BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, title, description)
+                VALUES ('delete', OLD.rowid, OLD.title, OLD.description);
+            INSERT INTO tasks_fts (rowid, title, description)
+                VALUES (NEW.rowid, NEW.title, NEW.description);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, title, description)
+                VALUES ('delete', OLD.rowid, OLD.title, OLD.description);
+        END""",
+    )
+    _COLUMNS = ("id", "title", "description", "priority", "status",
+                "assigned_to", "due_date", "created_at", "updated_at")
+    # Sentencias fijas: sqlite3 reutiliza su versión compilada por conexión
+    _INSERT = (f"INSERT INTO tasks ({', '.join(_COLUMNS)}, due_local, version) "
+               f"VALUES ({', '.join('?' * (len(_COLUMNS) + 2))})")
+    _SELECT = f"SELECT {', '.join(_COLUMNS)}, version FROM tasks"
+    _SELECT_BY_ID = _SELECT + " WHERE id = ?"
+    _SELECT_ALL = _SELECT + " ORDER BY created_at, id"
+    _SELECT_VERSION = "SELECT version FROM tasks WHERE id = ?"
+    _UPDATE = ("UPDATE tasks SET title = ?, description = ?, priority = ?, status = ?, "
+               "assigned_to = ?, due_date = ?, updated_at = ?, due_local = ?, version = ? "
+               "WHERE id = ?")
+    _DELETE = "DELETE FROM tasks WHERE id = ?"
+    _READ_VERSION = "SELECT value FROM repository_meta WHERE key = 'version'"
+    _BUMP_VERSION = "UPDATE repository_meta SET value = value + ? WHERE key = 'version'"
+    _STATEMENT_CACHE_SIZE = 128
+    
+    def __init__(self, path: str, change_log_size: int = 10_000):
+        self._path = path
+        self._local = threading.local()
+        self._connections: list[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        # SQLite ya serializa escritores; el lock mantiene el orden del registro de cambios
+        self._write_lock = threading.Lock()
+        conn = self._conn()
+        self._add_columns(conn)
+        for statement in self._SCHEMA:
+            conn.execute(statement)
+        self._migrate(conn)
+        # Solo registra las escrituras de este proceso
+        self.changes = ChangeLog(change_log_size, last_seq=self.version)
+    
+    @staticmethod
+    def _add_columns(conn: sqlite3.Connection) -> None:
+        """Columnas que faltan en bases antiguas (antes de crear los índices que las usan)"""
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(tasks)")}
+        if columns and "version" not in columns:
+            conn.execute("ALTER TABLE tasks ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        if columns and "due_local" not in columns:
+            conn.execute("ALTER TABLE tasks ADD COLUMN due_local TEXT")
+    
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection) -> None:
+        """Rellenar task_counts, tasks_fts y due_local en bases creadas antes de ellos"""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("SELECT 1 FROM task_counts LIMIT 1").fetchone() is None:
+                for dimension in ("status", "priority"):
+                    conn.execute(f"INSERT INTO task_counts SELECT '{dimension}', {dimension}, "
+                                 f"COUNT(*) FROM tasks GROUP BY {dimension}")
+            if conn.execute("SELECT 1 FROM repository_meta "
+                            "WHERE key = 'search_index'").fetchone() is None:
+                conn.execute("INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')")
+                conn.execute("INSERT INTO repository_meta (key, value) VALUES ('search_index', 1)")
+            if conn.execute("SELECT 1 FROM repository_meta "
+                            "WHERE key = 'due_local'").fetchone() is None:
+                # Los índices sobre due_date comparaban cadenas con offsets distintos
+                conn.execute("DROP INDEX IF EXISTS idx_tasks_open_due")
+                conn.execute("DROP INDEX IF EXISTS idx_tasks_due")
+                rows = conn.execute("SELECT id, due_date FROM tasks "
+                                    "WHERE due_date IS NOT NULL").fetchall()
+                conn.executemany("UPDATE tasks SET due_local = ? WHERE id = ?", [
+                    (SqliteTaskRepository._dump_local(datetime.fromisoformat(due)), task_id)
+                    for task_id, due in rows
+                ])
+                conn.execute("INSERT INTO repository_meta (key, value) VALUES ('due_local', 1)")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    
+    def _conn(self) -> sqlite3.Connection:
+        """Conexión reutilizada por hilo"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._path, isolation_level=None,
+                                   check_same_thread=False,
+                                   cached_statements=self._STATEMENT_CACHE_SIZE)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+    
+    def close(self) -> None:
+        """Cerrar las conexiones de todos los hilos"""
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+    
+    @staticmethod
+    def _dump_datetime(value: Optional[datetime]) -> Optional[str]:
+        return value.isoformat(timespec="microseconds") if value is not None else None
+    
+    @classmethod
+    def _dump_local(cls, value: Optional[datetime]) -> Optional[str]:
+        """Clave de due_local: hora local sin zona, ordenable como cadena"""
+        return cls._dump_datetime(as_local_naive(value)) if value is not None else None
+    
+    def _to_row(self, task: Task) -> tuple:
+        """Valores de _COLUMNS seguidos de due_local"""
+        return (task.id, task.title, task.description, task.priority.value,
+                task.status.value, task.assigned_to, self._dump_datetime(task.due_date),
+                self._dump_datetime(task.created_at), self._dump_datetime(task.updated_at),
+                self._dump_local(task.due_date))
+    
+    def _to_task(self, row: tuple) -> Task:
+        task = Task(**dict(zip(self._COLUMNS, row)))
+        task._version = row[-1]
+        return task
+    
+    def _next_version(self, conn: sqlite3.Connection, count: int = 1) -> int:
+        """Reservar `count` versiones; devuelve la última"""
+        conn.execute(self._BUMP_VERSION, (count,))
+        return conn.execute(self._READ_VERSION).fetchone()[0]
+    
+    @property
+    def version(self) -> int:
+        return self._conn().execute(self._READ_VERSION).fetchone()[0]
+    
+    def get_version(self, task_id: str) -> Optional[int]:
+        row = self._conn().execute(self._SELECT_VERSION, (task_id,)).fetchone()
+        return row[0] if row else None
+    
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+    
+    def stats(self, now: datetime) -> TaskStatistics:
+        conn = self._conn()
+        counts = {dimension: {} for dimension in ("status", "priority")}
+        for dimension, value, count in conn.execute(
+                "SELECT dimension, value, count FROM task_counts"):
+            counts[dimension][value] = count
+        overdue = conn.execute(
+            "SELECT COUNT(*) FROM tasks WHERE due_local IS NOT NULL AND due_local < ? "
+            "AND status NOT IN ('completed', 'cancelled')",
+            (self._dump_local(now),)).fetchone()[0]
+        return TaskStatistics(
+            total=sum(counts["status"].values()),
+            by_status={s: counts["status"].get(s.value, 0) for s in TaskStatus},
+            by_priority={p: counts["priority"].get(p.value, 0) for p in TaskPriority},
+            overdue=overdue
+        )
+    
+    def search(self, query: str, limit: int) -> List[Task]:
+        # Mismos tokens que el índice en memoria; cada uno como prefijo ("revis"*)
+        terms = search_terms(query)
+        if not terms:
+            return []
+        match = " ".join(f'"{term}"*' for term in terms)
+        sql = (f"SELECT {', '.join('t.' + c for c in self._COLUMNS)}, t.version "
+               "FROM tasks_fts JOIN tasks t ON t.rowid = tasks_fts.rowid "
+               "WHERE tasks_fts MATCH ? ORDER BY bm25(tasks_fts, 2.0, 1.0) LIMIT ?")
+        return [self._to_task(row) for row in self._conn().execute(sql, (match, limit))]
+    
+    def index_sizes(self) -> dict[str, dict[str, int]]:
+        conn = self._conn()
+        # Columnas fijas (no vienen del usuario); cada GROUP BY recorre su índice
+        return {
+            column: dict(conn.execute(
+                f"SELECT {column}, COUNT(*) FROM tasks "
+                f"WHERE {column} IS NOT NULL GROUP BY {column}").fetchall())
+            for column in ("status", "priority", "assigned_to")
+        }
+    
+    @staticmethod
+    def _new_task(task: TaskCreate) -> Task:
+        now = datetime.now()
+        return Task(
+            id=str(uuid.uuid4()),
             **task.model_dump(),
             created_at=now,
             updated_at=now
         )
-        self._tasks[task_id] = new_task
+    
+    def _insert(self, conn: sqlite3.Connection, new_tasks: List[Task], pending: list) -> None:
+        first = self._next_version(conn, len(new_tasks)) - len(new_tasks) + 1
+        for version, task in enumerate(new_tasks, start=first):
+            task._version = version
+        conn.executemany(self._INSERT, [self._to_row(task) + (task._version,)
+                                        for task in new_tasks])
+        pending.extend(TaskChange(task._version, "created", task.id, task) for task in new_tasks)
+    
+    def create(self, task: TaskCreate) -> Task:
+        new_task = self._new_task(task)
+        self._transaction(lambda conn, pending: self._insert(conn, [new_task], pending))
         return new_task
     
     def get_all(self) -> List[Task]:
-        return list(self._tasks.values())
+        return [self._to_task(row) for row in self._conn().execute(self._SELECT_ALL)]
     
     def get_by_id(self, task_id: str) -> Optional[Task]:
-        return self._tasks.get(task_id)
+        row = self._conn().execute(self._SELECT_BY_ID, (task_id,)).fetchone()
+        return self._to_task(row) if row else None
     
-    def update(self, task_id: str, task_update: TaskUpdate) -> Optional[Task]:
-        task = self._tasks.get(task_id)
-        if not task:
+    def _transaction(self, work):
+        """Ejecutar `work(conn, pending)` dentro de una transacción de escritura.
+        
+        `work` anota sus cambios en `pending`; se publican solo tras el COMMIT.
+        """
+        pending: list[TaskChange] = []
+        with self._write_lock:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(conn, pending)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            self.changes.append(pending)
+        return result
+    
+    def _update_in(self, conn: sqlite3.Connection, pending: list, task_id: str,
+                   task_update: TaskUpdate,
+                   expected_version: Optional[int] = None) -> Optional[Task]:
+        row = conn.execute(self._SELECT_BY_ID, (task_id,)).fetchone()
+        if not row:
             return None
+        if expected_version is not None and row[-1] != expected_version:
+            raise VersionConflictError(task_id, row[-1])
         
-        update_data = task_update.model_dump(exclude_unset=True)
-        updated_task = task.model_copy(update={
-            **update_data,
-            "updated_at": datetime.now()
-        })
-        self._tasks[task_id] = updated_task
+        updated_task = self._to_task(row)
+        for name in task_update.model_fields_set:
+            setattr(updated_task, name, getattr(task_update, name))
+        updated_task.updated_at = datetime.now()
+        updated_task._version = self._next_version(conn)
+        values = self._to_row(updated_task)
+        conn.execute(self._UPDATE,
+                     values[1:7] + values[8:] + (updated_task._version, task_id))
+        pending.append(TaskChange(updated_task._version, "updated", task_id, updated_task))
         return updated_task
     
+    def _delete_in(self, conn: sqlite3.Connection, pending: list, task_id: str) -> bool:
+        if conn.execute(self._DELETE, (task_id,)).rowcount == 0:
+            return False
+        pending.append(TaskChange(self._next_version(conn), "deleted", task_id))
+        return True
+    
+    def update(self, task_id: str, task_update: TaskUpdate,
+               expected_version: Optional[int] = None) -> Optional[Task]:
+        return self._transaction(lambda conn, pending: self._update_in(
+            conn, pending, task_id, task_update, expected_version))
+    
     def delete(self, task_id: str) -> bool:
-        if task_id in self._tasks:
-            del self._tasks[task_id]
-            return True
-        return False
+        return self._transaction(lambda conn, pending: self._delete_in(conn, pending, task_id))
+    
+    def create_many(self, tasks: List[TaskCreate]) -> List[Task]:
+        new_tasks = [self._new_task(task) for task in tasks]
+        if new_tasks:
+            self._transaction(lambda conn, pending: self._insert(conn, new_tasks, pending))
+        return new_tasks
+    
+    def update_many(self, updates: List[tuple[str, TaskUpdate]]) -> List[Optional[Task]]:
+        return self._transaction(lambda conn, pending: [
+            self._update_in(conn, pending, task_id, task_update)
+            for task_id, task_update in updates
+        ])
+    
+    def delete_many(self, task_ids: List[str]) -> List[bool]:
+        return self._transaction(lambda conn, pending: [
+            self._delete_in(conn, pending, task_id) for task_id in task_ids
+        ])
+    
+    def find(self, filters: TaskQuery, limit: Optional[int] = None,
+             after: Optional[tuple] = None,
+             explain: bool = False) -> tuple[List[Task], Optional[QueryPlan]]:
+        """Una sola consulta con todos los filtros; el planificador de SQLite elige índice"""
+        by_due = filters.by_due
+        clauses, params = [], []
+        for column, value in (("status", filters.status), ("priority", filters.priority),
+                              ("assigned_to", filters.assigned_to)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value.value if isinstance(value, Enum) else value)
+        if filters.open_only:
+            clauses.append("status NOT IN ('completed', 'cancelled')")
+        if by_due:
+            clauses.append("due_local IS NOT NULL")
+        for clause, value in (("due_local >= ?", filters.due_after),
+                              ("due_local < ?", filters.due_before)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(self._dump_local(value))
+        if filters.text is not None:
+            terms = search_terms(filters.text)
+            clauses.append("rowid IN (SELECT rowid FROM tasks_fts WHERE tasks_fts MATCH ?)"
+                           if terms else "0")
+            if terms:
+                params.append(" ".join(f'"{term}"*' for term in terms))
+        if after is not None and by_due:
+            clauses.append("(due_local, created_at, id) > (?, ?, ?)")
+            params.extend((self._dump_local(after[0]), self._dump_datetime(after[1]), after[2]))
+        elif after is not None:
+            clauses.append("(created_at, id) < (?, ?)")
+            params.extend((self._dump_datetime(after[0]), after[1]))
+        
+        sql = self._SELECT
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += (" ORDER BY due_local, created_at, id" if by_due
+                else " ORDER BY created_at DESC, id DESC")
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        conn = self._conn()
+        tasks = [self._to_task(row) for row in conn.execute(sql, params)]
+        
+        plan = None
+        if explain:
+            detail = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+            index = re.search(r"USING (?:COVERING )?INDEX (\w+)", detail[0]) if detail else None
+            plan = QueryPlan(
+                driver=index.group(1) if index else "all",
+                strategy="sort" if any("TEMP B-TREE" in line for line in detail) else "index_scan",
+                estimates={},
+                residual=[],
+                order=filters.order,
+                detail=detail
+            )
+        return tasks, plan
+
+class AsyncTaskRepository:
+    """Interface asíncrona para repositorio de tareas (Abstracción)"""
+    changes: ChangeLog
+    
+    async def create(self, task: TaskCreate) -> Task:
+        raise NotImplementedError
+    
+    async def get_all(self) -> List[Task]:
+        raise NotImplementedError
+    
+    async def get_by_id(self, task_id: str) -> Optional[Task]:
+        raise NotImplementedError
+    
+    async def update(self, task_id: str, task_update: TaskUpdate,
+                     expected_version: Optional[int] = None) -> Optional[Task]:
+        raise NotImplementedError
+    
+    async def delete(self, task_id: str) -> bool:
+        raise NotImplementedError
+    
+    async def find(self, filters: TaskQuery, limit: Optional[int] = None,
+                   after: Optional[tuple] = None,
+                   explain: bool = False) -> tuple[List[Task], Optional[QueryPlan]]:
+        raise NotImplementedError
+    
+    async def scan(self, filters: TaskQuery, limit: int,
+                   after: Optional[tuple] = None) -> List[Task]:
+        raise NotImplementedError
+    
+    async def iter_tasks(self, filters: TaskQuery,
+                         batch_size: int = 500) -> AsyncIterator[Task]:
+        """Como TaskRepository.iter_tasks: un scan por lote, sin retener más de uno"""
+        after = None
+        while True:
+            batch = await self.scan(filters, batch_size, after)
+            for task in batch:
+                yield task
+            if len(batch) < batch_size:
+                return
+            after = filters.sort_key(batch[-1])
+    
+    async def query(self, status: Optional[TaskStatus] = None,
+                    priority: Optional[TaskPriority] = None,
+                    assigned_to: Optional[str] = None,
+                    limit: Optional[int] = None,
+                    after: Optional[tuple] = None) -> List[Task]:
+        raise NotImplementedError
+    
+    async def query_due(self, due_after: Optional[datetime] = None,
+                        due_before: Optional[datetime] = None,
+                        open_only: bool = False,
+                        status: Optional[TaskStatus] = None,
+                        priority: Optional[TaskPriority] = None,
+                        assigned_to: Optional[str] = None,
+                        limit: Optional[int] = None,
+                        after: Optional[tuple] = None) -> List[Task]:
+        raise NotImplementedError
+    
+    async def create_many(self, tasks: List[TaskCreate]) -> List[Task]:
+        raise NotImplementedError
+    
+    async def update_many(self, updates: List[tuple[str, TaskUpdate]]) -> List[Optional[Task]]:
+        raise NotImplementedError
+    
+    async def delete_many(self, task_ids: List[str]) -> List[bool]:
+        raise NotImplementedError
+    
+    async def count(self) -> int:
+        raise NotImplementedError
+    
+    async def index_sizes(self) -> dict[str, dict[str, int]]:
+        raise NotImplementedError
+    
+    async def stats(self, now: datetime) -> TaskStatistics:
+        raise NotImplementedError
+    
+    async def search(self, query: str, limit: int) -> List[Task]:
+        raise NotImplementedError
+    
+    async def get_version(self, task_id: str) -> Optional[int]:
+        raise NotImplementedError
+    
+    async def current_version(self) -> int:
+        """Equivalente asíncrono de TaskRepository.version"""
+        raise NotImplementedError
+
+class AsyncTaskRepositoryAdapter(AsyncTaskRepository):
+    """Expone un TaskRepository síncrono con la interface asíncrona.
+    
+    Si el repositorio no hace E/S bloqueante (en memoria) se llama directamente
+    en el event loop, sin saltos al threadpool; si no, se delega al threadpool.
+    """
+    def __init__(self, repository: TaskRepository):
+        self._repository = repository
+        self.changes = repository.changes
+    
+    async def _call(self, method, *args, **kwargs):
+        # Se consulta en cada llamada: puede cambiar (p. ej. al terminar de hidratar)
+        if self._repository.blocking_io:
+            return await run_in_threadpool(method, *args, **kwargs)
+        return method(*args, **kwargs)
+    
+    async def create(self, task: TaskCreate) -> Task:
+        return await self._call(self._repository.create, task)
+    
+    async def get_all(self) -> List[Task]:
+        return await self._call(self._repository.get_all)
+    
+    async def get_by_id(self, task_id: str) -> Optional[Task]:
+        return await self._call(self._repository.get_by_id, task_id)
+    
+    async def update(self, task_id: str, task_update: TaskUpdate,
+                     expected_version: Optional[int] = None) -> Optional[Task]:
+        return await self._call(self._repository.update, task_id, task_update,
+                                expected_version)
+    
+    async def delete(self, task_id: str) -> bool:
+        return await self._call(self._repository.delete, task_id)
+    
+    async def find(self, filters: TaskQuery, limit: Optional[int] = None,
+                   after: Optional[tuple] = None,
+                   explain: bool = False) -> tuple[List[Task], Optional[QueryPlan]]:
+        return await self._call(self._repository.find, filters, limit, after, explain)
+    
+    async def scan(self, filters: TaskQuery, limit: int,
+                   after: Optional[tuple] = None) -> List[Task]:
+        return await self._call(self._repository.scan, filters, limit, after)
+    
+    async def query(self, status: Optional[TaskStatus] = None,
+                    priority: Optional[TaskPriority] = None,
+                    assigned_to: Optional[str] = None,
+                    limit: Optional[int] = None,
+                    after: Optional[tuple] = None) -> List[Task]:
+        return await self._call(self._repository.query, status, priority, assigned_to,
+                                limit=limit, after=after)
+    
+    async def query_due(self, due_after: Optional[datetime] = None,
+                        due_before: Optional[datetime] = None,
+                        open_only: bool = False,
+                        status: Optional[TaskStatus] = None,
+                        priority: Optional[TaskPriority] = None,
+                        assigned_to: Optional[str] = None,
+                        limit: Optional[int] = None,
+                        after: Optional[tuple] = None) -> List[Task]:
+        return await self._call(self._repository.query_due, due_after, due_before, open_only,
+                                status, priority, assigned_to, limit=limit, after=after)
+    
+    async def create_many(self, tasks: List[TaskCreate]) -> List[Task]:
+        return await self._call(self._repository.create_many, tasks)
+    
+    async def update_many(self, updates: List[tuple[str, TaskUpdate]]) -> List[Optional[Task]]:
+        return await self._call(self._repository.update_many, updates)
+    
+    async def delete_many(self, task_ids: List[str]) -> List[bool]:
+        return await self._call(self._repository.delete_many, task_ids)
+    
+    async def count(self) -> int:
+        return await self._call(self._repository.count)
+    
+    async def index_sizes(self) -> dict[str, dict[str, int]]:
+        return await self._call(self._repository.index_sizes)
+    
+    async def stats(self, now: datetime) -> TaskStatistics:
+        return await self._call(self._repository.stats, now)
+    
+    async def search(self, query: str, limit: int) -> List[Task]:
+        return await self._call(self._repository.search, query, limit)
+    
+    async def get_version(self, task_id: str) -> Optional[int]:
+        return await self._call(self._repository.get_version, task_id)
+    
+    async def current_version(self) -> int:
+        return await self._call(lambda: self._repository.version)
 
 # ============= SERVICE LAYER (Business Logic) =============
 
@@ -138,55 +2341,801 @@ class TaskService:
     def __init__(self, repository: TaskRepository):
         self._repository = repository
     
+    @staticmethod
+    def _check_new_task(task_data: TaskCreate, now: datetime) -> None:
+        if task_data.due_date and as_local_naive(task_data.due_date) < now:
+            raise ValueError("Due date cannot be in the past")
+    
     def create_task(self, task_data: TaskCreate) -> Task:
         """Crear nueva tarea con validaciones de negocio"""
-        if task_data.due_date and task_data.due_date < datetime.now():
-            raise ValueError("Due date cannot be in the past")
+        self._check_new_task(task_data, datetime.now())
         return self._repository.create(task_data)
     
     def list_tasks(self, status: Optional[TaskStatus] = None, 
-                   priority: Optional[TaskPriority] = None) -> List[Task]:
+                   priority: Optional[TaskPriority] = None,
+                   assigned_to: Optional[str] = None) -> List[Task]:
         """Listar tareas con filtros opcionales"""
-        tasks = self._repository.get_all()
-        
-        if status:
-            tasks = [t for t in tasks if t.status == status]
-        if priority:
-            tasks = [t for t in tasks if t.priority == priority]
-        
-        return sorted(tasks, key=lambda x: x.created_at, reverse=True)
+        return self._repository.query(status, priority, assigned_to)
+    
+    def get_stats(self) -> TaskStatistics:
+        """Conteos por estado, prioridad y vencidas"""
+        return self._repository.stats(datetime.now())
+    
+    def search_tasks(self, query: str, limit: int = 20) -> List[Task]:
+        """Buscar por palabras (o prefijos) en título y descripción"""
+        return self._repository.search(query, limit)
+    
+    def changes_since(self, since: int) -> TaskChanges:
+        """Altas/cambios y bajas desde la versión `since`, o todo si ya no consta"""
+        version = self._repository.version
+        changes = self._repository.changes.since(since, version)
+        if changes is None:
+            return TaskChanges(version=version, full_resync=True,
+                               upserts=self._repository.get_all(), deletions=[])
+        return self.collapse_changes(changes, since)
+    
+    @staticmethod
+    def collapse_changes(changes: List[TaskChange], since: int) -> TaskChanges:
+        """Quedarse con el último estado de cada tarea (las bajas como tombstones)"""
+        latest: dict[str, TaskChange] = {}
+        for change in changes:
+            latest.pop(change.task_id, None)
+            latest[change.task_id] = change
+        return TaskChanges(
+            version=changes[-1].seq if changes else since,
+            full_resync=False,
+            upserts=[c.task for c in latest.values() if c.op != "deleted"],
+            deletions=[c.task_id for c in latest.values() if c.op == "deleted"]
+        )
+    
+    def list_tasks_page(self, status: Optional[TaskStatus] = None,
+                        priority: Optional[TaskPriority] = None,
+                        assigned_to: Optional[str] = None,
+                        limit: Optional[int] = None,
+                        cursor: Optional[str] = None) -> tuple[List[Task], Optional[str]]:
+        """Listar una página de tareas; devuelve también el cursor de la siguiente"""
+        filters = TaskQuery(status=status, priority=priority, assigned_to=assigned_to)
+        return self.find_tasks_page(filters, limit, cursor)[:2]
+    
+    def list_overdue_page(self, priority: Optional[TaskPriority] = None,
+                          assigned_to: Optional[str] = None,
+                          limit: Optional[int] = None,
+                          cursor: Optional[str] = None) -> tuple[List[Task], Optional[str]]:
+        """Página de tareas abiertas ya vencidas, de la más antigua a la más reciente"""
+        return self.find_tasks_page(self.overdue_filters(priority, assigned_to),
+                                    limit, cursor)[:2]
+    
+    def find_tasks_page(self, filters: TaskQuery, limit: Optional[int] = None,
+                        cursor: Optional[str] = None, explain: bool = False
+                        ) -> tuple[List[Task], Optional[str], Optional[QueryPlan]]:
+        """Página de tareas con cualquier combinación de filtros (y el plan si se pide)"""
+        after = self.decode_cursor(cursor, filters.by_due) if cursor else None
+        fetch = limit + 1 if limit is not None else None
+        tasks, plan = self._repository.find(filters, fetch, after, explain)
+        return (*self.paginate(tasks, limit, filters.by_due), plan)
+    
+    def export_tasks(self, filters: TaskQuery, batch_size: int = 500) -> Iterator[Task]:
+        """Todas las tareas filtradas, en orden y sin materializar la lista"""
+        return self._repository.iter_tasks(filters, batch_size)
+    
+    @staticmethod
+    def overdue_filters(priority: Optional[TaskPriority] = None,
+                        assigned_to: Optional[str] = None) -> TaskQuery:
+        """Abiertas con fecha límite anterior a ahora"""
+        return TaskQuery(priority=priority, assigned_to=assigned_to,
+                         due_before=datetime.now(), open_only=True)
+    
+    @classmethod
+    def paginate(cls, tasks: List[Task], limit: Optional[int],
+                 by_due: bool = False) -> tuple[List[Task], Optional[str]]:
+        """Recortar a `limit` (se pidió uno más para saber si hay siguiente página)"""
+        if limit is None or len(tasks) <= limit:
+            return tasks, None
+        page = tasks[:limit]
+        return page, cls.encode_cursor(page[-1], by_due)
+    
+    @staticmethod
+    def encode_cursor(task: Task, by_due: bool = False) -> str:
+        """Cursor opaco con la clave de orden: (created_at, id) o (due_date, created_at, id)"""
+        parts = [task.created_at.isoformat(), task.id]
+        if by_due:
+            parts.insert(0, task.due_date.isoformat())
+        raw = "|".join(parts).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+    
+    @staticmethod
+    def decode_cursor(cursor: str, by_due: bool = False) -> tuple:
+        """Decodificar un cursor a su clave de orden (ver encode_cursor)"""
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            parts = base64.urlsafe_b64decode(padded).decode().split("|")
+            if len(parts) != (3 if by_due else 2):
+                raise ValueError("cursor of another ordering")
+            *dates, task_id = parts
+            # Un created_at con zona no se puede comparar con los del índice (sin zona)
+            return (*(as_local_naive(datetime.fromisoformat(value)) for value in dates),
+                    task_id)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+    
+    def get_task_etag(self, task_id: str) -> str:
+        """ETag de una tarea sin construirla ni serializarla"""
+        version = self._repository.get_version(task_id)
+        if version is None:
+            raise self.not_found(task_id)
+        return self.etag(version)
+    
+    @staticmethod
+    def not_found(task_id: str) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Task {task_id} not found"
+        )
+    
+    @staticmethod
+    def precondition_failed(task_id: str) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail=f"Task {task_id} was modified by another request"
+        )
+    
+    @staticmethod
+    def etag(version: int) -> str:
+        return f'"{version}"'
+    
+    @staticmethod
+    def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+        """Comparación débil de If-None-Match (admite listas y *)"""
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        return any(tag.strip().removeprefix("W/") == etag
+                   for tag in if_none_match.split(","))
+    
+    @staticmethod
+    def parse_if_match(if_match: str) -> Optional[int]:
+        """Versión esperada según If-Match; -1 si el ETag no es nuestro"""
+        tag = if_match.strip()
+        if tag == "*":
+            return None
+        try:
+            return int(tag.strip('"'))
+        except ValueError:
+            return -1
     
     def get_task(self, task_id: str) -> Task:
         """Obtener tarea por ID"""
         task = self._repository.get_by_id(task_id)
         if not task:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Task {task_id} not found"
-            )
+            raise self.not_found(task_id)
         return task
     
-    def update_task(self, task_id: str, task_update: TaskUpdate) -> Task:
-        """Actualizar tarea existente"""
-        task = self._repository.update(task_id, task_update)
+    def update_task(self, task_id: str, task_update: TaskUpdate,
+                    if_match: Optional[str] = None) -> Task:
+        """Actualizar tarea existente (con control optimista vía If-Match)"""
+        expected_version = self.parse_if_match(if_match) if if_match else None
+        try:
+            task = self._repository.update(task_id, task_update, expected_version)
+        except VersionConflictError:
+            raise self.precondition_failed(task_id)
         if not task:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Task {task_id} not found"
-            )
+            raise self.not_found(task_id)
         return task
     
+    def create_tasks(self, batch: List[TaskCreate]) -> BulkResult:
+        """Crear un lote de tareas en una sola operación del repositorio"""
+        results, accepted = self.check_new_tasks(batch)
+        created = self._repository.create_many([batch[i] for i in accepted])
+        return self.created_result(results, accepted, created)
+    
+    def update_tasks(self, batch: List[TaskBulkUpdate]) -> BulkResult:
+        """Actualizar un lote de tareas en una sola operación del repositorio"""
+        updated = self._repository.update_many([(item.id, item.changes) for item in batch])
+        return self.updated_result(batch, updated)
+    
+    def delete_tasks(self, task_ids: List[str]) -> BulkResult:
+        """Eliminar un lote de tareas en una sola operación del repositorio"""
+        deleted = self._repository.delete_many(task_ids)
+        return self.deleted_result(task_ids, deleted)
+    
+    def import_tasks(self, records: Iterator[tuple[int, object]], batch_size: int = 1000,
+                     max_errors: int = 100) -> ImportResult:
+        """Crear las tareas de (línea, TaskCreate o error) por lotes de `batch_size`"""
+        result = ImportResult(imported=0, failed=0, errors=[])
+        records = iter(records)
+        while chunk := list(islice(records, batch_size)):
+            accepted, errors = self.prepare_import(chunk)
+            created = self._repository.create_many(accepted) if accepted else []
+            self.record_import(result, len(created), errors, max_errors)
+        return result
+    
+    @classmethod
+    def prepare_import(cls, chunk: list) -> tuple[List[TaskCreate], List[tuple[int, str]]]:
+        """Separar un lote importado en tareas aceptadas y errores por línea"""
+        errors = [(line, record) for line, record in chunk if isinstance(record, str)]
+        valid = [(line, record) for line, record in chunk if not isinstance(record, str)]
+        results, accepted = cls.check_new_tasks([task for _, task in valid])
+        errors.extend((valid[i][0], item.detail) for i, item in enumerate(results)
+                      if item is not None)
+        errors.sort()
+        return [valid[i][1] for i in accepted], errors
+    
+    @staticmethod
+    def record_import(result: ImportResult, imported: int,
+                      errors: List[tuple[int, str]], max_errors: int) -> None:
+        result.imported += imported
+        result.failed += len(errors)
+        room = max(max_errors - len(result.errors), 0)
+        result.errors.extend(ImportLineError(line=line, detail=detail)
+                             for line, detail in errors[:room])
+    
+    @classmethod
+    def check_new_tasks(cls, batch: List[TaskCreate]) -> tuple[list, List[int]]:
+        """Aplicar las reglas de negocio a un lote; devuelve errores y posiciones válidas"""
+        results: list[Optional[BulkItemResult]] = [None] * len(batch)
+        accepted = []
+        now = datetime.now()
+        for index, task_data in enumerate(batch):
+            try:
+                cls._check_new_task(task_data, now)
+            except ValueError as e:
+                results[index] = BulkItemResult(index=index, status_code=400, detail=str(e))
+            else:
+                accepted.append(index)
+        return results, accepted
+    
+    @classmethod
+    def created_result(cls, results: list, accepted: List[int],
+                       created: List[Task]) -> BulkResult:
+        for index, task in zip(accepted, created):
+            results[index] = BulkItemResult(index=index, status_code=201, task=task)
+        return cls._bulk_result(results)
+    
+    @classmethod
+    def updated_result(cls, batch: List[TaskBulkUpdate],
+                       updated: List[Optional[Task]]) -> BulkResult:
+        return cls._bulk_result([
+            BulkItemResult(index=index, status_code=200, task=task) if task else
+            BulkItemResult(index=index, status_code=404, detail=f"Task {item.id} not found")
+            for index, (item, task) in enumerate(zip(batch, updated))
+        ])
+    
+    @classmethod
+    def deleted_result(cls, task_ids: List[str], deleted: List[bool]) -> BulkResult:
+        return cls._bulk_result([
+            BulkItemResult(index=index, status_code=200) if ok else
+            BulkItemResult(index=index, status_code=404, detail=f"Task {task_id} not found")
+            for index, (task_id, ok) in enumerate(zip(task_ids, deleted))
+        ])
+    
+    @staticmethod
+    def _bulk_result(results: List[BulkItemResult]) -> BulkResult:
+        failed = sum(1 for r in results if r.status_code >= 400)
+        return BulkResult(succeeded=len(results) - failed, failed=failed, results=results)
+    
     def delete_task(self, task_id: str) -> dict:
         """Eliminar tarea"""
         if not self._repository.delete(task_id):
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Task {task_id} not found"
-            )
+            raise self.not_found(task_id)
         return {"message": f"Task {task_id} deleted successfully"}
 
+class AsyncTaskService:
+    """Versión asíncrona de TaskService, usada por las rutas `async def`"""
+    def __init__(self, repository: "AsyncTaskRepository"):
+        self._repository = repository
+    
+    async def create_task(self, task_data: TaskCreate) -> Task:
+        """Crear nueva tarea con validaciones de negocio"""
+        TaskService._check_new_task(task_data, datetime.now())
+        return await self._repository.create(task_data)
+    
+    async def get_stats(self) -> TaskStatistics:
+        """Conteos por estado, prioridad y vencidas"""
+        return await self._repository.stats(datetime.now())
+    
+    async def search_tasks(self, query: str, limit: int = 20) -> List[Task]:
+        """Buscar por palabras (o prefijos) en título y descripción"""
+        return await self._repository.search(query, limit)
+    
+    async def changes_since(self, since: int) -> TaskChanges:
+        """Altas/cambios y bajas desde la versión `since`, o todo si ya no consta"""
+        version = await self._repository.current_version()
+        changes = self._repository.changes.since(since, version)
+        if changes is None:
+            return TaskChanges(version=version, full_resync=True,
+                               upserts=await self._repository.get_all(), deletions=[])
+        return TaskService.collapse_changes(changes, since)
+    
+    async def list_tasks_page(self, status: Optional[TaskStatus] = None,
+                              priority: Optional[TaskPriority] = None,
+                              assigned_to: Optional[str] = None,
+                              limit: Optional[int] = None,
+                              cursor: Optional[str] = None) -> tuple[List[Task], Optional[str]]:
+        """Listar una página de tareas; devuelve también el cursor de la siguiente"""
+        filters = TaskQuery(status=status, priority=priority, assigned_to=assigned_to)
+        return (await self.find_tasks_page(filters, limit, cursor))[:2]
+    
+    async def list_overdue_page(self, priority: Optional[TaskPriority] = None,
+                                assigned_to: Optional[str] = None,
+                                limit: Optional[int] = None,
+                                cursor: Optional[str] = None) -> tuple[List[Task], Optional[str]]:
+        """Página de tareas abiertas ya vencidas, de la más antigua a la más reciente"""
+        filters = TaskService.overdue_filters(priority, assigned_to)
+        return (await self.find_tasks_page(filters, limit, cursor))[:2]
+    
+    async def find_tasks_page(self, filters: TaskQuery, limit: Optional[int] = None,
+                              cursor: Optional[str] = None, explain: bool = False
+                              ) -> tuple[List[Task], Optional[str], Optional[QueryPlan]]:
+        """Página de tareas con cualquier combinación de filtros (y el plan si se pide)"""
+        after = TaskService.decode_cursor(cursor, filters.by_due) if cursor else None
+        fetch = limit + 1 if limit is not None else None
+        tasks, plan = await self._repository.find(filters, fetch, after, explain)
+        return (*TaskService.paginate(tasks, limit, filters.by_due), plan)
+    
+    def export_tasks(self, filters: TaskQuery, batch_size: int = 500) -> AsyncIterator[Task]:
+        """Todas las tareas filtradas, en orden y sin materializar la lista"""
+        return self._repository.iter_tasks(filters, batch_size)
+    
+    async def get_task_etag(self, task_id: str) -> str:
+        """ETag de una tarea sin construirla ni serializarla"""
+        version = await self._repository.get_version(task_id)
+        if version is None:
+            raise TaskService.not_found(task_id)
+        return TaskService.etag(version)
+    
+    async def get_task(self, task_id: str) -> Task:
+        """Obtener tarea por ID"""
+        task = await self._repository.get_by_id(task_id)
+        if not task:
+            raise TaskService.not_found(task_id)
+        return task
+    
+    async def update_task(self, task_id: str, task_update: TaskUpdate,
+                          if_match: Optional[str] = None) -> Task:
+        """Actualizar tarea existente (con control optimista vía If-Match)"""
+        expected_version = TaskService.parse_if_match(if_match) if if_match else None
+        try:
+            task = await self._repository.update(task_id, task_update, expected_version)
+        except VersionConflictError:
+            raise TaskService.precondition_failed(task_id)
+        if not task:
+            raise TaskService.not_found(task_id)
+        return task
+    
+    async def create_tasks(self, batch: List[TaskCreate]) -> BulkResult:
+        """Crear un lote de tareas en una sola operación del repositorio"""
+        results, accepted = TaskService.check_new_tasks(batch)
+        created = await self._repository.create_many([batch[i] for i in accepted])
+        return TaskService.created_result(results, accepted, created)
+    
+    async def import_tasks(self, records: AsyncIterator[tuple[int, object]],
+                           batch_size: int = 1000, max_errors: int = 100) -> ImportResult:
+        """Crear las tareas de (línea, TaskCreate o error) por lotes de `batch_size`.
+        
+        Solo se retiene un lote: la memoria no depende del tamaño de la importación.
+        """
+        result = ImportResult(imported=0, failed=0, errors=[])
+        chunk = []
+        
+        async def flush():
+            accepted, errors = TaskService.prepare_import(chunk)
+            created = await self._repository.create_many(accepted) if accepted else []
+            TaskService.record_import(result, len(created), errors, max_errors)
+            chunk.clear()
+        
+        async for record in records:
+            chunk.append(record)
+            if len(chunk) >= batch_size:
+                await flush()
+        if chunk:
+            await flush()
+        return result
+    
+    async def update_tasks(self, batch: List[TaskBulkUpdate]) -> BulkResult:
+        """Actualizar un lote de tareas en una sola operación del repositorio"""
+        updated = await self._repository.update_many([(item.id, item.changes)
+                                                      for item in batch])
+        return TaskService.updated_result(batch, updated)
+    
+    async def delete_tasks(self, task_ids: List[str]) -> BulkResult:
+        """Eliminar un lote de tareas en una sola operación del repositorio"""
+        deleted = await self._repository.delete_many(task_ids)
+        return TaskService.deleted_result(task_ids, deleted)
+    
+    async def delete_task(self, task_id: str) -> dict:
+        """Eliminar tarea"""
+        if not await self._repository.delete(task_id):
+            raise TaskService.not_found(task_id)
+        return {"message": f"Task {task_id} deleted successfully"}
+
+# ============= RESPONSE CACHE =============
+
+class ListResponseCache:
+    """LRU de listados ya codificados en JSON, invalidada por la versión del repositorio"""
+    def __init__(self, max_entries: int):
+        self._max_entries = max_entries
+        self._entries: OrderedDict[tuple, tuple[bytes, Optional[str]]] = OrderedDict()
+        self._version: Optional[int] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def _sync(self, version: int) -> None:
+        # Cualquier escritura deja obsoletas todas las entradas
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+    
+    def get(self, key: tuple, version: int) -> Optional[tuple[bytes, Optional[str]]]:
+        with self._lock:
+            self._sync(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+    
+    def put(self, key: tuple, version: int, entry: tuple[bytes, Optional[str]]) -> None:
+        if self._max_entries <= 0:
+            return
+        with self._lock:
+            self._sync(version)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+    
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+# ============= METRICS =============
+
+class _Histogram:
+    """Histograma de cubos fijos; los conteos se acumulan solo al exportar"""
+    __slots__ = ("bounds", "counts", "sum")
+    
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0
+    
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+    
+    def merge(self, other: "_Histogram") -> None:
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.sum += other.sum
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+class RequestMetrics:
+    """Latencia y tamaños por (método, ruta, estado) con un shard por hilo.
+    
+    Cada hilo solo escribe en su propio shard, así registrar no toma locks;
+    el lock solo protege el alta de shards y la fusión al exportar.
+    """
+    LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                       0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+    SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+    
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: list[dict] = []
+        self._lock = threading.Lock()
+    
+    def _shard(self) -> dict:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+    
+    def record(self, method: str, route: str, status_code: int, seconds: float,
+               request_bytes: int, response_bytes: int) -> None:
+        shard = self._shard()
+        key = (method, route, status_code)
+        histograms = shard.get(key)
+        if histograms is None:
+            histograms = shard[key] = (_Histogram(self.LATENCY_BUCKETS),
+                                       _Histogram(self.SIZE_BUCKETS),
+                                       _Histogram(self.SIZE_BUCKETS))
+        latency, request_size, response_size = histograms
+        latency.observe(seconds)
+        request_size.observe(request_bytes)
+        response_size.observe(response_bytes)
+    
+    def snapshot(self) -> dict[tuple, tuple]:
+        """Fusionar todos los shards en histogramas nuevos"""
+        merged: dict[tuple, tuple] = {}
+        with self._lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for key, histograms in list(shard.items()):
+                target = merged.get(key)
+                if target is None:
+                    target = merged[key] = tuple(_Histogram(h.bounds) for h in histograms)
+                for total, part in zip(target, histograms):
+                    total.merge(part)
+        return merged
+    
+    def render(self) -> list[str]:
+        """Líneas en formato de texto de Prometheus"""
+        snapshot = sorted(self.snapshot().items())
+        lines = []
+        for position, (name, help_text) in enumerate((
+                ("http_request_duration_seconds", "Latencia de las peticiones HTTP"),
+                ("http_request_size_bytes", "Tamaño del cuerpo de las peticiones"),
+                ("http_response_size_bytes", "Tamaño del cuerpo de las respuestas"))):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for (method, route, status_code), histograms in snapshot:
+                histogram = histograms[position]
+                labels = (f'method="{method}",route="{prometheus_escape(route)}",'
+                          f'status="{status_code}"')
+                cumulative = 0
+                for bound, count in zip(histogram.bounds + (float("inf"),), histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+                lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+                lines.append(f"{name}_count{{{labels}}} {cumulative}")
+        return lines
+
+def prometheus_escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def repository_metric_lines(total: int, version: int, index_sizes: dict,
+                            cache_stats: dict) -> list[str]:
+    """Contadores del repositorio y de la caché de listados en formato Prometheus"""
+    lookups = cache_stats["hits"] + cache_stats["misses"]
+    lines = [
+        "# HELP tasks_stored Tareas almacenadas en el repositorio",
+        "# TYPE tasks_stored gauge",
+        f"tasks_stored {total}",
+        "# HELP tasks_repository_version Escrituras aplicadas al repositorio",
+        "# TYPE tasks_repository_version counter",
+        f"tasks_repository_version {version}",
+        "# HELP tasks_index_entries Entradas por valor en cada índice secundario",
+        "# TYPE tasks_index_entries gauge",
+    ]
+    for index, sizes in index_sizes.items():
+        for value, size in sorted(sizes.items()):
+            lines.append(f'tasks_index_entries{{index="{index}",'
+                         f'value="{prometheus_escape(value)}"}} {size}')
+    lines += [
+        "# HELP tasks_list_cache_entries Listados codificados en la caché",
+        "# TYPE tasks_list_cache_entries gauge",
+        f"tasks_list_cache_entries {cache_stats['entries']}",
+        "# HELP tasks_list_cache_hits_total Aciertos de la caché de listados",
+        "# TYPE tasks_list_cache_hits_total counter",
+        f"tasks_list_cache_hits_total {cache_stats['hits']}",
+        "# HELP tasks_list_cache_misses_total Fallos de la caché de listados",
+        "# TYPE tasks_list_cache_misses_total counter",
+        f"tasks_list_cache_misses_total {cache_stats['misses']}",
+        "# HELP tasks_list_cache_hit_ratio Proporción de aciertos de la caché de listados",
+        "# TYPE tasks_list_cache_hit_ratio gauge",
+        f"tasks_list_cache_hit_ratio {cache_stats['hits'] / lookups if lookups else 0.0}",
+    ]
+    return lines
+
+class MetricsMiddleware:
+    """Middleware ASGI que mide cada petición HTTP y la etiqueta con la plantilla de ruta"""
+    def __init__(self, app, metrics: RequestMetrics):
+        self.app = app
+        self.metrics = metrics
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        sizes = [0, 0]
+        status_holder = [500]
+        
+        async def counting_receive():
+            message = await receive()
+            sizes[0] += len(message.get("body", b""))
+            return message
+        
+        async def counting_send(message):
+            if message["type"] == "http.response.start":
+                status_holder[0] = message["status"]
+            elif message["type"] == "http.response.body":
+                sizes[1] += len(message.get("body", b""))
+            await send(message)
+        
+        start = time.perf_counter()
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            # El router deja la ruta resuelta en el scope; sin ella, una sola etiqueta
+            route = scope.get("route")
+            self.metrics.record(scope["method"], getattr(route, "path", "unmatched"),
+                                status_holder[0], time.perf_counter() - start,
+                                sizes[0], sizes[1])
+
+# ============= CHANGE FEED =============
+
+def encode_event(change: TaskChange) -> bytes:
+    """Evento SSE de un cambio; el id es el seq para reanudar con Last-Event-ID"""
+    if change.task is None:
+        data = json.dumps({"id": change.task_id})
+    else:
+        data = task_adapter.dump_json(change.task).decode()
+    return f"id: {change.seq}\nevent: {change.op}\ndata: {data}\n\n".encode()
+
+class ChangeBroker:
+    """Reparte los cambios del repositorio entre los suscriptores SSE.
+    
+    Cada cambio se codifica una sola vez y se encola en la cola acotada de cada
+    suscriptor; si una cola se llena, ese suscriptor se descarta y, al reconectar
+    con Last-Event-ID, recupera lo perdido desde el registro de cambios.
+    """
+    def __init__(self, change_log: ChangeLog, queue_size: int):
+        self.change_log = change_log
+        self._queue_size = queue_size
+        self._subscribers: set[asyncio.Queue] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        change_log.add_listener(self._on_changes)
+    
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+    
+    def subscribe(self) -> asyncio.Queue:
+        self._loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(self._queue_size)
+        self._subscribers.add(queue)
+        return queue
+    
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+    
+    def _on_changes(self, changes: List[TaskChange]) -> None:
+        # Lo llama el repositorio en el hilo que escribió (event loop o threadpool)
+        loop = self._loop
+        if not self._subscribers or loop is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._publish(changes)
+        else:
+            loop.call_soon_threadsafe(self._publish, changes)
+    
+    def _publish(self, changes: List[TaskChange]) -> None:
+        frames = [(change.seq, encode_event(change)) for change in changes]
+        for queue in list(self._subscribers):
+            try:
+                for frame in frames:
+                    queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                self._drop(queue)
+    
+    def _drop(self, queue: asyncio.Queue) -> None:
+        """Descartar un consumidor lento: vaciar su cola y dejar la señal de cierre"""
+        self._subscribers.discard(queue)
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+    
+    async def stream(self, last_event_id: Optional[int], keepalive: float,
+                     version: Optional[int] = None):
+        """Eventos SSE: pendientes desde `last_event_id` y luego los nuevos.
+        
+        `version` es la del almacén (ver ChangeLog.since).
+        """
+        queue = self.subscribe()
+        try:
+            if last_event_id is None:
+                last_sent = max(self.change_log.last_seq, version or 0)
+                yield (f"id: {last_sent}\nevent: ready\n"
+                       f"data: {json.dumps({'seq': last_sent})}\n\n").encode()
+            else:
+                backlog = self.change_log.since(last_event_id, version)
+                if backlog is None:
+                    # Cambios ya compactados o de otro proceso: el cliente debe recargar
+                    last_sent = max(self.change_log.last_seq, version or 0)
+                    yield (f"id: {last_sent}\nevent: reset\n"
+                           f"data: {json.dumps({'seq': last_sent})}\n\n").encode()
+                else:
+                    last_sent = last_event_id
+                    for change in backlog:
+                        yield encode_event(change)
+                        last_sent = change.seq
+            
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), keepalive)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                if item is None:
+                    yield b"event: dropped\ndata: {}\n\n"
+                    return
+                seq, frame = item
+                # Lo encolado mientras se enviaba el registro puede venir repetido
+                if seq > last_sent:
+                    yield frame
+                    last_sent = seq
+        finally:
+            self.unsubscribe(queue)
+
+# ============= CONFIGURATION =============
+
+class Settings(BaseSettings):
+    """Configuración leída del entorno (prefijo TASKS_)"""
+    model_config = SettingsConfigDict(env_prefix="TASKS_")
+    
+    repository: str = Field("memory", pattern="^(memory|sqlite)$")
+    sqlite_path: str = "tasks.db"
+    bulk_max_items: int = Field(1000, ge=1)
+    list_cache_size: int = Field(256, ge=0)
+    # Serializar una sola vez con TypeAdapter y saltar la validación de response_model
+    fast_serialization: bool = False
+    # Cambios recientes que se pueden reenviar a un cliente SSE que reconecta
+    change_log_size: int = Field(10_000, ge=1)
+    event_queue_size: int = Field(1000, ge=1)
+    event_keepalive_seconds: float = Field(15.0, gt=0)
+    # Persistencia del repositorio en memoria (WAL + snapshots); sin directorio, no persiste
+    wal_dir: Optional[str] = None
+    wal_fsync: str = Field("interval", pattern="^(always|interval|never)$")
+    wal_fsync_interval_ms: float = Field(10.0, gt=0)
+    wal_snapshot_every: int = Field(100_000, ge=1)
+    # MappedTaskSnapshot con el que arrancar (p. ej. empaquetado en el despliegue serverless)
+    snapshot_path: Optional[str] = None
+    # GET /tasks/export: tareas leídas por lote y bytes acumulados por trozo enviado
+    export_batch_size: int = Field(500, ge=1)
+    export_chunk_bytes: int = Field(64 * 1024, ge=1)
+    # POST /tasks/import: registros por create_many, errores devueltos y línea máxima
+    import_batch_size: int = Field(1000, ge=1)
+    import_max_errors: int = Field(100, ge=0)
+    import_max_line_bytes: int = Field(64 * 1024, ge=1)
+    
+    @model_validator(mode="after")
+    def check_persistence(self) -> "Settings":
+        # Con WAL el arranque sale de wal_dir: el snapshot mapeado se ignoraría
+        if self.wal_dir and self.snapshot_path:
+            raise ValueError("TASKS_WAL_DIR and TASKS_SNAPSHOT_PATH cannot be combined")
+        return self
+
+def build_repository(settings: Settings) -> TaskRepository:
+    """Seleccionar la implementación del repositorio al arrancar"""
+    if settings.repository == "sqlite":
+        return SqliteTaskRepository(settings.sqlite_path, settings.change_log_size)
+    wal = None
+    if settings.wal_dir:
+        wal = TaskWriteAheadLog(settings.wal_dir, settings.wal_fsync,
+                                settings.wal_fsync_interval_ms / 1000,
+                                settings.wal_snapshot_every)
+    return InMemoryTaskRepository(settings.change_log_size, wal, settings.snapshot_path)
+
 # ============= API APPLICATION =============
 
+class LazyTypeAdapter:
+    """TypeAdapter construido en el primer uso (las rutas poco usadas no pagan en el arranque)"""
+
+    def __init__(self, annotation):
+        self._annotation = annotation
+        self._adapter = None
+
+    def __getattr__(self, name):
+        # Solo llegan aquí los atributos del TypeAdapter (validate_json, dump_json...)
+        if self._adapter is None:
+            self._adapter = TypeAdapter(self._annotation)
+        return getattr(self._adapter, name)
+
 app = FastAPI(
     title="Enterprise Task Management API",
     description="API REST para gestión de tareas con principios SOLID",
@@ -200,16 +3149,197 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 # Dependency Injection
-repository = InMemoryTaskRepository()
+settings = Settings()
+repository = build_repository(settings)
 task_service = TaskService(repository)
+# Las rutas son `async def`: el repositorio en memoria se usa sin saltos al threadpool
+async_repository = AsyncTaskRepositoryAdapter(repository)
+async_task_service = AsyncTaskService(async_repository)
+list_cache = ListResponseCache(settings.list_cache_size)
+request_metrics = RequestMetrics()
+change_broker = ChangeBroker(repository.changes, settings.event_queue_size)
+app.add_middleware(MetricsMiddleware, metrics=request_metrics)
+task_adapter = TypeAdapter(Task)
+task_list_adapter = TypeAdapter(List[Task])
+bulk_result_adapter = TypeAdapter(BulkResult)
+task_changes_adapter = LazyTypeAdapter(TaskChanges)
+task_list_explanation_adapter = LazyTypeAdapter(TaskListExplanation)
+
+# Validación de lotes en una sola pasada directamente desde el JSON crudo
+bulk_create_adapter = LazyTypeAdapter(
+    Annotated[List[TaskCreate], Field(min_length=1, max_length=settings.bulk_max_items)])
+bulk_update_adapter = LazyTypeAdapter(
+    Annotated[List[TaskBulkUpdate], Field(min_length=1, max_length=settings.bulk_max_items)])
+bulk_delete_adapter = LazyTypeAdapter(
+    Annotated[List[str], Field(min_length=1, max_length=settings.bulk_max_items)])
+import_result_adapter = LazyTypeAdapter(ImportResult)
+
+def etag_headers(etag: str) -> dict:
+    # no-cache obliga al navegador a revalidar con If-None-Match en cada petición
+    return {"ETag": etag, "Cache-Control": "no-cache"}
+
+def not_modified(etag: str) -> Response:
+    """304 sin cuerpo: no se consulta ni serializa nada"""
+    return Response(status_code=304, headers=etag_headers(etag))
+
+def encode_json(payload, adapter: TypeAdapter) -> bytes:
+    """Codificar con el serializador compilado (modo rápido) o como lo hace FastAPI"""
+    if settings.fast_serialization:
+        return adapter.dump_json(payload)
+    # Igual que JSONResponse.render
+    return json.dumps(jsonable_encoder(payload), ensure_ascii=False, allow_nan=False,
+                      indent=None, separators=(",", ":")).encode("utf-8")
+
+def render(payload, adapter: TypeAdapter, response: Response,
+           headers: Optional[dict] = None, status_code: int = status.HTTP_200_OK):
+    """Modo rápido: devolver bytes ya serializados sin pasar por response_model.
+    
+    El response_model de cada ruta se mantiene para que el esquema OpenAPI no cambie.
+    """
+    if not settings.fast_serialization:
+        if headers:
+            response.headers.update(headers)
+        return payload
+    return Response(content=adapter.dump_json(payload), status_code=status_code,
+                    media_type="application/json", headers=headers)
+
+async def raw_body(request: Request) -> bytes:
+    """Cuerpo sin procesar, para validarlo con un TypeAdapter"""
+    return await request.body()
+
+async def ndjson_chunks(tasks: AsyncIterator[Task]) -> AsyncIterator[bytes]:
+    """Una tarea JSON por línea, agrupadas en trozos de ~export_chunk_bytes"""
+    chunk_bytes = settings.export_chunk_bytes
+    buffer = bytearray()
+    async for task in tasks:
+        buffer += task_adapter.dump_json(task)
+        buffer += b"\n"
+        if len(buffer) >= chunk_bytes:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+async def body_lines(chunks: AsyncIterator[bytes],
+                     max_line_bytes: int) -> AsyncIterator[tuple[int, Optional[bytes]]]:
+    """(número, línea sin fin de línea) según llegan los trozos; None si es demasiado larga"""
+    pending = bytearray()
+    line_no = 0
+    # Se descarta el resto de una línea demasiado larga hasta su salto
+    skipping = False
+    async for chunk in chunks:
+        start = 0
+        while (end := chunk.find(b"\n", start)) != -1:
+            line_no += 1
+            if skipping or len(pending) + end - start > max_line_bytes:
+                yield line_no, None
+            else:
+                pending += chunk[start:end]
+                yield line_no, bytes(pending.rstrip(b"\r"))
+            pending.clear()
+            skipping = False
+            start = end + 1
+        if not skipping:
+            pending += chunk[start:]
+            if len(pending) > max_line_bytes:
+                pending.clear()
+                skipping = True
+    if skipping or pending:
+        yield line_no + 1, None if skipping else bytes(pending.rstrip(b"\r"))
+
+def validation_detail(error: ValidationError) -> str:
+    """Errores de validación en una línea: `campo: mensaje; ...`"""
+    return "; ".join(f"{'.'.join(map(str, e['loc'])) or 'body'}: {e['msg']}"
+                     for e in error.errors(include_url=False))
+
+async def ndjson_records(lines: AsyncIterator[tuple[int, Optional[bytes]]]
+                         ) -> AsyncIterator[tuple[int, object]]:
+    """Un TaskCreate (o el motivo del error) por línea no vacía"""
+    async for line_no, line in lines:
+        if line is None:
+            yield line_no, f"Line exceeds {settings.import_max_line_bytes} bytes"
+        elif line.strip():
+            try:
+                yield line_no, TaskCreate.model_validate_json(line)
+            except ValidationError as e:
+                yield line_no, validation_detail(e)
+
+async def csv_records(lines: AsyncIterator[tuple[int, Optional[bytes]]]
+                      ) -> AsyncIterator[tuple[int, object]]:
+    """Un TaskCreate (o el motivo del error) por fila; la primera fila nombra las columnas.
+    
+    Un campo entre comillas puede ocupar varias líneas: la fila termina cuando
+    las comillas quedan equilibradas, y no puede pasar de import_max_line_bytes
+    (si lo hace se descarta y se sigue en la línea siguiente). Las celdas vacías
+    toman el valor por defecto.
+    """
+    max_bytes = settings.import_max_line_bytes
+    header = None
+    # Fila en curso: líneas, línea donde empieza, bytes y comillas acumulados
+    pending, first, size, quotes = [], 0, 0, 0
+    async for line_no, line in lines:
+        if line is None:
+            yield first or line_no, f"Line exceeds {max_bytes} bytes"
+            pending, first, size, quotes = [], 0, 0, 0
+            continue
+        try:
+            text = line.decode("utf-8")
+        except UnicodeDecodeError:
+            yield first or line_no, "Invalid UTF-8"
+            pending, first, size, quotes = [], 0, 0, 0
+            continue
+        if header is None and not pending:
+            text = text.lstrip("\ufeff")
+        if not pending and not (text.startswith('"') or ',"' in text):
+            # Sin campos entre comillas una comilla suelta es literal (como en csv.reader)
+            row_text, row_line = text, line_no
+        else:
+            pending.append(text)
+            first = first or line_no
+            size += len(line) + 1
+            quotes += text.count('"')
+            if size > max_bytes:
+                yield first, f"Row exceeds {max_bytes} bytes"
+                pending, first, size, quotes = [], 0, 0, 0
+                continue
+            if quotes % 2:
+                continue
+            row_text, row_line = "\n".join(pending), first
+            pending, first, size, quotes = [], 0, 0, 0
+        if not row_text.strip():
+            continue
+        row = next(csv.reader([row_text]))
+        if header is None:
+            header = [name.strip() for name in row]
+            if "title" not in header:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                    detail="CSV header must include a 'title' column")
+            continue
+        if len(row) != len(header):
+            yield row_line, f"Expected {len(header)} fields, got {len(row)}"
+            continue
+        try:
+            yield row_line, TaskCreate.model_validate(
+                {name: value for name, value in zip(header, row) if value != ""})
+        except ValidationError as e:
+            yield row_line, validation_detail(e)
+    if pending:
+        yield first, "Unterminated quoted field"
+
+def validate_batch(adapter: TypeAdapter, body: bytes) -> list:
+    try:
+        return adapter.validate_json(body)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors(include_url=False))
 
 # ============= ROUTES =============
 
 @app.get("/")
-def root():
+async def root():
     """Health check endpoint"""
     return {
         "status": "healthy",
@@ -218,45 +3348,227 @@ def root():
     }
 
 @app.post("/tasks", response_model=Task, status_code=status.HTTP_201_CREATED)
-def create_task(task: TaskCreate):
+async def create_task(task: TaskCreate, response: Response):
     """Crear nueva tarea"""
     try:
-        return task_service.create_task(task)
+        created = await async_task_service.create_task(task)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return render(created, task_adapter, response,
+                  etag_headers(TaskService.etag(created._version)),
+                  status_code=status.HTTP_201_CREATED)
+
+@app.post("/tasks/bulk", response_model=BulkResult)
+async def create_tasks_bulk(response: Response, body: bytes = Depends(raw_body)):
+    """Crear un lote de tareas (array JSON de TaskCreate)"""
+    result = await async_task_service.create_tasks(validate_batch(bulk_create_adapter, body))
+    return render(result, bulk_result_adapter, response)
+
+@app.post("/tasks/import", response_model=ImportResult)
+async def import_tasks(request: Request, response: Response,
+                       format: Optional[str] = Query(None, pattern="^(ndjson|csv)$")):
+    """Importar tareas desde un cuerpo NDJSON o CSV recibido en streaming.
+    
+    El formato sale de `format` o del Content-Type (`text/csv`; si no, NDJSON).
+    Cada registro se valida como TaskCreate y se crean por lotes de
+    `import_batch_size`; los registros inválidos se cuentan en `failed` y se
+    informan por línea sin detener la importación.
+    """
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        format = "csv" if content_type.startswith("text/csv") else "ndjson"
+    lines = body_lines(request.stream(), settings.import_max_line_bytes)
+    records = csv_records(lines) if format == "csv" else ndjson_records(lines)
+    result = await async_task_service.import_tasks(records, settings.import_batch_size,
+                                                   settings.import_max_errors)
+    return render(result, import_result_adapter, response)
+
+@app.patch("/tasks/bulk", response_model=BulkResult)
+async def update_tasks_bulk(response: Response, body: bytes = Depends(raw_body)):
+    """Actualizar un lote de tareas (array JSON de {id, changes})"""
+    result = await async_task_service.update_tasks(validate_batch(bulk_update_adapter, body))
+    return render(result, bulk_result_adapter, response)
+
+@app.delete("/tasks/bulk", response_model=BulkResult)
+async def delete_tasks_bulk(response: Response, body: bytes = Depends(raw_body)):
+    """Eliminar un lote de tareas (array JSON de ids)"""
+    result = await async_task_service.delete_tasks(validate_batch(bulk_delete_adapter, body))
+    return render(result, bulk_result_adapter, response)
 
 @app.get("/tasks", response_model=List[Task])
-def list_tasks(
+async def list_tasks(
+    request: Request,
     status: Optional[TaskStatus] = None,
-    priority: Optional[TaskPriority] = None
+    priority: Optional[TaskPriority] = None,
+    assigned_to: Optional[str] = None,
+    due_after: Optional[datetime] = None,
+    due_before: Optional[datetime] = None,
+    q: Optional[str] = Query(None, min_length=1, max_length=200),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    explain: bool = False
 ):
-    """Listar todas las tareas con filtros opcionales"""
-    return task_service.list_tasks(status, priority)
+    """Listar tareas con filtros combinables y paginación por cursor.
+    
+    Con `due_after`/`due_before` solo se listan tareas con fecha límite en
+    [due_after, due_before), ordenadas por fecha límite ascendente.
+    `q` exige que todas sus palabras aparezcan (como prefijo) en título o descripción.
+    Si hay más resultados, el cursor de la siguiente página va en `X-Next-Cursor`.
+    Responde 304 si `If-None-Match` coincide con la versión actual del repositorio.
+    Las respuestas se sirven desde `list_cache` mientras no haya escrituras.
+    Con `explain=true` (depuración) responde {plan, tasks} sin pasar por la caché.
+    """
+    filters = TaskQuery(status=status, priority=priority, assigned_to=assigned_to,
+                        due_after=due_after, due_before=due_before, text=q)
+    if explain:
+        tasks, next_cursor, plan = await async_task_service.find_tasks_page(
+            filters, limit, cursor, explain=True)
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+        return Response(content=encode_json(TaskListExplanation(plan=plan, tasks=tasks),
+                                            task_list_explanation_adapter),
+                        media_type="application/json", headers=headers)
+    
+    version = await async_repository.current_version()
+    etag = TaskService.etag(version)
+    if TaskService.etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    
+    key = (filters, limit, cursor)
+    cached = list_cache.get(key, version)
+    if cached is None:
+        tasks, next_cursor, _ = await async_task_service.find_tasks_page(filters, limit, cursor)
+        cached = (encode_json(tasks, task_list_adapter), next_cursor)
+        list_cache.put(key, version, cached)
+    
+    body, next_cursor = cached
+    headers = etag_headers(etag)
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/tasks/overdue", response_model=List[Task])
+async def list_overdue_tasks(
+    priority: Optional[TaskPriority] = None,
+    assigned_to: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = None
+):
+    """Tareas sin completar ni cancelar cuya fecha límite ya pasó, la más antigua primero.
+    
+    Depende de la hora actual, así que no pasa por `list_cache` ni lleva ETag.
+    """
+    tasks, next_cursor = await async_task_service.list_overdue_page(
+        priority, assigned_to, limit, cursor)
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return Response(content=encode_json(tasks, task_list_adapter),
+                    media_type="application/json", headers=headers)
+
+@app.get("/tasks/export", response_class=StreamingResponse)
+async def export_tasks(
+    status: Optional[TaskStatus] = None,
+    priority: Optional[TaskPriority] = None,
+    assigned_to: Optional[str] = None,
+    due_after: Optional[datetime] = None,
+    due_before: Optional[datetime] = None,
+    q: Optional[str] = Query(None, min_length=1, max_length=200),
+    format: str = Query("ndjson", pattern="^ndjson$")
+):
+    """Exportar todas las tareas filtradas como NDJSON (una por línea), en streaming.
+    
+    Mismos filtros y orden que `GET /tasks`, sin paginar: se leen por lotes del
+    repositorio y se envían con chunked encoding, así que la memoria no crece con
+    el número de tareas. Las escrituras durante la exportación pueden aparecer o no.
+    """
+    filters = TaskQuery(status=status, priority=priority, assigned_to=assigned_to,
+                        due_after=due_after, due_before=due_before, text=q)
+    tasks = async_task_service.export_tasks(filters, settings.export_batch_size)
+    return StreamingResponse(
+        ndjson_chunks(tasks),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="tasks.ndjson"'}
+    )
+
+@app.get("/tasks/events", response_class=StreamingResponse)
+async def task_events(last_event_id: Optional[str] = Header(None)):
+    """Stream SSE de cambios (created/updated/deleted); reanuda desde Last-Event-ID"""
+    try:
+        resume_from = int(last_event_id) if last_event_id is not None else None
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Invalid Last-Event-ID")
+    version = await async_repository.current_version()
+    return StreamingResponse(
+        change_broker.stream(resume_from, settings.event_keepalive_seconds, version),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/tasks/changes", response_model=TaskChanges)
+async def get_task_changes(response: Response, since: int = Query(..., ge=0)):
+    """Cambios desde la versión `since` (tombstones para las bajas).
+    
+    Si esa versión ya salió del registro, responde `full_resync` con todas las tareas.
+    """
+    changes = await async_task_service.changes_since(since)
+    return render(changes, task_changes_adapter, response)
+
+@app.get("/tasks/search", response_model=List[Task])
+async def search_tasks(response: Response,
+                       q: str = Query(..., min_length=1, max_length=200),
+                       limit: int = Query(20, ge=1, le=100)):
+    """Búsqueda de texto (sin tildes, por prefijo) ordenada por relevancia"""
+    tasks = await async_task_service.search_tasks(q, limit)
+    return render(tasks, task_list_adapter, response)
+
+@app.get("/tasks/stats", response_model=TaskStatistics)
+async def get_task_stats():
+    """Conteos por estado y prioridad, vencidas y total (sin listar las tareas)"""
+    return await async_task_service.get_stats()
 
 @app.get("/tasks/{task_id}", response_model=Task)
-def get_task(task_id: str):
-    """Obtener tarea por ID"""
-    return task_service.get_task(task_id)
+async def get_task(task_id: str, request: Request, response: Response):
+    """Obtener tarea por ID (responde 304 si If-None-Match coincide)"""
+    etag = await async_task_service.get_task_etag(task_id)
+    if TaskService.etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    
+    task = await async_task_service.get_task(task_id)
+    return render(task, task_adapter, response, etag_headers(TaskService.etag(task._version)))
 
 @app.put("/tasks/{task_id}", response_model=Task)
-def update_task(task_id: str, task_update: TaskUpdate):
-    """Actualizar tarea existente"""
-    return task_service.update_task(task_id, task_update)
+async def update_task(task_id: str, task_update: TaskUpdate, request: Request, response: Response):
+    """Actualizar tarea existente; con If-Match responde 412 si cambió entre medias"""
+    task = await async_task_service.update_task(task_id, task_update,
+                                                request.headers.get("if-match"))
+    return render(task, task_adapter, response, etag_headers(TaskService.etag(task._version)))
 
 @app.delete("/tasks/{task_id}")
-def delete_task(task_id: str):
+async def delete_task(task_id: str):
     """Eliminar tarea"""
-    return task_service.delete_task(task_id)
+    return await async_task_service.delete_task(task_id)
 
 @app.get("/health")
-def health_check():
+async def health_check():
     """Endpoint de salud para monitoreo"""
+    stats = await async_task_service.get_stats()
     return {
         "status": "ok",
         "timestamp": datetime.now().isoformat(),
-        "total_tasks": len(repository.get_all())
+        "total_tasks": stats.total,
+        "overdue_tasks": stats.overdue,
+        "list_cache": list_cache.stats()
     }
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Métricas en formato de texto de Prometheus"""
+    lines = request_metrics.render()
+    lines += repository_metric_lines(await async_repository.count(),
+                                     await async_repository.current_version(),
+                                     await async_repository.index_sizes(),
+                                     list_cache.stats())
+    return PlainTextResponse("\n".join(lines) + "\n", media_type=PROMETHEUS_CONTENT_TYPE)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,114 @@
+"""
+Perfil de arranque: desglose del tiempo de import, al estilo de `python -X importtime`
+Mide cada módulo cargado durante el bloque (tiempo propio y acumulado con sus imports)
+
+Con TASKS_STARTUP_PROFILE=1, api/index.py importa la aplicación dentro de
+ImportProfiler y escribe el desglose en stderr (los logs de la función serverless).
+En local: python -m app.startup [módulo] [filas]
+"""
+import importlib
+import os
+import sys
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+
+@dataclass
+class ImportTiming:
+    name: str
+    # Profundidad en el árbol de imports (0: importado directamente desde el bloque)
+    depth: int
+    self_us: int
+    cumulative_us: int
+
+class _TimedLoader:
+    """Envuelve el loader de un módulo para medir su exec_module"""
+
+    def __init__(self, loader, profiler: "ImportProfiler", name: str):
+        self._loader = loader
+        self._profiler = profiler
+        self._name = name
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        # El módulo ve su loader real (importlib.resources, get_data...)
+        module.__loader__ = self._loader
+        if module.__spec__ is not None:
+            module.__spec__.loader = self._loader
+        self._profiler._enter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._profiler._exit(self._name)
+
+class ImportProfiler:
+    """Finder en sys.meta_path que cronometra los módulos importados dentro del bloque"""
+
+    def __init__(self):
+        self.timings: List[ImportTiming] = []
+        self.total_us = 0
+        # Por nivel abierto: [inicio, tiempo acumulado de los hijos]
+        self._stack = []
+
+    def __enter__(self) -> "ImportProfiler":
+        sys.meta_path.insert(0, self)
+        importlib.invalidate_caches()
+        self._started = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.total_us = (time.perf_counter_ns() - self._started) // 1000
+        sys.meta_path.remove(self)
+        return False
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        # Módulos de espacio de nombres o loaders sin exec_module: sin medir
+        if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+            spec.loader = _TimedLoader(spec.loader, self, fullname)
+        return spec
+
+    def _enter(self):
+        self._stack.append([time.perf_counter_ns(), 0])
+
+    def _exit(self, name: str):
+        started, children = self._stack.pop()
+        cumulative = time.perf_counter_ns() - started
+        if self._stack:
+            self._stack[-1][1] += cumulative
+        self.timings.append(ImportTiming(name, len(self._stack),
+                                         (cumulative - children) // 1000, cumulative // 1000))
+
+    def top(self, limit: int = 25) -> List[ImportTiming]:
+        """Módulos más caros por tiempo acumulado"""
+        return sorted(self.timings, key=lambda t: t.cumulative_us, reverse=True)[:limit]
+
+    def report(self, limit: Optional[int] = 25) -> str:
+        """Tabla como la de -X importtime, ordenada por tiempo acumulado"""
+        timings = self.top(limit) if limit else self.timings
+        lines = [f"startup: {self.total_us / 1000:.1f}ms, {len(self.timings)} modules imported",
+                 "import time: self [us] | cumulative | imported package"]
+        lines.extend(f"import time: {t.self_us:>10} | {t.cumulative_us:>10} | "
+                     f"{'  ' * t.depth}{t.name}" for t in timings)
+        return "\n".join(lines)
+
+def enabled() -> bool:
+    return os.environ.get("TASKS_STARTUP_PROFILE", "").lower() in ("1", "true", "yes")
+
+if __name__ == "__main__":
+    module = sys.argv[1] if len(sys.argv) > 1 else "app.main"
+    with ImportProfiler() as profiler:
+        importlib.import_module(module)
+    print(profiler.report(int(sys.argv[2]) if len(sys.argv) > 2 else 25))
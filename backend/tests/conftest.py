@@ -2,9 +2,76 @@
 Configuración global para pytest
 Agrega el directorio backend al path de Python
 """
+import asyncio
 import sys
 from pathlib import Path
+import pytest
 
 # Agregar el directorio padre (backend) al path
 backend_dir = Path(__file__).parent.parent
 sys.path.insert(0, str(backend_dir))
+
+# ============= SHARED FIXTURES =============
+
+@pytest.fixture
+def use_repository(monkeypatch):
+    """Instala un repositorio aislado en la aplicación (servicios, caché y broker SSE)"""
+    import app.main as main
+
+    def install(repository, list_cache_size: int = 0):
+        async_repository = main.AsyncTaskRepositoryAdapter(repository)
+        monkeypatch.setattr(main, "repository", repository)
+        monkeypatch.setattr(main, "task_service", main.TaskService(repository))
+        monkeypatch.setattr(main, "async_repository", async_repository)
+        monkeypatch.setattr(main, "async_task_service", main.AsyncTaskService(async_repository))
+        monkeypatch.setattr(main, "list_cache", main.ListResponseCache(list_cache_size))
+        monkeypatch.setattr(main, "change_broker",
+                            main.ChangeBroker(repository.changes, main.settings.event_queue_size))
+        return repository
+
+    return install
+
+@pytest.fixture
+def asgi_request():
+    """Petición ASGI directa a la aplicación, sin cliente HTTP de por medio.
+
+    httpx.ASGITransport acumula la respuesta entera, lo que ocultaría el streaming.
+    `body` son los trozos del cuerpo (more_body hasta el último); `on_body` recibe
+    cada trozo de la respuesta según llega y, si se pasa, no se acumula en "body".
+    """
+    from app.main import app
+
+    async def request(method: str, path: str, query: bytes = b"", headers=(),
+                      body=(), on_body=None) -> dict:
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": method, "scheme": "http", "path": path, "raw_path": path.encode(),
+            "query_string": query, "root_path": "", "headers": list(headers),
+            "server": ("bench", 80), "client": ("bench", 1234),
+        }
+        chunks = iter(body)
+        pending = next(chunks, b"")
+        response = {"status": None, "body": b""}
+
+        async def receive():
+            nonlocal pending
+            if pending is None:
+                # Sin desconexión: el cliente espera hasta el final
+                await asyncio.Event().wait()
+            chunk, pending = pending, next(chunks, None)
+            return {"type": "http.request", "body": chunk, "more_body": pending is not None}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                chunk = message.get("body", b"")
+                if on_body is not None:
+                    on_body(chunk)
+                else:
+                    response["body"] += chunk
+
+        await app(scope, receive, send)
+        return response
+
+    return request
@@ -2,10 +2,11 @@
 Tests de Integración para API REST
 Pruebas de endpoints completos con FastAPI TestClient
 """
+import json
 import pytest
 from fastapi.testclient import TestClient
 from datetime import datetime, timedelta
-from app.main import app, TaskStatus, TaskPriority
+from app.main import app, TaskCreate, TaskStatus, TaskPriority
 
 @pytest.fixture
 def client():
@@ -268,4 +269,460 @@ def test_concurrent_operations(client, sample_task):
     
     # Verificar actualizaciones
     completed_tasks = client.get("/tasks?status=completed").json()
-    assert len(completed_tasks) >= 5
\ No newline at end of file
+    assert len(completed_tasks) >= 5
+
+def test_list_tasks_filter_by_assignee(client, sample_task):
+    """Test 21: Filtrar tareas por responsable"""
+    task = sample_task.copy()
+    task["assigned_to"] = "filter.assignee@company.com"
+    client.post("/tasks", json=task)
+    
+    response = client.get("/tasks?assigned_to=filter.assignee@company.com")
+    assert response.status_code == 200
+    tasks = response.json()
+    assert len(tasks) == 1
+    assert tasks[0]["assigned_to"] == "filter.assignee@company.com"
+
+def test_list_tasks_cursor_pagination(client):
+    """Test 22: Paginar el listado con limit y cursor"""
+    assignee = "pagination@company.com"
+    for i in range(5):
+        client.post("/tasks", json={"title": f"Paged Task {i}", "assigned_to": assignee})
+    
+    first = client.get(f"/tasks?assigned_to={assignee}&limit=2")
+    assert first.status_code == 200
+    assert len(first.json()) == 2
+    cursor = first.headers["X-Next-Cursor"]
+    
+    second = client.get(f"/tasks?assigned_to={assignee}&limit=2&cursor={cursor}")
+    third = client.get(f"/tasks?assigned_to={assignee}&limit=2"
+                       f"&cursor={second.headers['X-Next-Cursor']}")
+    assert "X-Next-Cursor" not in third.headers
+    
+    titles = [t["title"] for r in (first, second, third) for t in r.json()]
+    assert titles == [f"Paged Task {i}" for i in range(4, -1, -1)]
+
+def test_list_tasks_invalid_cursor(client):
+    """Test 23: Rechazar cursor inválido"""
+    response = client.get("/tasks?limit=2&cursor=%%%")
+    assert response.status_code == 400
+
+# ============= BULK TESTS =============
+
+def test_bulk_create_update_delete(client):
+    """Test 24: Crear, actualizar y eliminar en lote con resultados por elemento"""
+    past = (datetime.now() - timedelta(days=1)).isoformat()
+    create_resp = client.post("/tasks/bulk", json=[
+        {"title": "Bulk Item 1"},
+        {"title": "Bulk Item 2", "due_date": past},
+        {"title": "Bulk Item 3", "priority": "urgent"},
+    ])
+    assert create_resp.status_code == 200
+    data = create_resp.json()
+    assert data["succeeded"] == 2 and data["failed"] == 1
+    assert [r["status_code"] for r in data["results"]] == [201, 400, 201]
+    ids = [r["task"]["id"] for r in data["results"] if r["task"]]
+    
+    update_resp = client.patch("/tasks/bulk", json=[
+        {"id": ids[0], "changes": {"status": "completed"}},
+        {"id": "missing-id", "changes": {"status": "completed"}},
+    ])
+    results = update_resp.json()["results"]
+    assert results[0]["task"]["status"] == "completed"
+    assert results[1]["status_code"] == 404
+    
+    delete_resp = client.request("DELETE", "/tasks/bulk", json=ids + ["missing-id"])
+    assert [r["status_code"] for r in delete_resp.json()["results"]] == [200, 200, 404]
+    assert client.get(f"/tasks/{ids[0]}").status_code == 404
+
+def test_bulk_create_rejects_invalid_batch(client):
+    """Test 25: Un elemento inválido rechaza el lote completo"""
+    response = client.post("/tasks/bulk", json=[{"title": "Valid Task"}, {"title": "ab"}])
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"][0] == 1
+    
+    assert client.post("/tasks/bulk", json=[]).status_code == 422
+    assert client.post("/tasks/bulk", content=b"not json").status_code == 422
+
+def test_update_task_validates_changes(client, sample_task):
+    """Test 26: Validar los campos de la actualización como en la creación"""
+    task_id = client.post("/tasks", json=sample_task).json()["id"]
+    
+    response = client.put(f"/tasks/{task_id}", json={"title": "  Spaced Title  "})
+    assert response.status_code == 200
+    assert response.json()["title"] == "Spaced Title"
+    
+    assert client.put(f"/tasks/{task_id}", json={"title": None}).status_code == 422
+    assert client.put(f"/tasks/{task_id}", json={"description": "x" * 501}).status_code == 422
+    assert client.get(f"/tasks/{task_id}").json()["title"] == "Spaced Title"
+
+# ============= CONDITIONAL REQUEST TESTS =============
+
+def test_list_tasks_conditional_get(client):
+    """Test 27: GET /tasks responde 304 mientras no haya escrituras"""
+    first = client.get("/tasks")
+    etag = first.headers["ETag"]
+    
+    cached = client.get("/tasks", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    
+    client.post("/tasks", json={"title": "Invalidates ETag"})
+    fresh = client.get("/tasks", headers={"If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.headers["ETag"] != etag
+
+def test_get_task_conditional_get(client, sample_task):
+    """Test 28: GET /tasks/{id} responde 304 con el ETag vigente"""
+    created = client.post("/tasks", json=sample_task)
+    task_id, etag = created.json()["id"], created.headers["ETag"]
+    
+    assert client.get(f"/tasks/{task_id}", headers={"If-None-Match": etag}).status_code == 304
+    client.put(f"/tasks/{task_id}", json={"status": "completed"})
+    assert client.get(f"/tasks/{task_id}", headers={"If-None-Match": etag}).status_code == 200
+
+def test_update_task_if_match(client, sample_task):
+    """Test 29: PUT con If-Match aplica control de concurrencia optimista"""
+    created = client.post("/tasks", json=sample_task)
+    task_id, etag = created.json()["id"], created.headers["ETag"]
+    
+    first = client.put(f"/tasks/{task_id}", json={"title": "First Writer"},
+                       headers={"If-Match": etag})
+    assert first.status_code == 200
+    
+    second = client.put(f"/tasks/{task_id}", json={"title": "Second Writer"},
+                        headers={"If-Match": etag})
+    assert second.status_code == 412
+    
+    third = client.put(f"/tasks/{task_id}", json={"title": "Third Writer"},
+                       headers={"If-Match": first.headers["ETag"]})
+    assert third.status_code == 200
+    assert third.json()["title"] == "Third Writer"
+
+def test_list_tasks_served_from_cache(client):
+    """Test 30: Listados repetidos se sirven desde la caché hasta la siguiente escritura"""
+    url = "/tasks?priority=low&limit=5"
+    first = client.get(url)
+    hits_before = client.get("/health").json()["list_cache"]["hits"]
+    
+    second = client.get(url)
+    assert second.content == first.content
+    assert client.get("/health").json()["list_cache"]["hits"] == hits_before + 1
+    
+    client.post("/tasks", json={"title": "Cache Buster", "priority": "low"})
+    third = client.get(url)
+    assert third.json()[0]["title"] == "Cache Buster"
+
+# ============= SERIALIZATION MODE TESTS =============
+
+def test_fast_serialization_matches_standard(client, sample_task, monkeypatch):
+    """Test 31: El modo de serialización rápida devuelve el mismo JSON y esquema"""
+    from app.main import settings
+    task_id = client.post("/tasks", json=sample_task).json()["id"]
+    schema = client.get("/openapi.json").json()
+    standard = client.get(f"/tasks/{task_id}")
+    
+    monkeypatch.setattr(settings, "fast_serialization", True)
+    fast = client.get(f"/tasks/{task_id}")
+    assert fast.json() == standard.json()
+    assert fast.headers["ETag"] == standard.headers["ETag"]
+    
+    created = client.post("/tasks", json={"title": "Fast Mode Task"})
+    assert created.status_code == 201
+    assert created.json()["title"] == "Fast Mode Task"
+    assert client.get("/openapi.json").json() == schema
+
+# ============= STATISTICS TESTS =============
+
+def test_task_stats_endpoint(client):
+    """Test 33: /tasks/stats coincide con los conteos del listado completo"""
+    client.post("/tasks", json={"title": "Stats Urgent Task", "priority": "urgent"})
+    
+    stats = client.get("/tasks/stats")
+    assert stats.status_code == 200
+    data = stats.json()
+    tasks = client.get("/tasks").json()
+    assert data["total"] == len(tasks)
+    assert data["by_status"]["completed"] == sum(t["status"] == "completed" for t in tasks)
+    assert data["by_priority"]["urgent"] == sum(t["priority"] == "urgent" for t in tasks)
+    assert data["overdue"] >= 0
+    assert client.get("/health").json()["total_tasks"] == data["total"]
+
+# ============= CHANGE FEED TESTS =============
+
+def read_events(headers: dict, count: int, during=None) -> list:
+    """Abrir /tasks/events directamente sobre ASGI y leer `count` eventos.
+    
+    `during` (corrutina) se ejecuta cuando llega el primer evento.
+    """
+    import asyncio
+    
+    async def run():
+        disconnect = asyncio.Event()
+        buffer, events = b"", []
+        
+        async def receive():
+            if not hasattr(receive, "sent"):
+                receive.sent = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await disconnect.wait()
+            return {"type": "http.disconnect"}
+        
+        async def send(message):
+            nonlocal buffer
+            if message["type"] != "http.response.body":
+                return
+            buffer += message.get("body", b"")
+            while b"\n\n" in buffer:
+                raw, buffer = buffer.split(b"\n\n", 1)
+                fields = dict(line.split(": ", 1) for line in raw.decode().splitlines()
+                              if not line.startswith(":"))
+                if fields:
+                    events.append(fields)
+                    if len(events) == 1 and during:
+                        asyncio.get_running_loop().create_task(during())
+                    if len(events) >= count:
+                        disconnect.set()
+        
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": "GET", "scheme": "http", "path": "/tasks/events",
+            "raw_path": b"/tasks/events", "query_string": b"", "root_path": "",
+            "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+            "client": ("test", 1), "server": ("test", 80),
+        }
+        await asyncio.wait_for(app(scope, receive, send), timeout=5)
+        return events
+    
+    return asyncio.run(run())
+
+def test_task_events_replay_and_live(client):
+    """Test 34: /tasks/events reanuda desde Last-Event-ID y emite cambios en vivo"""
+    from app import main
+    ready = read_events({}, 1)[0]
+    assert ready["event"] == "ready"
+    start = int(ready["id"])
+    
+    task_id = client.post("/tasks", json={"title": "Streamed Task"}).json()["id"]
+    client.delete(f"/tasks/{task_id}")
+    
+    async def live_write():
+        await main.async_task_service.create_task(TaskCreate(title="Live Streamed Task"))
+    
+    events = read_events({"Last-Event-ID": str(start)}, 3, during=live_write)
+    assert [e["event"] for e in events] == ["created", "deleted", "created"]
+    assert [int(e["id"]) for e in events] == [start + 1, start + 2, start + 3]
+    assert '"title":"Live Streamed Task"' in events[2]["data"]
+    
+    assert client.get("/tasks/events", headers={"Last-Event-ID": "abc"}).status_code == 400
+
+def test_task_changes_endpoint(client):
+    """Test 35: /tasks/changes devuelve el delta desde una versión"""
+    version = client.get("/tasks/changes", params={"since": 0}).json()["version"]
+    
+    created = client.post("/tasks", json={"title": "Delta Task"}).json()
+    doomed = client.post("/tasks", json={"title": "Delta Doomed"}).json()
+    client.put(f"/tasks/{created['id']}", json={"priority": "urgent"})
+    client.delete(f"/tasks/{doomed['id']}")
+    
+    delta = client.get("/tasks/changes", params={"since": version}).json()
+    assert delta["full_resync"] is False
+    assert [t["id"] for t in delta["upserts"]] == [created["id"]]
+    assert delta["upserts"][0]["priority"] == "urgent"
+    assert delta["deletions"] == [doomed["id"]]
+    
+    empty = client.get("/tasks/changes", params={"since": delta["version"]}).json()
+    assert empty["upserts"] == [] and empty["deletions"] == []
+    assert client.get("/tasks/changes").status_code == 422
+
+def test_search_tasks_endpoint(client):
+    """Test 36: /tasks/search devuelve coincidencias ordenadas por relevancia"""
+    created = client.post("/tasks", json={"title": "Migración del clúster zeppelín"}).json()
+    client.post("/tasks", json={"title": "Otra tarea", "description": "Sin relación"})
+    
+    response = client.get("/tasks/search", params={"q": "zeppelin clus"})
+    assert response.status_code == 200
+    assert [t["id"] for t in response.json()] == [created["id"]]
+    
+    assert client.get("/tasks/search", params={"q": "zeppelin", "limit": 0}).status_code == 422
+    assert client.get("/tasks/search").status_code == 422
+
+def test_due_range_and_overdue_endpoints(client):
+    """Test 37: Filtros due_after/due_before en /tasks y vista /tasks/overdue"""
+    marker = datetime.now() + timedelta(days=400)
+    due = [(marker + timedelta(days=d)).isoformat() for d in (2, 0, 1)]
+    ids = [client.post("/tasks", json={"title": f"Due Range {i}", "due_date": d}).json()["id"]
+           for i, d in enumerate(due)]
+    
+    params = {"due_after": marker.isoformat(),
+              "due_before": (marker + timedelta(days=2)).isoformat(), "limit": 1}
+    first = client.get("/tasks", params=params)
+    assert [t["id"] for t in first.json()] == [ids[1]]
+    second = client.get("/tasks", params={**params, "cursor": first.headers["X-Next-Cursor"]})
+    assert [t["id"] for t in second.json()] == [ids[2]]
+    assert "X-Next-Cursor" not in second.headers
+    
+    response = client.get("/tasks/overdue")
+    assert response.status_code == 200
+    assert not {t["id"] for t in response.json()} & set(ids)
+    assert all(t["status"] not in ("completed", "cancelled") for t in response.json())
+    assert client.get("/tasks", params={"due_before": "not-a-date"}).status_code == 422
+
+def test_list_tasks_combined_filters_and_explain(client):
+    """Test 38: /tasks combina filtros con `q` y `explain=true` devuelve el plan"""
+    client.post("/tasks", json={"title": "Planificador quórum", "priority": "urgent"})
+    client.post("/tasks", json={"title": "Planificador quórum", "priority": "low"})
+    
+    params = {"priority": "urgent", "q": "quorum planif"}
+    tasks = client.get("/tasks", params=params).json()
+    assert [t["priority"] for t in tasks] == ["urgent"]
+    
+    response = client.get("/tasks", params={**params, "explain": "true"})
+    assert response.status_code == 200
+    body = response.json()
+    assert [t["id"] for t in body["tasks"]] == [t["id"] for t in tasks]
+    plan = body["plan"]
+    assert plan["order"] == "created_at desc"
+    assert plan["driver"] and plan["strategy"] in ("index_scan", "sort")
+
+def test_export_tasks_ndjson(client, monkeypatch):
+    """Test 39: /tasks/export envía en NDJSON lo mismo que /tasks con los mismos filtros"""
+    from app.main import settings
+    monkeypatch.setattr(settings, "export_batch_size", 2)
+    monkeypatch.setattr(settings, "export_chunk_bytes", 256)
+    owner = f"export-{datetime.now().timestamp()}@empresa.com"
+    now = datetime.now()
+    for i in range(5):
+        client.post("/tasks", json={"title": f"Exportable {i}", "assigned_to": owner,
+                                    "due_date": (now + timedelta(days=5 - i)).isoformat()})
+    
+    for params in ({"assigned_to": owner},
+                   {"assigned_to": owner, "due_after": now.isoformat()},
+                   {"assigned_to": owner, "q": "exportable"}):
+        response = client.get("/tasks/export", params={**params, "format": "ndjson"})
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = response.text.splitlines()
+        assert [json.loads(line) for line in lines] == client.get("/tasks", params=params).json()
+        assert len(lines) == 5
+    
+    assert client.get("/tasks/export", params={"format": "csv"}).status_code == 422
+
+def test_import_tasks_ndjson_and_csv(client, monkeypatch):
+    """Test 40: /tasks/import crea por lotes desde NDJSON o CSV e informa errores por línea"""
+    from app.main import settings
+    monkeypatch.setattr(settings, "import_batch_size", 2)
+    monkeypatch.setattr(settings, "import_max_line_bytes", 200)
+    owner = f"import-{datetime.now().timestamp()}@empresa.com"
+    
+    def ndjson_body():
+        # Trozos que cortan las líneas por la mitad, como llegan por la red
+        text = (f'{{"title": "Importada 1", "assigned_to": "{owner}"}}\n'
+                '{"title": "x"}\n'
+                'no es json\n'
+                '\n'
+                f'{{"title": "{"y" * 300}"}}\n'
+                f'{{"title": "Importada 2", "priority": "high", "assigned_to": "{owner}"}}\r\n')
+        data = text.encode()
+        for start in range(0, len(data), 7):
+            yield data[start:start + 7]
+    
+    response = client.post("/tasks/import", content=ndjson_body(),
+                           headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["imported"], result["failed"]) == (2, 3)
+    assert [e["line"] for e in result["errors"]] == [2, 3, 5]
+    assert "title" in result["errors"][0]["detail"]
+    assert "bytes" in result["errors"][2]["detail"]
+    
+    csv_body = (f"title,priority,assigned_to,description\n"
+                f'Importada CSV,urgent,{owner},"Dos\nlíneas, con coma"\n'
+                f"Sin prioridad,,{owner},\n"
+                f"Mala,imposible,{owner},\n"
+                f"Corta\n").encode()
+    response = client.post("/tasks/import", content=csv_body,
+                           headers={"Content-Type": "text/csv"})
+    result = response.json()
+    assert (result["imported"], result["failed"]) == (2, 2)
+    assert [e["line"] for e in result["errors"]] == [5, 6]
+    
+    tasks = {t["title"]: t for t in client.get("/tasks", params={"assigned_to": owner}).json()}
+    assert set(tasks) == {"Importada 1", "Importada 2", "Importada CSV", "Sin prioridad"}
+    assert tasks["Importada CSV"]["description"] == "Dos\nlíneas, con coma"
+    assert tasks["Sin prioridad"]["priority"] == "medium"
+    
+    response = client.post("/tasks/import", params={"format": "csv"}, content=b"name\nx\n")
+    assert response.status_code == 400
+    assert client.post("/tasks/import", params={"format": "xml"}, content=b"").status_code == 422
+
+def test_import_csv_unbalanced_quotes(client, monkeypatch):
+    """Test 41: Una comilla suelta o sin cerrar no se traga el resto de la importación"""
+    from app.main import settings
+    monkeypatch.setattr(settings, "import_max_line_bytes", 60)
+    owner = f"quotes-{datetime.now().timestamp()}@empresa.com"
+    rows = [f'ab"c literal,{owner}',
+            f'"Sin cerrar,{owner}',
+            *(f"Fila {i},{owner}" for i in range(3)),
+            *(f"Tras el tope {i},{owner}" for i in range(3))]
+    body = ("title,assigned_to\n" + "\n".join(rows) + "\n").encode()
+    
+    result = client.post("/tasks/import", params={"format": "csv"}, content=body).json()
+    assert result["failed"] == 1
+    assert result["errors"][0]["line"] == 3
+    assert "exceeds" in result["errors"][0]["detail"]
+    titles = {t["title"] for t in client.get("/tasks", params={"assigned_to": owner}).json()}
+    assert 'ab"c literal' in titles
+    assert {f"Tras el tope {i}" for i in range(3)} <= titles
+    assert result["imported"] == len(titles)
+
+def test_timezone_aware_due_dates_in_batches(client):
+    """Test 42: Fechas límite con zona en /tasks/bulk y /tasks/import no rompen el lote"""
+    response = client.post("/tasks/bulk", json=[
+        {"title": "Con zona futura", "due_date": "2030-01-01T00:00:00Z"},
+        {"title": "Con zona pasada", "due_date": "2001-01-01T00:00:00+02:00"}])
+    assert response.status_code == 200
+    assert [r["status_code"] for r in response.json()["results"]] == [201, 400]
+    
+    body = ('{"title": "Importada con zona", "due_date": "2030-01-01T00:00:00Z"}\n'
+            '{"title": "Importada vencida", "due_date": "2001-01-01T00:00:00-05:00"}\n')
+    result = client.post("/tasks/import", content=body.encode()).json()
+    assert (result["imported"], result["failed"]) == (1, 1)
+    assert result["errors"][0]["line"] == 2
+
+def test_due_date_offset_round_trip(client):
+    """Test 43: La fecha límite se devuelve con el offset enviado y se filtra por su instante"""
+    created = client.post("/tasks", json={"title": "Con offset",
+                                          "due_date": "2030-01-02T00:00:00-12:00"}).json()
+    assert created["due_date"] == "2030-01-02T00:00:00-12:00"
+    assert client.get(f"/tasks/{created['id']}").json()["due_date"] == created["due_date"]
+    
+    before = client.get("/tasks?due_before=2030-01-02T11:00:00Z").json()
+    after = client.get("/tasks?due_after=2030-01-02T11:00:00Z").json()
+    assert created["id"] not in {t["id"] for t in before}
+    assert created["id"] in {t["id"] for t in after}
+
+# ============= METRICS TESTS =============
+
+def test_metrics_endpoint(client, sample_task):
+    """Test 32: /metrics expone histogramas por ruta y contadores del repositorio"""
+    task_id = client.post("/tasks", json=sample_task).json()["id"]
+    client.get(f"/tasks/{task_id}")
+    client.get("/tasks/does-not-exist")
+    
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    
+    # Las rutas se etiquetan con su plantilla, no con el ID concreto
+    assert 'route="/tasks/{task_id}",status="200",le="+Inf"}' in body
+    assert 'route="/tasks/{task_id}",status="404"' in body
+    assert task_id not in body
+    assert 'http_request_size_bytes_count{method="POST",route="/tasks",status="201"}' in body
+    assert "# TYPE http_response_size_bytes histogram" in body
+    
+    total = client.get("/health").json()["total_tasks"]
+    assert f"tasks_stored {total}\n" in body
+    assert 'tasks_index_entries{index="priority",value="high"}' in body
+    assert "tasks_list_cache_hit_ratio " in body
@@ -0,0 +1,88 @@
+"""
+Tests de Performance de rutas síncronas vs asíncronas
+Compara requests/segundo bajo carga concurrente entre rutas `def` sobre
+TaskService (cada petición salta al threadpool) y las rutas `async def`
+de la aplicación sobre AsyncTaskService (sin saltos con el repositorio en memoria)
+"""
+import asyncio
+import time
+import httpx
+import pytest
+from fastapi import FastAPI, status
+from app.main import app, InMemoryTaskRepository, Task, TaskCreate, TaskService
+
+PRELOADED_TASKS = 1000
+TOTAL_REQUESTS = 2000
+CONCURRENCY = 64
+
+# ============= HELPERS =============
+
+def _build_sync_app(service: TaskService) -> FastAPI:
+    """Réplica con rutas `def` de los endpoints usados en la carga"""
+    sync_app = FastAPI()
+
+    @sync_app.post("/tasks", response_model=Task, status_code=status.HTTP_201_CREATED)
+    def create_task(task: TaskCreate):
+        return service.create_task(task)
+
+    @sync_app.get("/tasks/{task_id}", response_model=Task)
+    def get_task(task_id: str):
+        return service.get_task(task_id)
+
+    return sync_app
+
+async def _run_load(target_app, task_ids: list) -> float:
+    """Lanza TOTAL_REQUESTS peticiones (9 lecturas por cada escritura); devuelve req/s"""
+    transport = httpx.ASGITransport(app=target_app)
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one(i: int):
+            async with semaphore:
+                if i % 10 == 0:
+                    response = await client.post("/tasks", json={"title": f"Load Task {i}"})
+                else:
+                    response = await client.get(f"/tasks/{task_ids[i % len(task_ids)]}")
+                assert response.status_code < 300
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(TOTAL_REQUESTS)))
+        return TOTAL_REQUESTS / (time.perf_counter() - start)
+
+# ============= BENCHMARK FIXTURES =============
+
+@pytest.fixture
+def preloaded(use_repository):
+    """Repositorio aislado compartido por ambas variantes"""
+    repository = InMemoryTaskRepository()
+    tasks = repository.create_many([TaskCreate(title=f"Preloaded Task {i}")
+                                    for i in range(PRELOADED_TASKS)])
+    use_repository(repository)
+    return repository, [t.id for t in tasks]
+
+# ============= PERFORMANCE TESTS =============
+
+def test_perf_async_vs_sync_routes(benchmark, preloaded):
+    """
+    Test Async: Requests/segundo con rutas síncronas vs asíncronas
+    Objetivo: las rutas async no son más lentas que las síncronas
+    """
+    repository, task_ids = preloaded
+    sync_app = _build_sync_app(TaskService(repository))
+    results = {}
+
+    def measure():
+        results["sync"] = asyncio.run(_run_load(sync_app, task_ids))
+        results["async"] = asyncio.run(_run_load(app, task_ids))
+
+    benchmark.pedantic(measure, rounds=1, iterations=1)
+    benchmark.extra_info.update({
+        "requests": TOTAL_REQUESTS,
+        "concurrency": CONCURRENCY,
+        "sync_rps": round(results["sync"]),
+        "async_rps": round(results["async"]),
+    })
+
+    assert results["async"] >= results["sync"] * 0.9
+    print(f"\n✓ {TOTAL_REQUESTS} requests @ {CONCURRENCY} concurrent — "
+          f"sync: {results['sync']:.0f} req/s, async: {results['async']:.0f} req/s")
@@ -149,23 +149,6 @@ def test_perf_06_filtered_query_performance(benchmark, create_test_tasks):
     assert stats.mean < 0.15, f"Filtered query {stats.mean}s excede 150ms"
     print(f"\n✓ Filtered Query Mean: {stats.mean*1000:.2f}ms")
 
-def test_perf_07_concurrent_reads(benchmark, create_test_tasks):
-    """
-    Test 7 Performance: Lecturas concurrentes simuladas
-    """
-    def multiple_reads():
-        responses = []
-        for _ in range(10):
-            response = client.get("/tasks")
-            responses.append(response)
-        return responses
-    
-    result = benchmark(multiple_reads)
-    
-    stats = benchmark.stats.stats
-    avg_per_request = stats.mean / 10
-    print(f"\n✓ Avg per concurrent read: {avg_per_request*1000:.2f}ms")
-
 def test_perf_08_health_check_latency(benchmark):
     """
     Test 8 Performance: Latencia de health check
@@ -214,6 +197,98 @@ def test_perf_10_response_size_efficiency(benchmark, create_test_tasks):
     assert size < 1_000_000, "Response size demasiado grande"
     print(f"\n✓ Response size: {size} bytes")
 
+def test_perf_11_bulk_endpoint_speedup(benchmark):
+    """
+    Test 11 Performance: Endpoint de lote frente a peticiones individuales
+    Objetivo: >= 10x de throughput
+    """
+    import time
+    
+    batch = [{"title": f"Bulk Speedup Task {i}", "priority": "low"} for i in range(100)]
+    
+    def best_of(func, rounds=3):
+        times = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+        return min(times)
+    
+    results = {}
+    
+    def measure():
+        results["loop"] = best_of(lambda: [client.post("/tasks", json=task) for task in batch])
+        results["bulk"] = best_of(lambda: client.post("/tasks/bulk", json=batch))
+    
+    # Con --benchmark-only (CI) solo se ejecutan los tests que usan el fixture
+    benchmark.pedantic(measure, rounds=1, iterations=1)
+    loop_time, bulk_time = results["loop"], results["bulk"]
+    speedup = loop_time / bulk_time
+    benchmark.extra_info.update({
+        "loop_ms": round(loop_time * 1000, 2),
+        "bulk_ms": round(bulk_time * 1000, 2),
+        "speedup": round(speedup, 1),
+    })
+    
+    assert speedup >= 10, f"Bulk speedup {speedup:.1f}x es menor a 10x"
+    print(f"\n✓ Bulk create speedup: {speedup:.1f}x "
+          f"({loop_time*1000:.2f}ms loop vs {bulk_time*1000:.2f}ms bulk)")
+
+def test_perf_12_metrics_record_overhead(benchmark):
+    """
+    Test 12 Performance: Coste de registrar una petición en las métricas
+    Objetivo: < 10µs por petición
+    """
+    from app.main import RequestMetrics
+    metrics = RequestMetrics()
+    
+    benchmark(metrics.record, "GET", "/tasks/{task_id}", 200, 0.0012, 0, 350)
+    
+    stats = benchmark.stats.stats
+    assert stats.mean < 0.00001, f"Metrics record {stats.mean}s excede 10µs"
+    print(f"\n✓ Metrics record Mean: {stats.mean*1_000_000:.2f}µs")
+
+def test_perf_13_due_range_query(benchmark):
+    """
+    Test 13 Performance: Rango de fecha límite sobre 100k tareas (índice ordenado)
+    Objetivo: < 2ms para una página de 50
+    """
+    from datetime import datetime, timedelta
+    from app.main import InMemoryTaskRepository, TaskCreate
+    repository = InMemoryTaskRepository(change_log_size=1)
+    now = datetime.now()
+    repository.create_many([TaskCreate(title=f"Due Task {i}",
+                                       due_date=now + timedelta(minutes=i * 7 % 100_000))
+                            for i in range(100_000)])
+    week = (now + timedelta(days=30), now + timedelta(days=37))
+    
+    result = benchmark(repository.query_due, *week, limit=50)
+    
+    stats = benchmark.stats.stats
+    assert len(result) == 50
+    assert stats.mean < 0.002, f"Due range {stats.mean}s excede 2ms"
+    print(f"\n✓ Due range (100k tasks) Mean: {stats.mean*1000:.3f}ms")
+
+def test_perf_14_planned_multi_filter_query(benchmark):
+    """
+    Test 14 Performance: Filtro compuesto sobre 100k tareas (estado común + responsable raro)
+    Objetivo: < 1ms; el planificador dirige con el índice de responsable
+    """
+    from app.main import InMemoryTaskRepository, TaskCreate, TaskQuery, TaskStatus
+    repository = InMemoryTaskRepository(change_log_size=1)
+    repository.create_many([TaskCreate(title=f"Planned Task {i}",
+                                       assigned_to=f"user{i % 1000}@empresa.com")
+                            for i in range(100_000)])
+    filters = TaskQuery(status=TaskStatus.PENDING, assigned_to="user7@empresa.com")
+    
+    result, _ = benchmark(repository.find, filters, 20)
+    
+    stats = benchmark.stats.stats
+    assert len(result) == 20
+    assert repository.find(filters, explain=True)[1].driver == "assigned_to"
+    assert stats.mean < 0.001, f"Multi-filter {stats.mean}s excede 1ms"
+    print(f"\n✓ Multi-filter (100k tasks) Mean: {stats.mean*1000:.3f}ms")
+
 # ============= STRESS TESTS =============
 
 @pytest.mark.slow
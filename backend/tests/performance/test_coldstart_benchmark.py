@@ -0,0 +1,88 @@
+"""
+Tests de Performance de arranque en frío desde un snapshot mapeado (mmap)
+Mide el tiempo hasta la primera respuesta de GET /tasks y GET /tasks/{id}
+con el repositorio recién abierto, y el tiempo hasta tenerlo todo en memoria
+
+Los tamaños se controlan con TASKS_COLDSTART_SIZES (CI usa 10000,100000,1000000)
+"""
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+import httpx
+import pytest
+import app.main as main
+from app.main import (
+    app, InMemoryTaskRepository, MappedTaskSnapshot, TaskPriority, TaskStatus, _TaskRecord
+)
+
+COLDSTART_SIZES = [int(size) for size in
+                   os.environ.get("TASKS_COLDSTART_SIZES", "10000,100000").split(",")]
+
+# ============= HELPERS =============
+
+def _records(size: int) -> list:
+    """Filas representativas generadas directamente (sin pasar por el repositorio)"""
+    start = datetime(2024, 1, 1)
+    statuses, priorities = list(TaskStatus), list(TaskPriority)
+    return [
+        _TaskRecord(
+            id=f"{i:08x}-0000-4000-8000-000000000000",
+            title=f"Cold Start Task {i}",
+            description="Snapshot benchmark" if i % 2 else None,
+            priority=priorities[i % len(priorities)],
+            status=statuses[i % len(statuses)],
+            assigned_to=f"user{i % 100}@empresa.com" if i % 3 else None,
+            due_date=start + timedelta(days=i % 365) if i % 4 else None,
+            created_at=start + timedelta(seconds=i),
+            updated_at=start + timedelta(seconds=i),
+            version=i + 1
+        )
+        for i in range(size)
+    ]
+
+async def _first_responses(task_id: str) -> tuple:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://coldstart") as client:
+        listing = await client.get("/tasks", params={"limit": 20})
+        single = await client.get(f"/tasks/{task_id}")
+    return listing, single
+
+# ============= PERFORMANCE TESTS =============
+
+@pytest.mark.slow
+@pytest.mark.parametrize("size", COLDSTART_SIZES, ids=lambda size: f"{size}_tasks")
+def test_perf_coldstart_time_to_first_response(benchmark, tmp_path, use_repository, size):
+    """
+    Test Arranque en frío: Abrir el snapshot y servir las primeras peticiones
+    Objetivo: < 100ms hasta la primera respuesta, sin depender del tamaño
+    """
+    path = str(tmp_path / "tasks.map")
+    MappedTaskSnapshot.write(path, size, _records(size))
+    task_id = f"{size // 2:08x}-0000-4000-8000-000000000000"
+    results = {}
+
+    def measure():
+        start = time.perf_counter()
+        repository = use_repository(InMemoryTaskRepository(snapshot_path=path),
+                                    main.settings.list_cache_size)
+        listing, single = asyncio.run(_first_responses(task_id))
+        results["first_response"] = time.perf_counter() - start
+        repository.wait_until_loaded()
+        results["hydrated"] = time.perf_counter() - start
+        results["responses"] = (listing, single)
+
+    benchmark.pedantic(measure, rounds=1, iterations=1)
+    listing, single = results["responses"]
+    benchmark.extra_info.update({
+        "tasks": size,
+        "snapshot_bytes": os.path.getsize(path),
+        "time_to_first_response_ms": round(results["first_response"] * 1000, 2),
+        "time_to_fully_loaded_s": round(results["hydrated"], 3),
+    })
+
+    assert listing.status_code == 200 and len(listing.json()) == 20
+    assert single.status_code == 200 and single.json()["id"] == task_id
+    assert results["first_response"] < 0.1
+    print(f"\n✓ {size} tasks — first response: {results['first_response'] * 1000:.1f}ms, "
+          f"fully loaded: {results['hydrated']:.2f}s")
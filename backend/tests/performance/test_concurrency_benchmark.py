@@ -0,0 +1,121 @@
+"""
+Tests de Performance de concurrencia del repositorio en memoria
+Mide el coste de contención del lock de escritura (1 vs N hilos escritores)
+y el throughput de lectura mientras hay escrituras en curso
+"""
+import threading
+import time
+import pytest
+from app.main import InMemoryTaskRepository, TaskCreate, TaskStatus, TaskUpdate
+
+WRITER_THREADS = 8
+UPDATES_PER_THREAD = 2000
+READ_SECONDS = 0.5
+
+# ============= HELPERS =============
+
+def _run_threads(targets) -> float:
+    """Arrancar un hilo por función y devolver los segundos hasta que terminan"""
+    threads = [threading.Thread(target=target) for target in targets]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start
+
+def _update_loop(repository, task_id: str, count: int):
+    statuses = [TaskStatus.PENDING, TaskStatus.IN_PROGRESS]
+    def run():
+        for i in range(count):
+            repository.update(task_id, TaskUpdate(status=statuses[i % 2]))
+    return run
+
+def _reads_per_second(repository, stop_after: float) -> float:
+    reads = 0
+    deadline = time.perf_counter() + stop_after
+    while time.perf_counter() < deadline:
+        repository.query(status=TaskStatus.PENDING, limit=20)
+        reads += 1
+    return reads / stop_after
+
+# ============= BENCHMARK FIXTURES =============
+
+@pytest.fixture
+def repository():
+    repository = InMemoryTaskRepository()
+    repository.create_many([TaskCreate(title=f"Contention Task {i}") for i in range(1000)])
+    return repository
+
+# ============= PERFORMANCE TESTS =============
+
+def test_perf_concurrency_write_contention(benchmark, repository):
+    """
+    Test Concurrencia: Throughput de actualización con 1 y con N hilos escritores
+    Objetivo: ninguna actualización se pierde y la contención no colapsa el throughput
+    """
+    task_ids = [t.id for t in repository.query(limit=WRITER_THREADS)]
+    total = WRITER_THREADS * UPDATES_PER_THREAD
+    results = {}
+
+    def measure():
+        start_version = repository.version
+        single = _run_threads([_update_loop(repository, task_ids[0], total)])
+        contended = _run_threads([_update_loop(repository, task_id, UPDATES_PER_THREAD)
+                                  for task_id in task_ids])
+        results["single_ops"] = total / single
+        results["contended_ops"] = total / contended
+        results["writes"] = repository.version - start_version
+
+    benchmark.pedantic(measure, rounds=1, iterations=1)
+    benchmark.extra_info.update({
+        "threads": WRITER_THREADS,
+        "single_thread_ops": round(results["single_ops"]),
+        "contended_ops": round(results["contended_ops"]),
+        "contention_cost": round(results["single_ops"] / results["contended_ops"], 2),
+    })
+
+    assert results["writes"] == 2 * total
+    assert results["contended_ops"] > results["single_ops"] / 4
+    print(f"\n✓ updates — 1 thread: {results['single_ops']:.0f} ops/s, "
+          f"{WRITER_THREADS} threads: {results['contended_ops']:.0f} ops/s")
+
+def test_perf_concurrency_reads_during_writes(benchmark, repository):
+    """
+    Test Concurrencia: Throughput de lectura sin escrituras y con escrituras en curso
+    Objetivo: las lecturas no se bloquean detrás del lock de escritura
+    """
+    task_ids = [t.id for t in repository.query(limit=4)]
+    results = {}
+
+    def measure():
+        results["idle"] = _reads_per_second(repository, READ_SECONDS)
+        stop = threading.Event()
+
+        def writer(task_id):
+            def run():
+                while not stop.is_set():
+                    _update_loop(repository, task_id, 10)()
+            return run
+
+        writers = [threading.Thread(target=writer(task_id)) for task_id in task_ids]
+        for t in writers:
+            t.start()
+        try:
+            results["busy"] = _reads_per_second(repository, READ_SECONDS)
+        finally:
+            stop.set()
+            for t in writers:
+                t.join()
+
+    benchmark.pedantic(measure, rounds=1, iterations=1)
+    benchmark.extra_info.update({
+        "writer_threads": len(task_ids),
+        "idle_reads_per_second": round(results["idle"]),
+        "busy_reads_per_second": round(results["busy"]),
+    })
+
+    # Con el GIL los escritores comparten CPU, pero el lector nunca espera al lock
+    assert results["busy"] > 0
+    print(f"\n✓ reads — idle: {results['idle']:.0f}/s, "
+          f"with {len(task_ids)} writers: {results['busy']:.0f}/s")
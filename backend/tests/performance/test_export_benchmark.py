@@ -0,0 +1,116 @@
+"""
+Tests de Performance de la exportación NDJSON en streaming (GET /tasks/export)
+Compara el pico de memoria de exportar todas las tareas con el de listarlas
+con GET /tasks (lista completa validada y codificada como un solo array JSON)
+
+El tamaño se controla con TASKS_EXPORT_BENCH_SIZE (tracemalloc hace lento el listado completo)
+"""
+import asyncio
+import gc
+import os
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+import pytest
+from app.main import InMemoryTaskRepository, TaskCreate, TaskStatus
+
+EXPORT_BENCH_SIZE = int(os.environ.get("TASKS_EXPORT_BENCH_SIZE", 50_000))
+# Lote del repositorio + trozo pendiente de enviar, con margen; no depende del total
+EXPORT_PEAK_LIMIT = 8 * 1024 * 1024
+
+# ============= HELPERS =============
+
+def _peak_while(asgi_request, path: str, query: bytes = b"") -> tuple:
+    """Pico de memoria (bytes), segundos y resumen de la respuesta (descartada según llega)"""
+    received = {"bytes": 0, "chunks": 0, "lines": 0}
+
+    def count(body: bytes):
+        received["bytes"] += len(body)
+        received["lines"] += body.count(b"\n")
+        received["chunks"] += 1
+
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = asyncio.run(asgi_request("GET", path, query, on_body=count))
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    received["status"] = response["status"]
+    return peak, elapsed, received
+
+# ============= BENCHMARK FIXTURES =============
+
+@pytest.fixture
+def exported_app(use_repository):
+    """Aplicación con EXPORT_BENCH_SIZE tareas y sin caché de listados"""
+    repository = InMemoryTaskRepository(change_log_size=1)
+    due = datetime.now() + timedelta(days=1)
+    batch = 10_000
+    for start in range(0, EXPORT_BENCH_SIZE, batch):
+        repository.create_many([
+            TaskCreate(title=f"Export Task {i}", description="Nightly dump",
+                       status=TaskStatus.PENDING if i % 2 else TaskStatus.IN_PROGRESS,
+                       due_date=due + timedelta(days=i % 365))
+            for i in range(start, min(start + batch, EXPORT_BENCH_SIZE))
+        ])
+    return use_repository(repository)
+
+# ============= PERFORMANCE TESTS =============
+
+@pytest.mark.slow
+def test_perf_export_constant_memory(benchmark, exported_app, asgi_request):
+    """
+    Test Exportación: Pico de memoria de /tasks/export frente a /tasks completo
+    Objetivo: el pico de la exportación no crece con el número de tareas (< 8MB)
+    """
+    results = {}
+
+    def measure():
+        results["export"] = _peak_while(asgi_request, "/tasks/export")
+        results["list"] = _peak_while(asgi_request, "/tasks")
+
+    benchmark.pedantic(measure, rounds=1, iterations=1)
+    export_peak, export_seconds, export = results["export"]
+    list_peak, list_seconds, listing = results["list"]
+    benchmark.extra_info.update({
+        "tasks": EXPORT_BENCH_SIZE,
+        "export_peak_mb": round(export_peak / 2**20, 2),
+        "list_peak_mb": round(list_peak / 2**20, 2),
+        "export_seconds": round(export_seconds, 3),
+        "list_seconds": round(list_seconds, 3),
+        "export_chunks": export["chunks"],
+    })
+
+    assert export["status"] == listing["status"] == 200
+    assert export["lines"] == EXPORT_BENCH_SIZE
+    assert export_peak < EXPORT_PEAK_LIMIT, f"Export peak {export_peak} B excede 8MB"
+    print(f"\n✓ {EXPORT_BENCH_SIZE} tasks — export peak {export_peak / 2**20:.1f}MB "
+          f"in {export_seconds:.2f}s, /tasks peak {list_peak / 2**20:.1f}MB "
+          f"in {list_seconds:.2f}s")
+
+@pytest.mark.slow
+def test_perf_export_filtered_constant_memory(benchmark, exported_app, asgi_request):
+    """
+    Test Exportación: Filtros que /tasks resuelve ordenando (estado + fecha límite)
+    Objetivo: mismo pico acotado y tiempo lineal (sin reordenar en cada lote)
+    """
+    query = f"status=pending&due_after={datetime.now().isoformat()}".encode()
+    results = {}
+
+    def measure():
+        results["export"] = _peak_while(asgi_request, "/tasks/export", query)
+
+    benchmark.pedantic(measure, rounds=1, iterations=1)
+    peak, seconds, export = results["export"]
+    benchmark.extra_info.update({
+        "tasks": EXPORT_BENCH_SIZE,
+        "export_peak_mb": round(peak / 2**20, 2),
+        "export_seconds": round(seconds, 3),
+    })
+
+    assert export["status"] == 200
+    assert export["lines"] == EXPORT_BENCH_SIZE // 2
+    assert peak < EXPORT_PEAK_LIMIT, f"Export peak {peak} B excede 8MB"
+    print(f"\n✓ {EXPORT_BENCH_SIZE // 2} filtered tasks — export peak {peak / 2**20:.1f}MB "
+          f"in {seconds:.2f}s")
@@ -0,0 +1,77 @@
+"""
+Tests de Performance de la importación en streaming (POST /tasks/import)
+Envía N tareas NDJSON generadas al vuelo y mide throughput y memoria transitoria
+(pico menos lo que queda guardado en el repositorio al terminar)
+
+El tamaño se controla con TASKS_IMPORT_BENCH_SIZE (por defecto 50_000)
+"""
+import asyncio
+import gc
+import json
+import os
+import time
+import tracemalloc
+import pytest
+from app.main import InMemoryTaskRepository
+
+IMPORT_BENCH_SIZE = int(os.environ.get("TASKS_IMPORT_BENCH_SIZE", 50_000))
+LINES_PER_CHUNK = 200
+# Un lote de import_batch_size más el trozo en curso, con margen; no depende del total
+IMPORT_TRANSIENT_LIMIT = 16 * 1024 * 1024
+
+# ============= HELPERS =============
+
+def _chunks(size: int):
+    """Cuerpo NDJSON troceado como llegaría por la red, sin construirlo entero"""
+    for start in range(0, size, LINES_PER_CHUNK):
+        yield "".join(
+            f'{{"title": "Imported Task {i}", "priority": "high", "description": "Migrated"}}\n'
+            for i in range(start, min(start + LINES_PER_CHUNK, size))
+        ).encode()
+
+# ============= BENCHMARK FIXTURES =============
+
+@pytest.fixture
+def empty_app(use_repository):
+    """Aplicación con repositorio vacío y aislado"""
+    return use_repository(InMemoryTaskRepository(change_log_size=1))
+
+# ============= PERFORMANCE TESTS =============
+
+@pytest.mark.slow
+def test_perf_import_streaming(benchmark, empty_app, asgi_request):
+    """
+    Test Importación: N tareas NDJSON en una sola petición en streaming
+    Objetivo: memoria transitoria < 16MB, independiente del tamaño de la importación
+    """
+    results = {}
+
+    def measure():
+        gc.collect()
+        tracemalloc.start()
+        start = time.perf_counter()
+        response = asyncio.run(asgi_request(
+            "POST", "/tasks/import", headers=[(b"content-type", b"application/x-ndjson")],
+            body=_chunks(IMPORT_BENCH_SIZE)))
+        results["seconds"] = time.perf_counter() - start
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results["transient"] = peak - current
+        results["response"] = response
+
+    benchmark.pedantic(measure, rounds=1, iterations=1)
+    response = results["response"]
+    body = json.loads(response["body"])
+    benchmark.extra_info.update({
+        "tasks": IMPORT_BENCH_SIZE,
+        "seconds": round(results["seconds"], 3),
+        "transient_mb": round(results["transient"] / 2**20, 2),
+    })
+
+    assert response["status"] == 200
+    assert (body["imported"], body["failed"]) == (IMPORT_BENCH_SIZE, 0)
+    assert empty_app.count() == IMPORT_BENCH_SIZE
+    assert results["transient"] < IMPORT_TRANSIENT_LIMIT, \
+        f"Import transient memory {results['transient']} B excede 16MB"
+    print(f"\n✓ {IMPORT_BENCH_SIZE} tasks imported in {results['seconds']:.2f}s "
+          f"(traced), transient {results['transient'] / 2**20:.1f}MB")
@@ -0,0 +1,131 @@
+"""
+Tests de carga concurrente sobre ASGI (en proceso, sin red)
+Genera carga en lazo cerrado con httpx.AsyncClient a distintos niveles de
+concurrencia y mezclas lectura/escritura; reporta p50/p95/p99 y throughput
+
+Configuración por entorno:
+  TASKS_LOAD_CONCURRENCY  niveles separados por comas (por defecto 1,8,64,256)
+  TASKS_LOAD_REQUESTS     peticiones por escenario (por defecto 500)
+  TASKS_LOAD_REPORT       ruta del informe JSON (si no se define, no se escribe)
+"""
+import asyncio
+import json
+import os
+import random
+import time
+import httpx
+import pytest
+import app.main as main
+from app.main import app, InMemoryTaskRepository, TaskCreate
+
+CONCURRENCY_LEVELS = [int(level) for level in
+                      os.environ.get("TASKS_LOAD_CONCURRENCY", "1,8,64,256").split(",")]
+REQUESTS_PER_SCENARIO = int(os.environ.get("TASKS_LOAD_REQUESTS", 500))
+READ_RATIOS = [1.0, 0.9, 0.5]
+PRELOADED_TASKS = 1000
+
+# ============= HELPERS =============
+
+def _percentile(sorted_values: list, pct: float) -> float:
+    """Percentil por rango más cercano sobre valores ya ordenados"""
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+def _schedule(read_ratio: float) -> list:
+    """Secuencia reproducible de operaciones para un escenario"""
+    rng = random.Random(42)
+    reads = ["get", "list"]
+    writes = ["create", "update"]
+    return [rng.choice(reads) if rng.random() < read_ratio else rng.choice(writes)
+            for _ in range(REQUESTS_PER_SCENARIO)]
+
+async def _send(client: httpx.AsyncClient, operation: str, task_ids: list,
+                rng: random.Random) -> httpx.Response:
+    if operation == "get":
+        return await client.get(f"/tasks/{rng.choice(task_ids)}")
+    if operation == "list":
+        return await client.get("/tasks", params={"limit": 20})
+    if operation == "create":
+        return await client.post("/tasks", json={"title": "Load Task", "priority": "low"})
+    return await client.put(f"/tasks/{rng.choice(task_ids)}", json={"status": "in_progress"})
+
+async def _run_scenario(concurrency: int, read_ratio: float, task_ids: list) -> dict:
+    """Lanzar `concurrency` clientes que consumen la misma cola de operaciones"""
+    operations = iter(_schedule(read_ratio))
+    latencies = []
+    errors = 0
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://load") as client:
+        async def worker(seed: int):
+            nonlocal errors
+            rng = random.Random(seed)
+            for operation in operations:
+                start = time.perf_counter()
+                response = await _send(client, operation, task_ids, rng)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code >= 400:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(seed) for seed in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "read_ratio": read_ratio,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "latency_ms": {
+            name: round(_percentile(latencies, pct) * 1000, 3)
+            for name, pct in (("p50", 50), ("p95", 95), ("p99", 99), ("max", 100))
+        },
+    }
+
+# ============= LOAD FIXTURES =============
+
+@pytest.fixture(scope="module")
+def load_report():
+    """Acumula los escenarios y escribe el informe JSON al terminar el módulo"""
+    scenarios = []
+    yield scenarios
+    path = os.environ.get("TASKS_LOAD_REPORT")
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"commit": os.environ.get("GITHUB_SHA"), "scenarios": scenarios},
+                      f, indent=2)
+
+@pytest.fixture
+def load_app(use_repository):
+    """Aplicación con repositorio aislado y precargado para cada escenario"""
+    repository = InMemoryTaskRepository()
+    tasks = repository.create_many([TaskCreate(title=f"Load Task {i}")
+                                    for i in range(PRELOADED_TASKS)])
+    use_repository(repository, main.settings.list_cache_size)
+    return [t.id for t in tasks]
+
+# ============= LOAD TESTS =============
+
+@pytest.mark.parametrize("read_ratio", READ_RATIOS, ids=lambda r: f"{round(r * 100)}pct_reads")
+@pytest.mark.parametrize("concurrency", CONCURRENCY_LEVELS, ids=lambda c: f"c{c}")
+def test_load_mixed_workload(benchmark, load_app, load_report, concurrency, read_ratio):
+    """
+    Test Carga: Latencia p50/p95/p99 y throughput bajo carga concurrente
+    Objetivo: ninguna petición falla a ningún nivel de concurrencia
+    """
+    result = {}
+
+    def measure():
+        result.update(asyncio.run(_run_scenario(concurrency, read_ratio, load_app)))
+
+    benchmark.pedantic(measure, rounds=1, iterations=1)
+    benchmark.extra_info.update(result)
+    load_report.append(result)
+
+    assert result["errors"] == 0
+    assert result["requests"] == REQUESTS_PER_SCENARIO
+    latency = result["latency_ms"]
+    print(f"\n✓ c={concurrency} reads={read_ratio:.0%}: {result['throughput_rps']:.0f} req/s, "
+          f"p50 {latency['p50']:.2f}ms, p95 {latency['p95']:.2f}ms, p99 {latency['p99']:.2f}ms")
@@ -0,0 +1,78 @@
+"""
+Tests de Performance de memoria del repositorio en memoria
+Compara bytes por tarea del formato anterior (dict de Task Pydantic)
+con el formato compacto (_TaskRecord con __slots__)
+
+El tamaño se controla con TASKS_MEMORY_BENCH_SIZE (CI usa 1_000_000)
+"""
+import gc
+import os
+import tracemalloc
+import pytest
+from datetime import datetime
+from app.main import Task, TaskPriority, TaskStatus, _TaskRecord
+
+MEMORY_BENCH_SIZE = int(os.environ.get("TASKS_MEMORY_BENCH_SIZE", 100_000))
+
+# ============= HELPERS =============
+
+def _task_fields(i: int) -> dict:
+    """Campos representativos de una tarea (mismos valores para ambos formatos)"""
+    now = datetime.now()
+    return {
+        "id": f"{i:08x}-0000-4000-8000-000000000000",
+        "title": f"Memory Task {i}",
+        "description": None,
+        "priority": TaskPriority.MEDIUM,
+        "status": TaskStatus.PENDING,
+        "assigned_to": None,
+        "due_date": None,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+def _legacy_layout(fields: dict):
+    """Formato anterior: una instancia Pydantic Task por entrada"""
+    return Task.model_construct(**fields)
+
+def _compact_layout(fields: dict):
+    """Formato actual: fila con __slots__"""
+    return _TaskRecord(**fields, version=1)
+
+def _bytes_per_task(build) -> float:
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    storage = {}
+    for i in range(MEMORY_BENCH_SIZE):
+        fields = _task_fields(i)
+        storage[fields["id"]] = build(fields)
+    used = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del storage
+    return used / MEMORY_BENCH_SIZE
+
+# ============= PERFORMANCE TESTS =============
+
+@pytest.mark.slow
+def test_perf_memory_bytes_per_task(benchmark):
+    """
+    Test Memoria: Bytes por tarea, formato anterior vs compacto
+    Objetivo: el formato compacto usa menos de la mitad de memoria
+    """
+    results = {}
+
+    def measure():
+        results["legacy"] = _bytes_per_task(_legacy_layout)
+        results["compact"] = _bytes_per_task(_compact_layout)
+
+    benchmark.pedantic(measure, rounds=1, iterations=1)
+    benchmark.extra_info.update({
+        "tasks": MEMORY_BENCH_SIZE,
+        "legacy_bytes_per_task": round(results["legacy"], 1),
+        "compact_bytes_per_task": round(results["compact"], 1),
+    })
+
+    assert results["compact"] < results["legacy"] / 2
+    print(f"\n✓ {MEMORY_BENCH_SIZE} tasks — Pydantic Task: {results['legacy']:.0f} B/task, "
+          f"_TaskRecord: {results['compact']:.0f} B/task")
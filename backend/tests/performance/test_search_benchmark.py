@@ -0,0 +1,83 @@
+"""
+Tests de Performance de la búsqueda de texto (índice invertido en memoria)
+Mide la latencia de /tasks/search a nivel de repositorio con N tareas
+
+El tamaño se controla con TASKS_SEARCH_BENCH_SIZE (CI usa 1_000_000)
+"""
+import os
+import random
+import pytest
+from app.main import InMemoryTaskRepository, TaskCreate
+
+SEARCH_BENCH_SIZE = int(os.environ.get("TASKS_SEARCH_BENCH_SIZE", 100_000))
+SYLLABLES = ["ma", "re", "ción", "to", "li", "sa", "pe", "dro", "nú", "gue",
+             "ta", "ri", "fo", "mé", "cu", "bla", "ne", "so", "vi", "da"]
+
+# ============= HELPERS =============
+
+def _vocabulary(rng: random.Random, size: int) -> list:
+    """Pseudo-palabras con tildes de 2 a 4 sílabas"""
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+# ============= BENCHMARK FIXTURES =============
+
+@pytest.fixture(scope="module")
+def indexed_repository():
+    """Repositorio con SEARCH_BENCH_SIZE tareas; frecuencias de palabras tipo Zipf"""
+    rng = random.Random(11)
+    vocabulary = _vocabulary(rng, 20_000)
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    repository = InMemoryTaskRepository(change_log_size=1)
+
+    batch = 10_000
+    for start in range(0, SEARCH_BENCH_SIZE, batch):
+        count = min(batch, SEARCH_BENCH_SIZE - start)
+        words = rng.choices(vocabulary, weights, k=count * 9)
+        repository.create_many([
+            TaskCreate(title=" ".join(words[i * 9:i * 9 + 3]),
+                       description=" ".join(words[i * 9 + 3:i * 9 + 9]))
+            for i in range(count)
+        ])
+    # Dos palabras del título de una tarea cualquiera y un término de frecuencia media
+    title = repository.query(limit=SEARCH_BENCH_SIZE // 2)[-1].title.split()
+    return repository, f"{title[0]} {title[1]}", vocabulary[2000]
+
+# ============= PERFORMANCE TESTS =============
+
+@pytest.mark.slow
+def test_perf_search_two_terms(benchmark, indexed_repository):
+    """
+    Test Búsqueda: Dos palabras, ranking BM25, top 20
+    Objetivo: < 10ms
+    """
+    repository, query, _ = indexed_repository
+
+    result = benchmark(repository.search, query, 20)
+
+    stats = benchmark.stats.stats
+    benchmark.extra_info["tasks"] = SEARCH_BENCH_SIZE
+    assert result
+    assert stats.mean < 0.01, f"Search {stats.mean}s excede 10ms"
+    print(f"\n✓ {SEARCH_BENCH_SIZE} tasks — two-term search: {stats.mean*1000:.2f}ms, "
+          f"{len(result)} hits")
+
+@pytest.mark.slow
+def test_perf_search_prefix(benchmark, indexed_repository):
+    """
+    Test Búsqueda: Prefijo sin tildes (búsqueda mientras se escribe)
+    Objetivo: < 10ms
+    """
+    repository, _, word = indexed_repository
+    prefix = word.replace("ó", "o").replace("é", "e").replace("ú", "u")[:5]
+
+    result = benchmark(repository.search, prefix, 20)
+
+    stats = benchmark.stats.stats
+    benchmark.extra_info["tasks"] = SEARCH_BENCH_SIZE
+    assert result
+    assert stats.mean < 0.01, f"Prefix search {stats.mean}s excede 10ms"
+    print(f"\n✓ {SEARCH_BENCH_SIZE} tasks — prefix search '{prefix}': "
+          f"{stats.mean*1000:.2f}ms")
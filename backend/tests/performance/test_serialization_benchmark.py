@@ -0,0 +1,47 @@
+"""
+Tests de Performance de serialización
+Compara el modo estándar (response_model de FastAPI) con el modo rápido
+(TypeAdapter.dump_json, bytes crudos) al listar 10, 1k y 10k tareas
+"""
+import pytest
+from fastapi.testclient import TestClient
+import app.main as main
+from app.main import app, InMemoryTaskRepository, TaskCreate
+
+client = TestClient(app)
+
+# ============= BENCHMARK FIXTURES =============
+
+@pytest.fixture(params=[10, 1_000, 10_000], ids=lambda n: f"{n}_tasks")
+def populated_repository(request, use_repository):
+    """Repositorio aislado con N tareas y caché de listados desactivada"""
+    repository = InMemoryTaskRepository()
+    repository.create_many([
+        TaskCreate(title=f"Serialization Task {i}", description="Benchmark payload",
+                   assigned_to="bench@empresa.com")
+        for i in range(request.param)
+    ])
+    use_repository(repository)
+    return request.param
+
+# ============= PERFORMANCE TESTS =============
+
+@pytest.mark.parametrize("fast_serialization", [False, True], ids=["standard", "fast"])
+def test_perf_serialization_list_tasks(benchmark, populated_repository,
+                                       fast_serialization, monkeypatch):
+    """
+    Test Serialización: GET /tasks en modo estándar vs rápido
+    """
+    monkeypatch.setattr(main.settings, "fast_serialization", fast_serialization)
+
+    def list_tasks():
+        response = client.get("/tasks")
+        assert response.status_code == 200
+        return response
+
+    response = benchmark(list_tasks)
+
+    assert len(response.json()) == populated_repository
+    mode = "fast" if fast_serialization else "standard"
+    print(f"\n✓ {populated_repository} tasks ({mode}): "
+          f"{benchmark.stats.stats.mean*1000:.2f}ms")
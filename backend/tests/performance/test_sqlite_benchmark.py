@@ -0,0 +1,76 @@
+"""
+Tests de Performance del repositorio SQLite
+Compara throughput de SqliteTaskRepository frente a InMemoryTaskRepository
+"""
+import pytest
+from app.main import (
+    InMemoryTaskRepository, SqliteTaskRepository, TaskCreate, TaskUpdate,
+    TaskPriority, TaskStatus
+)
+
+PRELOADED_TASKS = 1000
+
+# ============= BENCHMARK FIXTURES =============
+
+@pytest.fixture(params=["memory", "sqlite"])
+def repository(request, tmp_path):
+    """Repositorio con tareas precargadas"""
+    if request.param == "sqlite":
+        repo = SqliteTaskRepository(str(tmp_path / "bench.db"))
+    else:
+        repo = InMemoryTaskRepository()
+
+    priorities = list(TaskPriority)
+    for i in range(PRELOADED_TASKS):
+        repo.create(TaskCreate(title=f"Preloaded Task {i}",
+                               priority=priorities[i % len(priorities)]))
+    yield repo
+    if request.param == "sqlite":
+        repo.close()
+
+# ============= PERFORMANCE TESTS =============
+
+def test_perf_sqlite_01_create_throughput(benchmark, repository):
+    """
+    Test 1 SQLite: Throughput de inserción
+    """
+    task_data = TaskCreate(title="Benchmark Task", priority=TaskPriority.HIGH)
+
+    benchmark(repository.create, task_data)
+
+    throughput = 1 / benchmark.stats.stats.mean
+    print(f"\n✓ {type(repository).__name__} create: {throughput:.0f} ops/s")
+
+def test_perf_sqlite_02_get_by_id_throughput(benchmark, repository):
+    """
+    Test 2 SQLite: Throughput de lectura por ID
+    """
+    task_id = repository.create(TaskCreate(title="Lookup Task")).id
+
+    result = benchmark(repository.get_by_id, task_id)
+
+    assert result.id == task_id
+    throughput = 1 / benchmark.stats.stats.mean
+    print(f"\n✓ {type(repository).__name__} get_by_id: {throughput:.0f} ops/s")
+
+def test_perf_sqlite_03_update_throughput(benchmark, repository):
+    """
+    Test 3 SQLite: Throughput de actualización
+    """
+    task_id = repository.create(TaskCreate(title="Update Task")).id
+    update = TaskUpdate(status=TaskStatus.IN_PROGRESS)
+
+    benchmark(repository.update, task_id, update)
+
+    throughput = 1 / benchmark.stats.stats.mean
+    print(f"\n✓ {type(repository).__name__} update: {throughput:.0f} ops/s")
+
+def test_perf_sqlite_04_filtered_page_throughput(benchmark, repository):
+    """
+    Test 4 SQLite: Throughput de una página filtrada (índice por prioridad)
+    """
+    result = benchmark(repository.query, priority=TaskPriority.URGENT, limit=50)
+
+    assert len(result) == 50
+    throughput = 1 / benchmark.stats.stats.mean
+    print(f"\n✓ {type(repository).__name__} filtered page: {throughput:.0f} ops/s")
@@ -0,0 +1,67 @@
+"""
+Tests de Performance del arranque en frío del proceso
+Mide el tiempo de `import app.main` en un intérprete nuevo (lo que paga cada
+arranque de la función serverless antes de atender la primera petición)
+
+El presupuesto se controla con TASKS_STARTUP_BUDGET_MS (por defecto 1500)
+"""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+STARTUP_BUDGET_MS = float(os.environ.get("TASKS_STARTUP_BUDGET_MS", 1500))
+STARTUP_RUNS = 5
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+
+# Sin perfilar: el desglose (app.startup) solo se pide si se excede el presupuesto
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - start
+print(json.dumps({"ms": elapsed * 1000, "modules": len(sys.modules)}))
+"""
+
+# ============= HELPERS =============
+
+def _cold_import() -> dict:
+    env = {**os.environ, "TASKS_STARTUP_PROFILE": "0"}
+    env.pop("TASKS_SNAPSHOT_PATH", None)
+    env.pop("TASKS_WAL_DIR", None)
+    result = subprocess.run([sys.executable, "-c", PROBE], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def _profile_report() -> str:
+    result = subprocess.run([sys.executable, "-m", "app.startup", "app.main", "10"],
+                            cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+    return result.stdout
+
+# ============= PERFORMANCE TESTS =============
+
+def test_perf_startup_import_budget(benchmark):
+    """
+    Test Arranque: `import app.main` en un proceso nuevo (mejor de STARTUP_RUNS)
+    Objetivo: < TASKS_STARTUP_BUDGET_MS
+    """
+    runs = []
+
+    def measure():
+        runs.extend(_cold_import() for _ in range(STARTUP_RUNS))
+
+    benchmark.pedantic(measure, rounds=1, iterations=1)
+    best = min(run["ms"] for run in runs)
+    benchmark.extra_info.update({
+        "budget_ms": STARTUP_BUDGET_MS,
+        "best_import_ms": round(best, 1),
+        "modules": runs[0]["modules"],
+    })
+
+    if best >= STARTUP_BUDGET_MS:
+        print(f"\n{_profile_report()}")
+    assert best < STARTUP_BUDGET_MS, \
+        f"import app.main {best:.0f}ms excede el presupuesto de {STARTUP_BUDGET_MS:.0f}ms"
+    print(f"\n✓ import app.main: {best:.0f}ms (budget {STARTUP_BUDGET_MS:.0f}ms), "
+          f"{runs[0]['modules']} modules")
@@ -0,0 +1,61 @@
+"""
+Tests de Performance de la persistencia del repositorio en memoria (WAL)
+Compara el throughput de escritura con fsync en cada escritura, cada N ms y nunca,
+y el tiempo de arranque reaplicando el log
+
+El número de escrituras se controla con TASKS_WAL_BENCH_WRITES
+"""
+import os
+import time
+import pytest
+from app.main import InMemoryTaskRepository, TaskCreate, TaskUpdate, TaskStatus, TaskWriteAheadLog
+
+WAL_BENCH_WRITES = int(os.environ.get("TASKS_WAL_BENCH_WRITES", 2000))
+FSYNC_MODES = ["always", "interval", "never"]
+
+# ============= HELPERS =============
+
+def _write_load(repository, writes: int) -> float:
+    """Altas y cambios alternos, uno por llamada (como llegan por la API); devuelve ops/s"""
+    start = time.perf_counter()
+    task_id = None
+    for i in range(writes):
+        if i % 2 == 0:
+            task_id = repository.create(TaskCreate(title=f"WAL Task {i}")).id
+        else:
+            repository.update(task_id, TaskUpdate(status=TaskStatus.IN_PROGRESS))
+    return writes / (time.perf_counter() - start)
+
+# ============= PERFORMANCE TESTS =============
+
+@pytest.mark.parametrize("fsync", FSYNC_MODES)
+def test_perf_wal_write_throughput(benchmark, tmp_path, fsync):
+    """
+    Test WAL: Escrituras/segundo según la política de fsync
+    Objetivo: ninguna escritura se pierde al reiniciar tras un cierre ordenado
+    """
+    results = {}
+
+    def measure():
+        wal = TaskWriteAheadLog(str(tmp_path), fsync=fsync, fsync_interval=0.01)
+        repository = InMemoryTaskRepository(wal=wal)
+        results["ops"] = _write_load(repository, WAL_BENCH_WRITES)
+        repository.close()
+
+    benchmark.pedantic(measure, rounds=1, iterations=1)
+
+    start = time.perf_counter()
+    restored = InMemoryTaskRepository(wal=TaskWriteAheadLog(str(tmp_path)))
+    replay = time.perf_counter() - start
+    restored.close()
+    benchmark.extra_info.update({
+        "fsync": fsync,
+        "writes": WAL_BENCH_WRITES,
+        "writes_per_second": round(results["ops"]),
+        "replay_seconds": round(replay, 4),
+    })
+
+    assert restored.version == WAL_BENCH_WRITES
+    assert restored.count() == WAL_BENCH_WRITES // 2
+    print(f"\n✓ fsync={fsync}: {results['ops']:.0f} writes/s, "
+          f"replay of {WAL_BENCH_WRITES} entries: {replay * 1000:.1f}ms")
@@ -2,20 +2,35 @@
 Tests Unitarios para Task Management API
 Cobertura de modelos, servicios y repositorios
 """
+import base64
+import os
+import sys
+import threading
 import pytest
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from itertools import islice
 from app.main import (
     Task, TaskCreate, TaskUpdate, TaskPriority, TaskStatus,
-    InMemoryTaskRepository, TaskService
+    InMemoryTaskRepository, SqliteTaskRepository, TaskService, VersionConflictError,
+    ListResponseCache, _SortedKeyList, AsyncTaskRepositoryAdapter, AsyncTaskService,
+    RequestMetrics, ChangeLog, ChangeBroker, TaskChange, TaskQuery, TaskWriteAheadLog,
+    MappedTaskSnapshot, Settings, build_repository, as_local_naive
 )
+from pydantic import ValidationError
+from app.startup import ImportProfiler
 from fastapi import HTTPException
 
 # ============= FIXTURES =============
 
-@pytest.fixture
-def repository():
-    """Fixture para repositorio limpio"""
-    return InMemoryTaskRepository()
+@pytest.fixture(params=["memory", "sqlite"])
+def repository(request, tmp_path):
+    """Fixture para repositorio limpio (en memoria y SQLite)"""
+    if request.param == "sqlite":
+        repo = SqliteTaskRepository(str(tmp_path / "tasks.db"))
+        yield repo
+        repo.close()
+    else:
+        yield InMemoryTaskRepository()
 
 @pytest.fixture
 def service(repository):
@@ -62,6 +77,22 @@ def test_task_empty_title_rejected():
     with pytest.raises(ValueError, match="Title cannot be empty"):
         TaskCreate(title="   ")
 
+def test_task_update_validates_only_sent_fields():
+    """Test 29: TaskUpdate aplica las reglas de TaskBase a los campos enviados"""
+    update = TaskUpdate(title="  Trimmed Title  ")
+    assert update.title == "Trimmed Title"
+    assert update.model_fields_set == {"title"}
+    
+    with pytest.raises(ValueError, match="Title cannot be empty"):
+        TaskUpdate(title="     ")
+    with pytest.raises(ValueError, match="status cannot be null"):
+        TaskUpdate(status=None)
+    with pytest.raises(ValueError):
+        TaskUpdate(description="x" * 501)
+    
+    # Los campos opcionales de TaskBase sí pueden vaciarse
+    assert TaskUpdate(assigned_to=None).model_fields_set == {"assigned_to"}
+
 # ============= REPOSITORY TESTS =============
 
 def test_repository_create_task(repository, sample_task_data):
@@ -79,6 +110,7 @@ def test_repository_get_all_tasks(repository, sample_task_data):
     
     all_tasks = repository.get_all()
     assert len(all_tasks) == 2
+    assert repository.count() == 2
     assert task1 in all_tasks
     assert task2 in all_tasks
 
@@ -197,4 +229,805 @@ def test_service_delete_task(service, sample_task_data):
     assert "deleted successfully" in result["message"]
     
     with pytest.raises(HTTPException):
-        service.get_task(task.id)
\ No newline at end of file
+        service.get_task(task.id)
+
+# ============= INDEX TESTS =============
+
+def test_repository_query_uses_indexes(repository):
+    """Test 21: Consultar por estado, prioridad y responsable"""
+    repository.create(TaskCreate(title="Task A", status=TaskStatus.PENDING,
+                                 priority=TaskPriority.HIGH, assigned_to="ana@empresa.com"))
+    repository.create(TaskCreate(title="Task B", status=TaskStatus.PENDING,
+                                 priority=TaskPriority.LOW))
+    repository.create(TaskCreate(title="Task C", status=TaskStatus.COMPLETED,
+                                 priority=TaskPriority.HIGH, assigned_to="ana@empresa.com"))
+    
+    assert len(repository.query(status=TaskStatus.PENDING)) == 2
+    assert len(repository.query(assigned_to="ana@empresa.com")) == 2
+    result = repository.query(status=TaskStatus.PENDING, priority=TaskPriority.HIGH)
+    assert [t.title for t in result] == ["Task A"]
+    assert repository.query(status=TaskStatus.CANCELLED) == []
+    assert len(repository.query()) == 3
+
+def test_repository_indexes_follow_update_and_delete(repository):
+    """Test 22: Los índices se mantienen al actualizar y eliminar"""
+    task = repository.create(TaskCreate(title="Indexed Task", assigned_to="ana@empresa.com"))
+    
+    repository.update(task.id, TaskUpdate(status=TaskStatus.IN_PROGRESS,
+                                          assigned_to="luis@empresa.com"))
+    assert repository.query(status=TaskStatus.PENDING) == []
+    assert repository.query(assigned_to="ana@empresa.com") == []
+    assert len(repository.query(status=TaskStatus.IN_PROGRESS,
+                                assigned_to="luis@empresa.com")) == 1
+    
+    repository.delete(task.id)
+    assert repository.query(status=TaskStatus.IN_PROGRESS) == []
+    assert repository.query(assigned_to="luis@empresa.com") == []
+
+# ============= ORDERING TESTS =============
+
+def test_sorted_key_list_keeps_order():
+    """Test 23: La lista ordenada mantiene el orden al insertar y borrar"""
+    import random
+    keys = list(range(3000))
+    random.Random(7).shuffle(keys)
+    ordered = _SortedKeyList()
+    for key in keys:
+        ordered.add(key)
+    for key in keys[:1000]:
+        assert ordered.discard(key) is True
+    assert ordered.discard(-1) is False
+    
+    assert len(ordered) == 2000
+    assert list(ordered.iter_desc()) == sorted(keys[1000:], reverse=True)
+
+def test_service_lists_newest_first(service):
+    """Test 24: Listar de la más reciente a la más antigua, también con filtros"""
+    first = service.create_task(TaskCreate(title="First Task"))
+    second = service.create_task(TaskCreate(title="Second Task"))
+    third = service.create_task(TaskCreate(title="Third Task"))
+    
+    # Mover la primera tarea de estado no altera su posición por created_at
+    service.update_task(first.id, TaskUpdate(status=TaskStatus.COMPLETED))
+    service.update_task(third.id, TaskUpdate(status=TaskStatus.COMPLETED))
+    
+    assert [t.id for t in service.list_tasks()] == [third.id, second.id, first.id]
+    completed = service.list_tasks(status=TaskStatus.COMPLETED)
+    assert [t.id for t in completed] == [third.id, first.id]
+
+# ============= PAGINATION TESTS =============
+
+def test_sorted_key_list_iter_before():
+    """Test 25: Recorrer desde una clave intermedia"""
+    ordered = _SortedKeyList()
+    for key in range(2000):
+        ordered.add(key)
+    
+    assert list(islice(ordered.iter_desc(before=1500), 3)) == [1499, 1498, 1497]
+    assert list(ordered.iter_desc(before=0)) == []
+    assert next(ordered.iter_desc(before=10_000)) == 1999
+
+def test_service_paginates_with_cursor(service):
+    """Test 26: Paginar por cursor sin duplicar ni perder tareas"""
+    created = [service.create_task(TaskCreate(title=f"Paged Task {i}")) for i in range(7)]
+    
+    seen, cursor = [], None
+    while True:
+        page, cursor = service.list_tasks_page(limit=3, cursor=cursor)
+        seen.extend(t.id for t in page)
+        if cursor is None:
+            break
+    
+    assert seen == [t.id for t in reversed(created)]
+
+def test_service_rejects_invalid_cursor(service):
+    """Test 27: Rechazar un cursor mal formado"""
+    with pytest.raises(HTTPException) as exc_info:
+        service.list_tasks_page(limit=3, cursor="not-a-cursor")
+    
+    assert exc_info.value.status_code == 400
+
+# ============= SQLITE TESTS =============
+
+def test_sqlite_repository_persists_across_instances(tmp_path, sample_task_data):
+    """Test 28: Las tareas de SQLite sobreviven a un reinicio"""
+    path = str(tmp_path / "tasks.db")
+    first = SqliteTaskRepository(path)
+    task = first.create(sample_task_data)
+    first.close()
+    
+    second = SqliteTaskRepository(path)
+    restored = second.get_by_id(task.id)
+    assert restored == task
+    journal_mode = second._conn().execute("PRAGMA journal_mode").fetchone()[0]
+    assert journal_mode == "wal"
+    second.close()
+
+def test_repository_update_patches_only_sent_fields(repository, sample_task_data):
+    """Test 30: Actualizar solo los campos enviados, incluido vaciar opcionales"""
+    task = repository.create(sample_task_data)
+    
+    updated = repository.update(task.id, TaskUpdate(title="  Patched Title ", assigned_to=None))
+    
+    assert updated.title == "Patched Title"
+    assert updated.assigned_to is None
+    assert updated.description == sample_task_data.description
+    assert updated.priority == sample_task_data.priority
+    assert repository.get_by_id(task.id) == updated
+
+# ============= VERSION TESTS =============
+
+def test_repository_version_advances_on_writes(repository, sample_task_data):
+    """Test 31: La versión global y la de cada tarea avanzan con las escrituras"""
+    start = repository.version
+    task = repository.create(sample_task_data)
+    assert repository.version == start + 1
+    assert repository.get_version(task.id) == repository.version
+    
+    repository.update(task.id, TaskUpdate(status=TaskStatus.IN_PROGRESS))
+    assert repository.get_version(task.id) == start + 2
+    
+    repository.delete(task.id)
+    assert repository.version == start + 3
+    assert repository.get_version(task.id) is None
+
+def test_repository_update_rejects_stale_version(repository, sample_task_data):
+    """Test 32: Rechazar actualizaciones con versión desactualizada"""
+    task = repository.create(sample_task_data)
+    stale = repository.get_version(task.id)
+    repository.update(task.id, TaskUpdate(title="First Writer"), expected_version=stale)
+    
+    with pytest.raises(VersionConflictError):
+        repository.update(task.id, TaskUpdate(title="Second Writer"), expected_version=stale)
+    assert repository.get_by_id(task.id).title == "First Writer"
+
+# ============= ASYNC SERVICE TESTS =============
+
+@pytest.mark.asyncio
+async def test_async_service_crud(repository, sample_task_data):
+    """Test 34: El servicio asíncrono crea, lee, actualiza y elimina sobre el repositorio"""
+    service = AsyncTaskService(AsyncTaskRepositoryAdapter(repository))
+    
+    task = await service.create_task(sample_task_data)
+    assert (await service.get_task(task.id)).title == "Test Task"
+    assert await service.get_task_etag(task.id) == TaskService.etag(task._version)
+    
+    updated = await service.update_task(task.id, TaskUpdate(status=TaskStatus.COMPLETED))
+    assert updated.status == TaskStatus.COMPLETED
+    tasks, next_cursor = await service.list_tasks_page(status=TaskStatus.COMPLETED, limit=10)
+    assert [t.id for t in tasks] == [task.id] and next_cursor is None
+    
+    await service.delete_task(task.id)
+    with pytest.raises(HTTPException) as exc_info:
+        await service.get_task(task.id)
+    assert exc_info.value.status_code == 404
+
+@pytest.mark.asyncio
+async def test_async_adapter_offloads_only_blocking_repositories(repository, monkeypatch):
+    """Test 35: Solo los repositorios con E/S bloqueante se delegan al threadpool"""
+    import app.main as main
+    offloaded = []
+    
+    async def fake_run_in_threadpool(method, *args, **kwargs):
+        offloaded.append(method)
+        return method(*args, **kwargs)
+    
+    monkeypatch.setattr(main, "run_in_threadpool", fake_run_in_threadpool)
+    assert await AsyncTaskRepositoryAdapter(repository).count() == 0
+    assert bool(offloaded) == repository.blocking_io
+
+# ============= STATISTICS TESTS =============
+
+def test_repository_stats_follow_writes(repository):
+    """Test 38: Las estadísticas se mantienen al crear, actualizar y eliminar"""
+    now = datetime.now()
+    later = now + timedelta(days=2)
+    due = repository.create(TaskCreate(title="Due Tomorrow", priority=TaskPriority.HIGH,
+                                       due_date=now + timedelta(days=1)))
+    repository.create(TaskCreate(title="No Due Date"))
+    
+    stats = repository.stats(now)
+    assert stats.total == 2 and stats.overdue == 0
+    assert stats.by_status[TaskStatus.PENDING] == 2
+    assert stats.by_priority[TaskPriority.HIGH] == 1
+    assert stats.by_priority[TaskPriority.URGENT] == 0
+    assert repository.stats(later).overdue == 1
+    
+    # Completar una tarea vencida deja de contarla como vencida
+    repository.update(due.id, TaskUpdate(status=TaskStatus.COMPLETED,
+                                         priority=TaskPriority.LOW))
+    stats = repository.stats(later)
+    assert stats.overdue == 0
+    assert stats.by_status[TaskStatus.COMPLETED] == 1
+    assert stats.by_priority[TaskPriority.HIGH] == 0
+    
+    repository.update(due.id, TaskUpdate(status=TaskStatus.IN_PROGRESS))
+    assert repository.stats(later).overdue == 1
+    repository.delete(due.id)
+    stats = repository.stats(later)
+    assert stats.total == 1 and stats.overdue == 0
+    assert sum(stats.by_status.values()) == 1
+
+# ============= CHANGE FEED TESTS =============
+
+def test_repository_change_log_records_writes(repository, sample_task_data):
+    """Test 39: Cada escritura queda en el registro de cambios con su versión"""
+    start = repository.changes.last_seq
+    task = repository.create(sample_task_data)
+    repository.update(task.id, TaskUpdate(status=TaskStatus.COMPLETED))
+    repository.delete(task.id)
+    repository.delete("missing")
+    
+    changes = repository.changes.since(start)
+    assert [(c.op, c.task_id) for c in changes] == [
+        ("created", task.id), ("updated", task.id), ("deleted", task.id)]
+    assert [c.seq for c in changes] == [start + 1, start + 2, start + 3]
+    assert changes[1].task.status == TaskStatus.COMPLETED
+    assert repository.changes.last_seq == repository.version
+    assert repository.changes.since(repository.version) == []
+
+def test_change_log_detects_compacted_history():
+    """Test 40: Pedir cambios ya expulsados del registro devuelve None"""
+    log = ChangeLog(capacity=3)
+    log.append([TaskChange(seq, "deleted", f"task-{seq}") for seq in range(1, 6)])
+    
+    assert [c.seq for c in log.since(2)] == [3, 4, 5]
+    assert [c.seq for c in log.since(4)] == [5]
+    assert log.since(1) is None
+    assert ChangeLog(capacity=3, last_seq=7).since(5) is None
+
+def test_service_changes_since_collapses_and_resyncs(service, repository):
+    """Test 42: Delta por tarea con tombstones; resync completo si la versión no consta"""
+    start = repository.version
+    kept = service.create_task(TaskCreate(title="Kept Task"))
+    gone = service.create_task(TaskCreate(title="Gone Task"))
+    service.update_task(kept.id, TaskUpdate(status=TaskStatus.IN_PROGRESS))
+    service.delete_task(gone.id)
+    
+    delta = service.changes_since(start)
+    assert not delta.full_resync
+    assert [t.id for t in delta.upserts] == [kept.id]
+    assert delta.upserts[0].status == TaskStatus.IN_PROGRESS
+    assert delta.deletions == [gone.id]
+    assert delta.version == repository.version
+    assert service.changes_since(delta.version).upserts == []
+    
+    # Una versión futura (otra historia) obliga a resincronizar
+    resync = service.changes_since(repository.version + 100)
+    assert resync.full_resync and [t.id for t in resync.upserts] == [kept.id]
+
+def test_service_changes_since_compacted_log():
+    """Test 43: Con el registro compactado se devuelve el estado completo"""
+    service = TaskService(InMemoryTaskRepository(change_log_size=2))
+    tasks = [service.create_task(TaskCreate(title=f"Compacted {i}")) for i in range(4)]
+    
+    assert len(service.changes_since(2).upserts) == 2
+    resync = service.changes_since(1)
+    assert resync.full_resync and resync.version == 4
+    assert {t.id for t in resync.upserts} == {t.id for t in tasks}
+
+def test_repository_search_ranks_and_stays_in_sync(repository):
+    """Test 44: Búsqueda sin tildes, por prefijo, ordenada por relevancia y al día"""
+    title_hit = repository.create(TaskCreate(title="Revisión del presupuesto"))
+    body_hit = repository.create(TaskCreate(title="Reunión semanal",
+                                            description="Repasar el presupuesto anual"))
+    repository.create(TaskCreate(title="Comprar café"))
+    
+    # El título pesa más que la descripción; acentos y mayúsculas no importan
+    assert [t.id for t in repository.search("PRESUPUESTO", 10)] == [title_hit.id, body_hit.id]
+    assert [t.id for t in repository.search("revision presu", 10)] == [title_hit.id]
+    assert [t.title for t in repository.search("cafe", 10)] == ["Comprar café"]
+    assert repository.search("presupuesto inexistente", 10) == []
+    assert len(repository.search("presupuesto", 1)) == 1
+    
+    # El índice sigue a las actualizaciones y borrados
+    repository.update(title_hit.id, TaskUpdate(title="Revisión de contratos"))
+    assert [t.id for t in repository.search("presupuesto", 10)] == [body_hit.id]
+    assert [t.id for t in repository.search("contratos", 10)] == [title_hit.id]
+    repository.delete(body_hit.id)
+    assert repository.search("presupuesto", 10) == []
+
+def test_repository_due_range_and_overdue(service, repository):
+    """Test 45: Rangos de fecha límite en orden, paginados, y vista de vencidas"""
+    now = datetime.now()
+    late = repository.create(TaskCreate(title="Late", due_date=now - timedelta(days=2)))
+    done = repository.create(TaskCreate(title="Done", due_date=now - timedelta(days=1),
+                                        status=TaskStatus.COMPLETED))
+    soon = [repository.create(TaskCreate(title=f"Soon {i}", due_date=now + timedelta(days=i)))
+            for i in (3, 1, 2)]
+    repository.create(TaskCreate(title="Undated"))
+    
+    week = repository.query_due(due_after=now, due_before=now + timedelta(days=3))
+    assert [t.title for t in week] == ["Soon 1", "Soon 2"]
+    assert [t.title for t in repository.query_due()] == [
+        "Late", "Done", "Soon 1", "Soon 2", "Soon 3"]
+    
+    dated = TaskQuery(due_after=now - timedelta(days=5))
+    page, cursor, _ = service.find_tasks_page(dated, limit=2)
+    assert [t.title for t in page] == ["Late", "Done"]
+    page, cursor, _ = service.find_tasks_page(dated, limit=2, cursor=cursor)
+    assert [t.title for t in page] == ["Soon 1", "Soon 2"]
+    
+    overdue, _ = service.list_overdue_page()
+    assert [t.id for t in overdue] == [late.id]
+    repository.update(late.id, TaskUpdate(status=TaskStatus.CANCELLED))
+    repository.update(soon[1].id, TaskUpdate(due_date=now - timedelta(hours=1)))
+    assert [t.id for t in service.list_overdue_page()[0]] == [soon[1].id]
+    assert done.id not in {t.id for t in service.list_overdue_page()[0]}
+    
+    # Un cursor del listado normal no sirve para el orden por fecha límite
+    with pytest.raises(HTTPException) as exc:
+        service.find_tasks_page(dated, cursor=TaskService.encode_cursor(late))
+    assert exc.value.status_code == 400
+
+def test_repository_find_combines_filters(repository):
+    """Test 46: find() combina estado, prioridad, responsable, fechas y texto"""
+    now = datetime.now()
+    for i in range(6):
+        repository.create(TaskCreate(
+            title=f"Informe {'trimestral' if i % 2 else 'anual'} {i}",
+            priority=TaskPriority.HIGH if i < 3 else TaskPriority.LOW,
+            assigned_to="ana@empresa.com" if i % 3 == 0 else None,
+            due_date=now + timedelta(days=i + 1)
+        ))
+    
+    filters = TaskQuery(priority=TaskPriority.HIGH, text="trimes")
+    assert [t.title for t in repository.find(filters)[0]] == ["Informe trimestral 1"]
+    
+    filters = TaskQuery(assigned_to="ana@empresa.com", status=TaskStatus.PENDING,
+                        due_before=now + timedelta(days=10))
+    tasks, _ = repository.find(filters, limit=1)
+    assert [t.title for t in tasks] == ["Informe anual 0"]
+    after = (tasks[0].due_date, tasks[0].created_at, tasks[0].id)
+    assert [t.title for t in repository.find(filters, after=after)[0]] == ["Informe trimestral 3"]
+    
+    assert repository.find(TaskQuery(text="inexistente"))[0] == []
+    assert repository.find(TaskQuery(text="!!"))[0] == []
+    _, plan = repository.find(filters, explain=True)
+    assert plan.order == "due_date asc"
+    assert repository.find(filters)[1] is None
+
+def test_in_memory_planner_picks_most_selective_index():
+    """Test 47: El índice con menos filas dirige y el resto queda como filtro residual"""
+    repository = InMemoryTaskRepository()
+    repository.create_many([TaskCreate(title=f"Plan Task {i}",
+                                       assigned_to="luis@empresa.com" if i < 2 else None)
+                            for i in range(50)])
+    
+    _, plan = repository.find(TaskQuery(status=TaskStatus.PENDING,
+                                        assigned_to="luis@empresa.com"), explain=True)
+    assert plan.driver == "assigned_to" and plan.strategy == "index_scan"
+    assert plan.estimates == {"all": 50, "status": 50, "assigned_to": 2}
+    assert plan.residual == ["status"]
+    
+    tasks, plan = repository.find(TaskQuery(status=TaskStatus.PENDING, text="task 7"),
+                                  explain=True)
+    assert plan.driver == "text" and plan.strategy == "sort"
+    assert [t.title for t in tasks] == ["Plan Task 7"]
+    
+    _, plan = repository.find(TaskQuery(priority=TaskPriority.URGENT), explain=True)
+    assert plan.estimates["priority"] == 0 and plan.driver == "priority"
+
+def test_in_memory_wal_restores_state_after_restart(tmp_path):
+    """Test 48: Con WAL, reiniciar recupera tareas, versiones e índices"""
+    repository = InMemoryTaskRepository(wal=TaskWriteAheadLog(str(tmp_path), fsync="always"))
+    kept = repository.create(TaskCreate(title="Persistir informe", assigned_to="ana@empresa.com",
+                                        due_date=datetime.now() + timedelta(days=1)))
+    gone = repository.create_many([TaskCreate(title="Temporal")])[0]
+    repository.update(kept.id, TaskUpdate(status=TaskStatus.IN_PROGRESS))
+    repository.delete(gone.id)
+    repository.close()
+    
+    restored = InMemoryTaskRepository(wal=TaskWriteAheadLog(str(tmp_path)))
+    assert restored.version == 4 and restored.changes.last_seq == 4
+    assert restored.get_by_id(kept.id) == repository.get_by_id(kept.id)
+    assert restored.get_version(kept.id) == 3
+    assert restored.get_by_id(gone.id) is None
+    assert [t.id for t in restored.query(status=TaskStatus.IN_PROGRESS)] == [kept.id]
+    assert [t.id for t in restored.search("informe", 10)] == [kept.id]
+    assert restored.create(TaskCreate(title="Nueva"))._version == 5
+    restored.close()
+
+def test_in_memory_wal_snapshot_truncates_log(tmp_path):
+    """Test 49: El snapshot trunca el log; se recupera una cola rota o una compactación a medias"""
+    wal_path = tmp_path / "wal.log"
+    repository = InMemoryTaskRepository(wal=TaskWriteAheadLog(str(tmp_path), fsync="never"))
+    tasks = repository.create_many([TaskCreate(title=f"Snap {i}") for i in range(20)])
+    repository.snapshot()
+    assert wal_path.stat().st_size == 0 and (tmp_path / "snapshot.bin").exists()
+    repository.update(tasks[0].id, TaskUpdate(title="Snap renamed"))
+    repository.close()
+    
+    # Caída a mitad de un append: la trama incompleta se descarta
+    size = wal_path.stat().st_size
+    with open(wal_path, "ab") as f:
+        f.write(b"\x40\x00\x00\x00partial")
+    # Caída entre rotar el log y escribir el snapshot
+    (tmp_path / "wal.log.old").write_bytes(wal_path.read_bytes())
+    
+    restored = InMemoryTaskRepository(wal=TaskWriteAheadLog(str(tmp_path)))
+    assert restored.count() == 20 and restored.version == 21
+    assert restored.get_by_id(tasks[0].id).title == "Snap renamed"
+    assert wal_path.stat().st_size == size
+    assert not (tmp_path / "wal.log.old").exists()
+    restored.close()
+
+@pytest.mark.asyncio
+async def test_in_memory_wal_keeps_fsync_off_the_event_loop(tmp_path, monkeypatch):
+    """Test 55: Con WAL las escrituras van al threadpool y ningún fsync se hace con el lock"""
+    import app.main as main
+    repository = InMemoryTaskRepository(wal=TaskWriteAheadLog(str(tmp_path), fsync="always"))
+    assert repository.blocking_io
+    synced = []
+    real_fsync = os.fsync
+    
+    def recording_fsync(fd):
+        synced.append((threading.current_thread() is threading.main_thread(),
+                       repository._write_lock.locked()))
+        real_fsync(fd)
+    
+    monkeypatch.setattr(main.os, "fsync", recording_fsync)
+    created = await AsyncTaskRepositoryAdapter(repository).create(
+        TaskCreate(title="Fuera del bucle"))
+    assert synced and not any(on_loop or locked for on_loop, locked in synced)
+    
+    # Group commit: un cambio ya en disco no vuelve a sincronizar
+    synced.clear()
+    repository._wal.wait_durable(created._version)
+    assert synced == []
+    
+    synced.clear()
+    repository.snapshot()
+    assert synced and not any(locked for _, locked in synced)
+    repository.close()
+
+def test_change_log_gap_forces_full_resync(tmp_path):
+    """Test 56: Con dos procesos sobre el mismo SQLite, un seq ajeno obliga a resincronizar"""
+    path = str(tmp_path / "shared.db")
+    worker_a, worker_b = SqliteTaskRepository(path), SqliteTaskRepository(path)
+    worker_a.create(TaskCreate(title="From worker A"))
+    from_b = worker_b.create(TaskCreate(title="From worker B"))
+    worker_a.create(TaskCreate(title="From worker A again"))
+    
+    assert worker_a.changes.since(1) is None
+    assert [c.seq for c in worker_a.changes.since(2)] == [3]
+    changes = TaskService(worker_a).changes_since(1)
+    assert changes.full_resync and from_b.id in {t.id for t in changes.upserts}
+    
+    log = ChangeLog(capacity=10)
+    log.append([TaskChange(1, "deleted", "a"), TaskChange(2, "deleted", "b")])
+    assert [c.seq for c in log.since(0)] == [1, 2]
+    worker_a.close()
+    worker_b.close()
+
+@pytest.mark.asyncio
+async def test_changes_since_resyncs_when_store_is_ahead(tmp_path):
+    """Test 59: Si otro proceso escribió tras la última escritura propia, se pide recargar"""
+    path = str(tmp_path / "shared.db")
+    worker_a, worker_b = SqliteTaskRepository(path), SqliteTaskRepository(path)
+    worker_a.create(TaskCreate(title="From worker A"))
+    worker_b.create(TaskCreate(title="From worker B"))
+    worker_b.create(TaskCreate(title="From worker B again"))
+    
+    assert worker_a.changes.last_seq == 1 and worker_a.version == 3
+    changes = TaskService(worker_a).changes_since(1)
+    assert changes.full_resync and changes.version == 3 and len(changes.upserts) == 3
+    up_to_date = TaskService(worker_a).changes_since(3)
+    assert not up_to_date.full_resync and up_to_date.version == 3
+    assert up_to_date.upserts == [] and up_to_date.deletions == []
+    
+    async_service = AsyncTaskService(AsyncTaskRepositoryAdapter(worker_a))
+    assert (await async_service.changes_since(1)).full_resync
+    events = ChangeBroker(worker_a.changes, 10).stream(1, 1.0, worker_a.version)
+    assert (await events.__anext__()).startswith(b"id: 3\nevent: reset\n")
+    await events.aclose()
+    worker_a.close()
+    worker_b.close()
+
+def test_service_accepts_cursor_with_aware_timestamp(service):
+    """Test 60: Un cursor con created_at con zona pagina igual que el original (sin error 500)"""
+    created = [service.create_task(TaskCreate(title=f"Aware Cursor {i}")) for i in range(3)]
+    page, cursor = service.list_tasks_page(limit=1)
+    created_at, task_id = TaskService.decode_cursor(cursor)
+    raw = f"{created_at.astimezone(timezone.utc).isoformat()}|{task_id}".encode()
+    aware = base64.urlsafe_b64encode(raw).decode()
+    
+    assert service.list_tasks_page(limit=5, cursor=aware)[0] == \
+        service.list_tasks_page(limit=5, cursor=cursor)[0] == created[1::-1]
+    legacy = base64.urlsafe_b64encode(b"2024-01-01T00:00:00+00:00|x").decode()
+    assert service.list_tasks_page(limit=5, cursor=legacy) == ([], None)
+
+def test_settings_reject_wal_with_mapped_snapshot(tmp_path):
+    """Test 61: WAL y snapshot mapeado juntos no arrancan (el snapshot se ignoraría)"""
+    with pytest.raises(ValidationError, match="cannot be combined"):
+        Settings(wal_dir=str(tmp_path / "wal"), snapshot_path=str(tmp_path / "tasks.map"))
+    
+    repository = build_repository(Settings(repository="memory", wal_dir=str(tmp_path / "wal")))
+    assert repository._wal is not None
+    repository.close()
+
+def test_aware_due_dates_compare_as_local_time(repository):
+    """Test 57: Fechas límite con zona se filtran y ordenan por su instante y guardan el offset"""
+    base = datetime(2030, 1, 1, 12, 0, tzinfo=timezone.utc)
+    late_due = (base + timedelta(hours=12)).astimezone(timezone(timedelta(hours=-12)))
+    late = repository.create(TaskCreate(title="Late aware", due_date=late_due))
+    early = repository.create(TaskCreate(
+        title="Early naive", due_date=as_local_naive(base + timedelta(hours=1))))
+    
+    stored = repository.get_by_id(late.id).due_date
+    assert stored == late_due and stored.utcoffset() == timedelta(hours=-12)
+    assert repository.get_by_id(early.id).due_date.tzinfo is None
+    soon = repository.find(TaskQuery(due_before=base + timedelta(hours=2)))[0]
+    assert [t.id for t in soon] == [early.id]
+    ordered = repository.find(TaskQuery(due_after=base - timedelta(days=1)))[0]
+    assert [t.id for t in ordered] == [early.id, late.id]
+    page = repository.find(TaskQuery(due_after=base - timedelta(days=1)), limit=1,
+                           after=(early.due_date, early.created_at, early.id))[0]
+    assert [t.id for t in page] == [late.id]
+
+def test_sqlite_migrates_aware_due_dates(tmp_path):
+    """Test 58: Las bases sin due_local lo rellenan al abrir y mantienen el offset guardado"""
+    path = str(tmp_path / "legacy.db")
+    repository = SqliteTaskRepository(path)
+    task = repository.create(TaskCreate(title="Legacy"))
+    due = datetime(2030, 1, 1, 12, 0, tzinfo=timezone(timedelta(hours=-12)))
+    conn = repository._conn()
+    # Esquema anterior: sin due_local y con los índices sobre due_date
+    conn.execute("DROP INDEX idx_tasks_open_due_local")
+    conn.execute("DROP INDEX idx_tasks_due_local")
+    conn.execute("ALTER TABLE tasks DROP COLUMN due_local")
+    conn.execute("CREATE INDEX idx_tasks_due ON tasks (due_date, created_at, id)")
+    conn.execute("DELETE FROM repository_meta WHERE key = 'due_local'")
+    conn.execute("UPDATE tasks SET due_date = ? WHERE id = ?",
+                 (due.isoformat(timespec="microseconds"), task.id))
+    repository.close()
+    
+    reopened = SqliteTaskRepository(path)
+    assert reopened.get_by_id(task.id).due_date.utcoffset() == timedelta(hours=-12)
+    indexes = {row[1] for row in reopened._conn().execute("PRAGMA index_list(tasks)")}
+    assert "idx_tasks_due" not in indexes and "idx_tasks_due_local" in indexes
+    assert [t.id for t in reopened.find(TaskQuery(due_before=due + timedelta(hours=1)))[0]] \
+        == [task.id]
+    reopened.close()
+
+def test_mapped_snapshot_reads_lazily_and_hydrates(tmp_path, monkeypatch):
+    """Test 50: El snapshot mapeado responde sin cargar nada y luego se hidrata igual"""
+    path = str(tmp_path / "tasks.map")
+    source = InMemoryTaskRepository()
+    now = datetime.now()
+    tasks = source.create_many([
+        TaskCreate(title=f"Mapped {i}", priority=TaskPriority.HIGH if i % 3 else TaskPriority.LOW,
+                   assigned_to="ana@empresa.com" if i % 2 else None,
+                   due_date=now + timedelta(days=i - 3))
+        for i in range(12)
+    ])
+    source.update(tasks[0].id, TaskUpdate(status=TaskStatus.COMPLETED))
+    source.export_snapshot(path)
+    
+    mapped = MappedTaskSnapshot(path)
+    assert mapped.count == 12 and mapped.version == source.version
+    assert mapped.get(tasks[5].id).to_task() == source.get_by_id(tasks[5].id)
+    assert mapped.get_version(tasks[0].id) == 13 and mapped.get("missing") is None
+    assert mapped.stats(now) == source.stats(now)
+    assert mapped.index_sizes() == source.index_sizes()
+    filters = TaskQuery(priority=TaskPriority.HIGH, assigned_to="ana@empresa.com")
+    expected = source.find(filters)[0]
+    page, plan = mapped.find(filters, InMemoryTaskRepository._matcher(filters), limit=2,
+                             explain=True)
+    assert page == expected[:2] and plan.driver == "assigned_to"
+    after = (expected[1].created_at, expected[1].id)
+    rest = mapped.find(filters, InMemoryTaskRepository._matcher(filters), after=after)[0]
+    assert rest == expected[2:]
+    mapped.close()
+    
+    # La hidratación espera hasta que un lector tiene el snapshot en la mano
+    reader_ready = threading.Event()
+    load = InMemoryTaskRepository._load
+    monkeypatch.setattr(InMemoryTaskRepository, "_load",
+                        lambda self, records: reader_ready.wait(5) and load(self, records))
+    repository = InMemoryTaskRepository(snapshot_path=path)
+    assert repository.get_by_id(tasks[1].id) == source.get_by_id(tasks[1].id)
+    reader = repository._mapped
+    rows = reader.find(filters, InMemoryTaskRepository._matcher(filters))[0]
+    reader_ready.set()
+    assert repository.wait_until_loaded(timeout=5) and not repository.blocking_io
+    # El lector que empezó antes de terminar la hidratación sigue leyendo el snapshot
+    assert rows == expected
+    assert reader.find(filters, InMemoryTaskRepository._matcher(filters))[0] == expected
+    assert reader.get(tasks[5].id).to_task() == source.get_by_id(tasks[5].id)
+    assert repository.query() == source.query()
+    assert [t.id for t in repository.search("mapped 7", 5)] == [tasks[7].id]
+    assert repository.create(TaskCreate(title="After Hydration"))._version == source.version + 1
+
+def test_import_profiler_breakdown(tmp_path, monkeypatch):
+    """Test 51: El perfil de arranque separa tiempo propio y acumulado por módulo"""
+    package = tmp_path / "startup_probe"
+    package.mkdir()
+    (package / "__init__.py").write_text("import time\nfrom . import child\ntime.sleep(0.01)\n")
+    (package / "child.py").write_text("import time\ntime.sleep(0.02)\n")
+    (package / "data.txt").write_text("ok")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    
+    with ImportProfiler() as profiler:
+        import startup_probe
+    timings = {t.name: t for t in profiler.timings}
+    parent, child = timings["startup_probe"], timings["startup_probe.child"]
+    assert (parent.depth, child.depth) == (0, 1)
+    assert child.self_us >= 20_000 and parent.self_us >= 10_000
+    assert parent.cumulative_us == pytest.approx(parent.self_us + child.cumulative_us, abs=1)
+    assert profiler.top(1)[0].name == "startup_probe"
+    assert profiler.total_us >= parent.cumulative_us
+    assert "startup_probe.child" in profiler.report()
+    # Los módulos conservan su loader real
+    assert startup_probe.__loader__.get_data(str(package / "data.txt")) == b"ok"
+    del sys.modules["startup_probe"], sys.modules["startup_probe.child"]
+
+@pytest.mark.asyncio
+async def test_repository_iter_tasks_in_batches(repository):
+    """Test 52: iter_tasks recorre todo en el orden de find, lote a lote"""
+    now = datetime.now()
+    repository.create_many([
+        TaskCreate(title=f"Export {i}", priority=TaskPriority.HIGH if i % 2 else TaskPriority.LOW,
+                   due_date=now + timedelta(days=(i * 7) % 11 + 1))
+        for i in range(11)
+    ])
+    
+    # Los dos últimos se planifican ordenando (cubo con fecha, texto) en find
+    for filters in (TaskQuery(), TaskQuery(priority=TaskPriority.HIGH),
+                    TaskQuery(due_after=now), TaskQuery(priority=TaskPriority.HIGH, due_after=now),
+                    TaskQuery(text="export")):
+        expected = repository.find(filters)[0]
+        assert list(repository.iter_tasks(filters, batch_size=3)) == expected
+        assert list(repository.iter_tasks(filters, batch_size=len(expected))) == expected
+        adapter = AsyncTaskRepositoryAdapter(repository)
+        assert [t async for t in adapter.iter_tasks(filters, batch_size=4)] == expected
+    
+    # Lo escrito mientras se recorre no repite ni salta lo ya leído
+    tasks = repository.iter_tasks(TaskQuery(), batch_size=2)
+    first = [next(tasks), next(tasks)]
+    repository.create(TaskCreate(title="Export late"))
+    rest = list(tasks)
+    assert len(first) + len(rest) == 11
+    assert {t.id for t in first}.isdisjoint(t.id for t in rest)
+
+def test_service_import_tasks_in_batches(service, repository):
+    """Test 53: La importación crea por lotes y acumula errores por línea con tope"""
+    past = datetime.now() - timedelta(days=1)
+    records = [(1, TaskCreate(title="Imported 1")), (2, "title: too short"),
+               (3, TaskCreate(title="Imported 3", due_date=past)),
+               (4, TaskCreate(title="Imported 4")), (5, "Invalid JSON"),
+               (6, TaskCreate(title="Imported 6"))]
+    
+    result = service.import_tasks(iter(records), batch_size=2, max_errors=2)
+    assert (result.imported, result.failed) == (3, 3)
+    assert [(e.line, e.detail) for e in result.errors] == [
+        (2, "title: too short"), (3, "Due date cannot be in the past")]
+    assert sorted(t.title for t in repository.get_all()) == [
+        "Imported 1", "Imported 4", "Imported 6"]
+    assert service.import_tasks(iter([])).imported == 0
+
+def test_find_text_prefix_covers_whole_vocabulary(repository):
+    """Test 54: Un prefijo con más de 64 términos filtra igual con cualquier driver"""
+    tasks = repository.create_many([TaskCreate(title=f"ab{i:03d}") for i in range(100)])
+    repository.update(tasks[95].id, TaskUpdate(status=TaskStatus.COMPLETED))
+    
+    assert len(repository.find(TaskQuery(text="ab"))[0]) == 100
+    completed = repository.find(TaskQuery(text="ab", status=TaskStatus.COMPLETED))[0]
+    assert [t.title for t in completed] == ["ab095"]
+    # La puntuación sí se limita a los primeros términos del prefijo
+    assert len(repository.search("ab", 100)) >= 64
+
+@pytest.mark.asyncio
+async def test_change_broker_drops_slow_consumers():
+    """Test 41: El broker reparte a todos y descarta a quien llena su cola"""
+    log = ChangeLog(capacity=100)
+    broker = ChangeBroker(log, queue_size=2)
+    fast, slow = broker.subscribe(), broker.subscribe()
+    
+    log.append([TaskChange(1, "deleted", "a")])
+    assert (await fast.get())[0] == 1
+    log.append([TaskChange(2, "deleted", "b"), TaskChange(3, "deleted", "c")])
+    
+    assert broker.subscriber_count == 1  # `slow` tenía 1 pendiente y no cabían 2 más
+    assert slow.get_nowait() is None
+    assert [(await fast.get())[0] for _ in range(2)] == [2, 3]
+
+# ============= CONCURRENCY TESTS =============
+
+def test_repository_concurrent_updates_are_not_lost(repository):
+    """Test 36: Incrementos concurrentes con If-Match no pierden actualizaciones"""
+    import sys
+    import threading
+    # Cambiar de hilo mucho más a menudo para forzar intercalados
+    previous = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    
+    threads_count, increments = 8, 25
+    statuses = [TaskStatus.PENDING, TaskStatus.IN_PROGRESS]
+    repository.create_many([TaskCreate(title=f"Filler {i}") for i in range(200)])
+    task = repository.create(TaskCreate(title="Counter 0"))
+    errors = []
+    
+    def writer():
+        for _ in range(increments):
+            while True:
+                current = repository.get_by_id(task.id)
+                value = int(current.title.split()[1]) + 1
+                # Cambiar de estado mueve la tarea entre índices en cada escritura
+                changes = TaskUpdate(title=f"Counter {value}", status=statuses[value % 2])
+                try:
+                    repository.update(task.id, changes, expected_version=current._version)
+                    break
+                except VersionConflictError:
+                    continue
+    
+    def reader(stop):
+        # Las lecturas concurrentes nunca fallan ni ven tareas a medio escribir
+        try:
+            while not stop.is_set():
+                for status in statuses:
+                    assert all(t.status == status for t in repository.query(status=status))
+        except Exception as e:  # pragma: no cover - solo si hay una carrera
+            errors.append(e)
+    
+    stop = threading.Event()
+    readers = [threading.Thread(target=reader, args=(stop,)) for _ in range(2)]
+    writers = [threading.Thread(target=writer) for _ in range(threads_count)]
+    try:
+        for t in readers + writers:
+            t.start()
+        for t in writers:
+            t.join()
+    finally:
+        stop.set()
+        for t in readers:
+            t.join()
+        sys.setswitchinterval(previous)
+    
+    assert errors == []
+    assert repository.get_by_id(task.id).title == f"Counter {threads_count * increments}"
+
+# ============= RESPONSE CACHE TESTS =============
+
+def test_list_cache_lru_and_version_invalidation():
+    """Test 33: La caché de listados expulsa por LRU y se invalida por versión"""
+    cache = ListResponseCache(max_entries=2)
+    cache.put(("a",), 1, (b"[1]", None))
+    cache.put(("b",), 1, (b"[2]", None))
+    assert cache.get(("a",), 1) == (b"[1]", None)
+    
+    cache.put(("c",), 1, (b"[3]", None))  # expulsa "b", el menos usado
+    assert cache.get(("b",), 1) is None
+    assert cache.get(("c",), 1) == (b"[3]", None)
+    
+    assert cache.get(("a",), 2) is None  # nueva versión: todo obsoleto
+    assert cache.stats() == {"entries": 0, "hits": 2, "misses": 2}
+
+# ============= METRICS TESTS =============
+
+def test_request_metrics_merges_thread_shards():
+    """Test 37: Las métricas registradas en varios hilos se fusionan al exportar"""
+    import threading
+    metrics = RequestMetrics()
+    
+    def record():
+        for _ in range(100):
+            metrics.record("GET", "/tasks", 200, 0.002, 0, 300)
+    
+    threads = [threading.Thread(target=record) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    metrics.record("GET", "/tasks", 200, 10.0, 0, 300)
+    
+    latency, request_size, response_size = metrics.snapshot()[("GET", "/tasks", 200)]
+    assert sum(latency.counts) == 401
+    assert latency.counts[-1] == 1  # 10s cae en +Inf
+    assert response_size.sum == 401 * 300
+    
+    lines = metrics.render()
+    labels = 'method="GET",route="/tasks",status="200"'
+    assert f'http_request_duration_seconds_bucket{{{labels},le="0.0025"}} 400' in lines
+    assert f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 401' in lines
+    assert f"http_response_size_bytes_count{{{labels}}} 401" in lines
@@ -8,20 +8,23 @@ import TaskStats from './components/TaskStats';
 import Header from './components/Header';
 
 function App() {
-  const { tasks, loading, error, fetchTasks } = useTaskStore();
+  const { loading, error, fetchTasks, subscribeToChanges } = useTaskStore();
   const [showForm, setShowForm] = useState(false);
 
   useEffect(() => {
     fetchTasks();
   }, [fetchTasks]);
 
+  // Live updates from other clients; closes the stream on unmount
+  useEffect(() => subscribeToChanges(), [subscribeToChanges]);
+
   return (
     <div className="min-h-screen bg-gradient-to-br from-blue-50 to-indigo-100">
       <Header />
       
       <main className="container mx-auto px-4 py-8 max-w-7xl">
         {/* Stats Dashboard */}
-        <TaskStats tasks={tasks} />
+        <TaskStats />
 
         {/* Main Content */}
         <div className="grid grid-cols-1 lg:grid-cols-3 gap-6 mt-8">
@@ -1,11 +1,15 @@
 import { CheckCircle, Clock, AlertCircle, TrendingUp } from 'lucide-react';
+import { useTaskStore } from '../store/taskStore';
 
-export default function TaskStats({ tasks }) {
+export default function TaskStats() {
+  // Counts come from GET /tasks/stats, not from the filtered task list
+  const apiStats = useTaskStore(state => state.stats);
   const stats = {
-    total: tasks.length,
-    completed: tasks.filter(t => t.status === 'completed').length,
-    pending: tasks.filter(t => t.status === 'pending').length,
-    inProgress: tasks.filter(t => t.status === 'in_progress').length
+    total: apiStats?.total ?? 0,
+    completed: apiStats?.by_status.completed ?? 0,
+    pending: apiStats?.by_status.pending ?? 0,
+    inProgress: apiStats?.by_status.in_progress ?? 0,
+    overdue: apiStats?.overdue ?? 0
   };
 
   const completionRate = stats.total > 0 
@@ -32,6 +36,13 @@ export default function TaskStats({ tasks }) {
               <Icon className="text-white" size={24} />
             </div>
           </div>
+          {label === 'Pendientes' && stats.overdue > 0 && (
+            <div className="mt-3 pt-3 border-t border-gray-200">
+              <p className="text-sm text-red-600">
+                Vencidas: <span className="font-semibold">{stats.overdue}</span>
+              </p>
+            </div>
+          )}
           {label === 'Completadas' && (
             <div className="mt-3 pt-3 border-t border-gray-200">
               <p className="text-sm text-gray-600">
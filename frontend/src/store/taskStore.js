@@ -5,6 +5,7 @@ const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
 
 export const useTaskStore = create((set, get) => ({
   tasks: [],
+  stats: null,
   loading: false,
   error: null,
   filters: {
@@ -24,6 +25,7 @@ export const useTaskStore = create((set, get) => ({
 
       const response = await axios.get(`${API_URL}/tasks`, { params });
       set({ tasks: response.data, loading: false });
+      get().fetchStats();
     } catch (error) {
       set({ 
         error: error.response?.data?.detail || 'Error al cargar tareas',
@@ -32,6 +34,16 @@ export const useTaskStore = create((set, get) => ({
     }
   },
 
+  // Fetch global stats (computed by the API, independent of filters)
+  fetchStats: async () => {
+    try {
+      const response = await axios.get(`${API_URL}/tasks/stats`);
+      set({ stats: response.data });
+    } catch (error) {
+      // Stats are secondary: keep the last values if the request fails
+    }
+  },
+
   // Create new task
   createTask: async (taskData) => {
     set({ loading: true, error: null });
@@ -41,6 +53,7 @@ export const useTaskStore = create((set, get) => ({
         tasks: [response.data, ...state.tasks],
         loading: false 
       }));
+      get().fetchStats();
       return response.data;
     } catch (error) {
       set({ 
@@ -62,6 +75,7 @@ export const useTaskStore = create((set, get) => ({
         ),
         loading: false
       }));
+      get().fetchStats();
       return response.data;
     } catch (error) {
       set({ 
@@ -81,6 +95,7 @@ export const useTaskStore = create((set, get) => ({
         tasks: state.tasks.filter(task => task.id !== taskId),
         loading: false
       }));
+      get().fetchStats();
     } catch (error) {
       set({ 
         error: error.response?.data?.detail || 'Error al eliminar tarea',
@@ -90,6 +105,43 @@ export const useTaskStore = create((set, get) => ({
     }
   },
 
+  // Apply server-sent changes (GET /tasks/events) instead of re-fetching the list
+  subscribeToChanges: () => {
+    const source = new EventSource(`${API_URL}/tasks/events`);
+    const matchesFilters = (task) => {
+      const { status, priority } = get().filters;
+      return (!status || task.status === status) && (!priority || task.priority === priority);
+    };
+
+    const upsert = (event) => {
+      const task = JSON.parse(event.data);
+      set(state => {
+        const exists = state.tasks.some(t => t.id === task.id);
+        if (!matchesFilters(task)) {
+          return { tasks: state.tasks.filter(t => t.id !== task.id) };
+        }
+        return {
+          tasks: exists
+            ? state.tasks.map(t => (t.id === task.id ? task : t))
+            : [task, ...state.tasks]
+        };
+      });
+      get().fetchStats();
+    };
+
+    source.addEventListener('created', upsert);
+    source.addEventListener('updated', upsert);
+    source.addEventListener('deleted', (event) => {
+      const { id } = JSON.parse(event.data);
+      set(state => ({ tasks: state.tasks.filter(task => task.id !== id) }));
+      get().fetchStats();
+    });
+    // The server no longer has the missed changes: reload once
+    source.addEventListener('reset', () => get().fetchTasks());
+
+    return () => source.close();
+  },
+
   // Set filters
   setFilter: (filterType, value) => {
     set(state => ({